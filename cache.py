@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import threading
+from time import time
+
+
+class LookupCache:
+    """Key-value cache with an optional on-disk layer.
+
+    Values are always kept in memory for the rest of the run. If a
+    path is given, values are also stored in a Json file, so that later
+    runs can reuse them until they are older than the time to live.
+    Unless the cache saves automatically, the file is only written
+    when `save` is called.
+
+    Attributes
+    ----------
+    _path : str
+        Path to the file where values are stored. If None, nothing is
+        stored on disk.
+    _ttl : float
+        Time in seconds that values read from disk are valid.
+    _autosave : bool
+        If True, the file is written every time a value is stored.
+    _unsaved : bool
+        True if values have been stored since the file was written.
+    _entries : dict
+        Map of keys to dicts with the value and the time it was stored.
+    _lock : threading.Lock
+        Guards writes, so that the cache can be shared between threads.
+    """
+
+    def __init__(self, path=None, ttl=None, autosave=True):
+        self._path = path
+        self._ttl = ttl
+        self._autosave = autosave
+        self._unsaved = False
+        self._entries = {}
+        self._lock = threading.Lock()
+        if self._path is not None:
+            self._load()
+
+    def get(self, key):
+        """Get a cached value.
+
+        Parameters
+        ----------
+        key : str
+            Key of the value.
+
+        Returns
+        -------
+        object
+            Value stored for the key. None if there is no such value or
+            if it has expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry["value"]
+
+    def set(self, key, value):
+        """Store a value.
+
+        Parameters
+        ----------
+        key : str
+            Key of the value.
+        value : object
+            Value to store. Must be serializable to Json if the cache
+            has an on-disk layer.
+        """
+        with self._lock:
+            self._entries[key] = {"value": value, "time": time()}
+            self._unsaved = True
+            if self._autosave:
+                self._save()
+
+    def save(self):
+        """Write the values to the cache file, if any have been stored
+        since it was last written.
+        """
+        with self._lock:
+            self._save()
+
+    def _load(self):
+        """Load values that haven't expired from the cache file."""
+        if not os.path.exists(self._path):
+            return
+        try:
+            with open(self._path) as file_:
+                entries = json.load(file_)
+        except (OSError, ValueError) as error:
+            logging.warning(
+                f"Could not read cache file '{self._path}': {error}"
+            )
+            return
+        now = time()
+        for key, entry in entries.items():
+            if self._ttl is None or now - entry["time"] < self._ttl:
+                self._entries[key] = entry
+        logging.debug(
+            f"Loaded {len(self._entries)} values from cache file "
+            f"'{self._path}'."
+        )
+
+    def _save(self):
+        """Write all values to the cache file."""
+        if self._path is None or not self._unsaved:
+            return
+        temporary_path = f"{self._path}.tmp"
+        with open(temporary_path, "w") as file_:
+            json.dump(self._entries, file_)
+        os.replace(temporary_path, self._path)
+        self._unsaved = False
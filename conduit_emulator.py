@@ -0,0 +1,562 @@
+#! /usr/bin/env python3
+
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from urllib.parse import parse_qsl
+
+# Maximum number of results per page from project.search, as in
+# Phabricator.
+MAX_LIMIT = 100
+# Splits a Conduit parameter name, e.g. "constraints[ids][0]", into its
+# parts.
+PARAMETER_NAME_PATTERN = re.compile(r"[^\[\]]+")
+
+
+class ConduitEmulator:
+    """Local stand-in for the Conduit API of Phabricator.
+
+    Implements the endpoints that `Phab` uses: "project.search", with
+    the constraints ids, phids, query and parents and paging with
+    cursors, and "project.edit" for creating projects. The projects
+    are kept in memory.
+
+    Each endpoint can be given a latency, which every request to it
+    waits for, and an error rate, which is the share of requests that
+    get a server error response instead of a result. Errors are
+    random, but reproducible with a seed.
+
+    Attributes
+    ----------
+    _projects : dict
+        Map of project ids to projects, in the format that
+        project.search returns them in.
+    _hashtags : dict
+        Map of project ids to the project's hashtags, i.e. its slug
+        and additional hashtags.
+    _latency : dict
+        Map of endpoints to time in seconds that each request takes.
+    _error_rates : dict
+        Map of endpoints to the share of requests that fail, between 0
+        and 1.
+    _random : random.Random
+        Decides which requests fail.
+    _requests : Counter
+        Number of requests made to each endpoint.
+    _errors : Counter
+        Number of requests to each endpoint that got an error.
+    _lock : threading.Lock
+        Guards the projects and counters, since requests are handled
+        in separate threads.
+    _server : ThreadingHTTPServer
+        The server, once started.
+    _thread : threading.Thread
+        Thread that runs the server.
+    """
+
+    def __init__(self, latency=None, error_rates=None, seed=None):
+        self._projects = {}
+        self._hashtags = {}
+        self._latency = latency or {}
+        self._error_rates = error_rates or {}
+        self._random = random.Random(seed)
+        self._requests = Counter()
+        self._errors = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exception):
+        self.stop()
+
+    def start(self, host="localhost", port=0):
+        """Start serving requests in a background thread.
+
+        Parameters
+        ----------
+        host : str
+        port : int
+            Port to listen on. If 0, a free port is used.
+        """
+        self._server = ThreadingHTTPServer((host, port), _ConduitHandler)
+        self._server.emulator = self
+        # Poll often, so that stopping the server is quick.
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    @property
+    def api_url(self):
+        """URL to use as `api_url` in the config.
+
+        Returns
+        -------
+        str
+        """
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}/api".format(host, port)
+
+    @property
+    def requests(self):
+        """Number of requests made to each endpoint.
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            return dict(self._requests)
+
+    @property
+    def errors(self):
+        """Number of requests to each endpoint that got an error.
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            return dict(self._errors)
+
+    def add_project(self, name, slugs=None, description="", parent_phid=None):
+        """Add a project, without counting it as a request.
+
+        Used to set up projects that runs expect, e.g. the parent
+        project.
+
+        Parameters
+        ----------
+        name : str
+        slugs : list
+            Additional hashtags.
+        description : str
+        parent_phid : str
+            PHID of the parent project. If None, the project has no
+            parent.
+
+        Returns
+        -------
+        dict
+            The project, as returned by project.search.
+
+        Raises
+        ------
+        ConduitError
+            If the name or a hashtag is already used by another
+            project, or if there is no project with the parent PHID.
+        """
+        with self._lock:
+            return self._create_project(name, slugs, description, parent_phid)
+
+    def handle(self, endpoint, parameters):
+        """Handle a request to an endpoint.
+
+        Parameters
+        ----------
+        endpoint : str
+            Name of the endpoint, e.g. "project.search".
+        parameters : dict
+            Parameters in the Conduit format, e.g.
+            {"constraints[ids][0]": "1"}.
+
+        Returns
+        -------
+        int
+            HTTP status of the response.
+        dict
+            The response. Errors from the endpoint are in "error_code"
+            and "error_info", like in Conduit.
+        """
+        with self._lock:
+            self._requests[endpoint] += 1
+            failed = self._random.random() < self._error_rates.get(endpoint, 0)
+            if failed:
+                self._errors[endpoint] += 1
+        latency = self._latency.get(endpoint)
+        if latency:
+            sleep(latency)
+        if failed:
+            return 500, {"error": "Simulated server error."}
+
+        parameters = _from_phab_parameters(parameters)
+        try:
+            if endpoint == "project.search":
+                result = self._search(parameters)
+            elif endpoint == "project.edit":
+                result = self._edit(parameters)
+            else:
+                raise ConduitError(
+                    "ERR-CONDUIT-CALL",
+                    "Conduit method '{}' does not exist.".format(endpoint)
+                )
+        except ConduitError as error:
+            return 200, {
+                "result": None,
+                "error_code": error.code,
+                "error_info": error.info
+            }
+        return 200, {"result": result, "error_code": None, "error_info": None}
+
+    def _search(self, parameters):
+        """Search for projects, newest first.
+
+        Parameters
+        ----------
+        parameters : dict
+            Parameters with nested values.
+
+        Returns
+        -------
+        dict
+            A page of projects and the cursor to the next page.
+        """
+        constraints = parameters.get("constraints") or {}
+        ids = constraints.get("ids")
+        if ids is not None:
+            ids = {int(id_) for id_ in ids}
+        phids = constraints.get("phids")
+        parents = constraints.get("parents")
+        terms = (constraints.get("query") or "").lower().split()
+        limit = min(int(parameters.get("limit", MAX_LIMIT)), MAX_LIMIT)
+        after = parameters.get("after")
+        with self._lock:
+            projects = sorted(self._projects.values(), key=lambda p: -p["id"])
+        matches = []
+        for project in projects:
+            fields = project["fields"]
+            if after is not None and project["id"] >= int(after):
+                continue
+            if ids is not None and project["id"] not in ids:
+                continue
+            if phids is not None and project["phid"] not in phids:
+                continue
+            if parents is not None and (
+                    fields["parent"] is None
+                    or fields["parent"]["phid"] not in parents
+            ):
+                continue
+            text = " ".join([fields["name"], fields["slug"]]).lower()
+            if not all(term in text for term in terms):
+                continue
+            matches.append(project)
+            if len(matches) > limit:
+                break
+        page = matches[:limit]
+        if len(matches) > limit:
+            next_after = str(page[-1]["id"])
+        else:
+            next_after = None
+        return {
+            "data": page,
+            "maps": {},
+            "query": {"queryKey": None},
+            "cursor": {
+                "limit": limit,
+                "after": next_after,
+                "before": None,
+                "order": None
+            }
+        }
+
+    def _edit(self, parameters):
+        """Create a project from transactions.
+
+        Editing existing projects, with "objectIdentifier", isn't
+        supported.
+
+        Parameters
+        ----------
+        parameters : dict
+            Parameters with nested values.
+
+        Returns
+        -------
+        dict
+            Id and PHID of the created project and the applied
+            transactions.
+
+        Raises
+        ------
+        ConduitError
+            If the transactions aren't valid for creating a project.
+        """
+        if parameters.get("objectIdentifier") is not None:
+            raise ConduitError(
+                "ERR-CONDUIT-CORE",
+                "Only creating projects is supported by the emulator."
+            )
+        values = {}
+        for transaction in parameters.get("transactions") or []:
+            values[transaction.get("type")] = transaction.get("value")
+        unknown = set(values) - {"name", "slugs", "description", "parent"}
+        if unknown:
+            raise ConduitError(
+                "ERR-CONDUIT-CORE",
+                "Unknown transaction types: {}.".format(
+                    ", ".join(sorted(map(str, unknown)))
+                )
+            )
+        if not values.get("name"):
+            raise ConduitError(
+                "ERR-CONDUIT-CORE",
+                "Projects must have a name."
+            )
+        with self._lock:
+            project = self._create_project(
+                values["name"],
+                values.get("slugs"),
+                values.get("description") or "",
+                values.get("parent")
+            )
+        return {
+            "object": {"id": project["id"], "phid": project["phid"]},
+            "transactions": [
+                {"phid": "PHID-XACT-PROJ-{:014d}".format(i)}
+                for i in range(len(values))
+            ]
+        }
+
+    def _create_project(self, name, slugs, description, parent_phid):
+        """Add a project. Must be called with the lock held.
+
+        Parameters
+        ----------
+        name : str
+        slugs : list
+        description : str
+        parent_phid : str
+
+        Returns
+        -------
+        dict
+            The project, as returned by project.search.
+
+        Raises
+        ------
+        ConduitError
+            If the name or a hashtag is already used, or if there is
+            no project with the parent PHID.
+        """
+        slug = name.lower().replace(" ", "_")
+        hashtags = {slug} | {s.lower() for s in slugs or []}
+        for id_, project in self._projects.items():
+            if project["fields"]["name"] == name:
+                raise ConduitError(
+                    "ERR-CONDUIT-CORE",
+                    "Project name '{}' is already used by another "
+                    "project.".format(name)
+                )
+            used = hashtags & self._hashtags[id_]
+            if used:
+                raise ConduitError(
+                    "ERR-CONDUIT-CORE",
+                    "Project hashtags {} are already used by another "
+                    "project.".format(", ".join(sorted(used)))
+                )
+        parent = None
+        depth = 0
+        if parent_phid is not None:
+            parents = [
+                p for p in self._projects.values() if p["phid"] == parent_phid
+            ]
+            if not parents:
+                raise ConduitError(
+                    "ERR-CONDUIT-CORE",
+                    "Parent project '{}' doesn't exist.".format(parent_phid)
+                )
+            parent = {
+                "id": parents[0]["id"],
+                "phid": parents[0]["phid"],
+                "name": parents[0]["fields"]["name"]
+            }
+            depth = parents[0]["fields"]["depth"] + 1
+        id_ = len(self._projects) + 1
+        project = {
+            "id": id_,
+            "type": "PROJ",
+            "phid": "PHID-PROJ-{:020d}".format(id_),
+            "fields": {
+                "name": name,
+                "slug": slug,
+                "description": description,
+                "parent": parent,
+                "depth": depth
+            },
+            "attachments": {}
+        }
+        self._projects[id_] = project
+        self._hashtags[id_] = hashtags
+        return project
+
+
+class _ConduitHandler(BaseHTTPRequestHandler):
+    """Passes POST requests to "/api/<endpoint>" on to the emulator."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, which would otherwise
+    # be delayed by the client's delayed acknowledgements.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        parameters = dict(parse_qsl(body.decode(), keep_blank_values=True))
+        endpoint = self.path.rstrip("/").rsplit("/", 1)[-1]
+        status, response = self.server.emulator.handle(endpoint, parameters)
+        body = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug("Conduit emulator: " + format % args)
+
+
+def _from_phab_parameters(parameters):
+    """Convert parameters in Conduit request format to nested values.
+
+    The reverse of `Phab._to_phab_parameters`, e.g.
+    {"constraints[ids][0]": "1"} becomes {"constraints": {"ids": ["1"]}}.
+    Dicts with only numeric keys become lists.
+
+    Parameters
+    ----------
+    parameters : dict
+        Parameters with names in the Conduit format.
+
+    Returns
+    -------
+    dict
+    """
+    nested = {}
+    for name, value in parameters.items():
+        keys = PARAMETER_NAME_PATTERN.findall(name)
+        target = nested
+        for key in keys[:-1]:
+            target = target.setdefault(key, {})
+        target[keys[-1]] = value
+    return _to_lists(nested)
+
+
+def _to_lists(value):
+    """Convert dicts with only numeric keys to lists, recursively.
+
+    Parameters
+    ----------
+    value : object
+
+    Returns
+    -------
+    object
+    """
+    if not isinstance(value, dict):
+        return value
+    value = {k: _to_lists(v) for k, v in value.items()}
+    if value and all(k.isdigit() for k in value):
+        return [value[k] for k in sorted(value, key=int)]
+    return value
+
+
+def _parse_endpoint_values(values):
+    """Parse values given per endpoint on the command line.
+
+    Parameters
+    ----------
+    values : list
+        Strings like "project.search=0.1".
+
+    Returns
+    -------
+    dict
+        Map of endpoints to values.
+    """
+    parsed = {}
+    for value in values or []:
+        endpoint, number = value.split("=")
+        parsed[endpoint] = float(number)
+    return parsed
+
+
+class ConduitError(Exception):
+    """Error that the emulated Conduit API responds with.
+
+    Attributes
+    ----------
+    code : str
+        Error code, e.g. "ERR-CONDUIT-CORE".
+    info : str
+        Description of the error.
+    """
+
+    def __init__(self, code, info):
+        super().__init__(info)
+        self.code = code
+        self.info = info
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=("Run a local stand-in for the Conduit API of "
+                     "Phabricator, e.g. to load test adding projects.")
+    )
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--parent",
+        default="Wikimedia-Sverige",
+        help=("Name of a parent project to create. Its id is what "
+              "parent_project_id should be set to in the config.")
+    )
+    parser.add_argument(
+        "--latency",
+        action="append",
+        metavar="ENDPOINT=SECONDS",
+        help="Time that each request to an endpoint takes. Repeatable."
+    )
+    parser.add_argument(
+        "--error-rate",
+        action="append",
+        metavar="ENDPOINT=RATE",
+        help=("Share of requests to an endpoint that get a server error, "
+              "between 0 and 1. Repeatable.")
+    )
+    parser.add_argument("--seed", type=int, help="Seed for the errors.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    emulator = ConduitEmulator(
+        _parse_endpoint_values(args.latency),
+        _parse_endpoint_values(args.error_rate),
+        args.seed
+    )
+    parent = emulator.add_project(args.parent)
+    emulator.start(port=args.port)
+    logging.info(
+        "Serving Conduit on {} with parent project id {}.".format(
+            emulator.api_url,
+            parent["id"]
+        )
+    )
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        logging.info("Requests: {}".format(emulator.requests))
+        emulator.stop()
@@ -0,0 +1,508 @@
+import hashlib
+import logging
+import os
+import pickle
+from typing import NamedTuple
+
+import yaml
+
+# Placeholder in titles that is replaced by the year.
+YEAR_PLACEHOLDER = "<YEAR>"
+
+# Canonical labels in project_columns that are used in the code.
+REQUIRED_COLUMNS = [
+    "project_number",
+    "program",
+    "swedish_name",
+    "english_name",
+    "about_english",
+    "super_project",
+    "active"
+]
+
+
+class GoalsConfig(NamedTuple):
+    """Parameters for the input from the goals spreadsheet."""
+    project_row: int
+    last_row: int
+    first_project_column: str
+
+
+class PageConfig(NamedTuple):
+    """A year page made by substituting a template."""
+    title: str
+    template: str
+
+
+class CategoriesConfig(NamedTuple):
+    """Year categories.
+
+    `pages` maps category titles to an extra category, a list of extra
+    categories or None.
+    """
+    general: str
+    pages: dict
+
+
+class YearPagesConfig(NamedTuple):
+    """Pages for a new year, with the year in the titles.
+
+    `simple` maps page titles to the templates to substitute.
+    """
+    current_projects_template: str
+    simple: dict
+    projects: PageConfig
+    categories: CategoriesConfig
+    volunteer_tasks: PageConfig
+
+
+class SubpageConfig(NamedTuple):
+    """A subpage created under each project page.
+
+    `add_goals_parameters` maps the template parameter for the goals to
+    the template to use for them, with the year in its name.
+    """
+    title: str
+    template_name: str
+    parameters: dict = None
+    add_goals_parameters: dict = None
+    year_parameter: str = None
+
+
+class WikiConfig(NamedTuple):
+    """Parameters for wiki pages."""
+    edit_summary: str = None
+    project_namespace: str = None
+    project_template: str = None
+    project_parameters: dict = None
+    subpages: tuple = ()
+    year_pages: YearPagesConfig = None
+    project_name_template: str = None
+    project_number_template: str = None
+    write_hash_file: str = None
+    save_workers: int = None
+    save_rate: float = None
+    save_retries: int = 3
+
+
+class RateLimitConfig(NamedTuple):
+    """Token bucket rate limit for Phabricator requests."""
+    rate: float
+    burst: int = 1
+    backoff_factor: float = 2.0
+    min_rate: float = None
+
+
+class PhabConfig(NamedTuple):
+    """Parameters for Phabricator."""
+    api_url: str = None
+    parent_project_id: int = None
+    request_delay: float = None
+    rate_limit: RateLimitConfig = None
+    cache_file: str = None
+    cache_ttl: float = 86400
+    pool_size: int = 4
+    timeout: float = 30
+    retries: int = 3
+    retry_backoff: float = 1
+    wiki_url: str = None
+
+
+class Config(NamedTuple):
+    """All parameters from the config file.
+
+    `project_columns` maps canonical labels to column headers in the
+    projects spreadsheet. `goals` is None if there are no parameters
+    for the goals spreadsheet.
+    """
+    goals: GoalsConfig = None
+    project_columns: dict = None
+    wiki: WikiConfig = None
+    phab: PhabConfig = None
+
+
+def load_config(path, year, cache_path=None):
+    """Load and validate the config file.
+
+    The validated config is stored in a cache file, which is used
+    instead of parsing the config again as long as the config file's
+    content and modification time, the year and this module are the
+    same. The cached objects are only valid for the code that made
+    them.
+
+    Parameters
+    ----------
+    path : str
+        Path to the config file.
+    year : int or str
+        Year to put in titles instead of "<YEAR>".
+    cache_path : str
+        Path to the cache file. If None, no cache is used.
+
+    Returns
+    -------
+    Config
+
+    Raises
+    ------
+    ConfigError
+        If the config is invalid.
+    """
+    with open(path, "rb") as file_:
+        content = file_.read()
+    key = (
+        hashlib.sha1(content).hexdigest(),
+        os.path.getmtime(path),
+        str(year),
+        _source_hash()
+    )
+    if cache_path is not None:
+        config = _read_cache(cache_path, key)
+        if config is not None:
+            logging.debug(f"Loaded config from cache '{cache_path}'.")
+            return config
+
+    config = compile_config(yaml.safe_load(content), year)
+    if cache_path is not None:
+        _write_cache(cache_path, key, config)
+    return config
+
+
+def compile_config(data, year):
+    """Validate config data and convert it to typed objects.
+
+    Parameters
+    ----------
+    data : dict
+        Config as loaded from YAML.
+    year : int or str
+        Year to put in titles instead of "<YEAR>".
+
+    Returns
+    -------
+    Config
+
+    Raises
+    ------
+    ConfigError
+        If the config is invalid.
+    """
+    data = _section(data, "config")
+    project_columns = _section(
+        _required(data, "project_columns", dict, "config"),
+        "project_columns"
+    )
+    for label in REQUIRED_COLUMNS:
+        _required(project_columns, label, str, "project_columns")
+    goals = data.get("goals")
+    if goals is not None:
+        goals = _compile_goals(_section(goals, "goals"))
+    config = Config(
+        goals,
+        project_columns,
+        _compile_wiki(_required(data, "wiki", dict, "config"), year),
+        _compile_phab(_required(data, "phab", dict, "config"))
+    )
+    _check_parameters(config)
+    return config
+
+
+def _compile_goals(data):
+    first_project_column = _required(
+        data,
+        "first_project_column",
+        str,
+        "goals"
+    )
+    if not first_project_column.isalpha():
+        raise ConfigError(
+            "'goals.first_project_column' should be column letters, e.g. F "
+            f"or AA, not '{first_project_column}'."
+        )
+    return GoalsConfig(
+        _required(data, "project_row", int, "goals"),
+        _required(data, "last_row", int, "goals"),
+        first_project_column
+    )
+
+
+def _compile_wiki(data, year):
+    path = "wiki"
+    subpages = []
+    for i, subpage in enumerate(_required(data, "subpages", list, path)):
+        subpages.append(
+            _compile_subpage(
+                _section(subpage, f"{path}.subpages[{i}]"),
+                f"{path}.subpages[{i}]",
+                year
+            )
+        )
+    return WikiConfig(
+        _required(data, "edit_summary", str, path),
+        _required(data, "project_namespace", str, path),
+        _required(data, "project_template", str, path),
+        _required(data, "project_parameters", dict, path),
+        tuple(subpages),
+        _compile_year_pages(
+            _required(data, "year_pages", dict, path),
+            year
+        ),
+        _required(data, "project_name_template", str, path),
+        _required(data, "project_number_template", str, path),
+        _optional(data, "write_hash_file", str, path),
+        _optional(data, "save_workers", int, path),
+        _optional(data, "save_rate", (int, float), path),
+        _optional(data, "save_retries", int, path, 3)
+    )
+
+
+def _compile_subpage(data, path, year):
+    return SubpageConfig(
+        _required(data, "title", str, path),
+        _required(data, "template_name", str, path),
+        _optional(data, "parameters", dict, path),
+        _with_year(_optional(data, "add_goals_parameters", dict, path), year),
+        _optional(data, "year_parameter", str, path)
+    )
+
+
+def _compile_year_pages(data, year):
+    path = "wiki.year_pages"
+    projects = _required(data, "projects", dict, path)
+    categories = _required(data, "categories", dict, path)
+    volunteer_tasks = _required(data, "volunteer_tasks", dict, path)
+    return YearPagesConfig(
+        _year_title(
+            _required(data, "current_projects_template", str, path),
+            year
+        ),
+        _with_year(_required(data, "simple", dict, path), year, keys=True),
+        _compile_page(projects, f"{path}.projects", year),
+        CategoriesConfig(
+            _year_title(
+                _required(categories, "general", str, f"{path}.categories"),
+                year
+            ),
+            _with_year(
+                _required(categories, "pages", dict, f"{path}.categories"),
+                year,
+                keys=True
+            )
+        ),
+        _compile_page(volunteer_tasks, f"{path}.volunteer_tasks", year)
+    )
+
+
+def _compile_page(data, path, year):
+    return PageConfig(
+        _year_title(_required(data, "title", str, path), year),
+        _required(data, "template", str, path)
+    )
+
+
+def _compile_phab(data):
+    path = "phab"
+    rate_limit = _optional(data, "rate_limit", dict, path)
+    if rate_limit is not None:
+        rate_limit_path = f"{path}.rate_limit"
+        rate_limit = RateLimitConfig(
+            _required(rate_limit, "rate", (int, float), rate_limit_path),
+            _optional(rate_limit, "burst", int, rate_limit_path, 1),
+            _optional(
+                rate_limit,
+                "backoff_factor",
+                (int, float),
+                rate_limit_path,
+                2.0
+            ),
+            _optional(rate_limit, "min_rate", (int, float), rate_limit_path)
+        )
+    return PhabConfig(
+        _required(data, "api_url", str, path),
+        _required(data, "parent_project_id", int, path),
+        _optional(data, "request_delay", (int, float), path),
+        rate_limit,
+        _optional(data, "cache_file", str, path),
+        _optional(data, "cache_ttl", (int, float), path, 86400),
+        _optional(data, "pool_size", int, path, 4),
+        _optional(data, "timeout", (int, float), path, 30),
+        _optional(data, "retries", int, path, 3),
+        _optional(data, "retry_backoff", (int, float), path, 1),
+        _optional(data, "wiki_url", str, path)
+    )
+
+
+def _check_parameters(config):
+    """Check the template parameter specifications for project pages.
+
+    Parameters
+    ----------
+    config : Config
+
+    Raises
+    ------
+    ConfigError
+        If a specification is invalid.
+    """
+    # Imported here, since the render plan refers back to this module
+    # for its error.
+    from render_plan import RenderPlan
+    RenderPlan(
+        config.wiki.project_parameters,
+        config.project_columns,
+        config.wiki.project_template
+    )
+    for subpage in config.wiki.subpages:
+        RenderPlan(subpage.parameters, config.project_columns, subpage.title)
+
+
+def _section(data, path):
+    if not isinstance(data, dict):
+        raise ConfigError(f"'{path}' should be a mapping.")
+    return data
+
+
+def _required(data, key, type_, path):
+    """Get a value that must be present in the config.
+
+    Parameters
+    ----------
+    data : dict
+        The section of the config that has the value.
+    key : str
+    type_ : type or tuple
+        Allowed type or types of the value.
+    path : str
+        Path to the section, used in error messages.
+
+    Returns
+    -------
+    object
+
+    Raises
+    ------
+    ConfigError
+        If the value is missing or has the wrong type.
+    """
+    if data.get(key) is None:
+        raise ConfigError(f"'{path}.{key}' is missing.")
+    return _optional(data, key, type_, path)
+
+
+def _optional(data, key, type_, path, default=None):
+    """Get a value that may be left out of the config.
+
+    Parameters
+    ----------
+    data : dict
+        The section of the config that has the value.
+    key : str
+    type_ : type or tuple
+        Allowed type or types of the value.
+    path : str
+        Path to the section, used in error messages.
+    default : object
+        Returned if the value is missing.
+
+    Returns
+    -------
+    object
+
+    Raises
+    ------
+    ConfigError
+        If the value has the wrong type.
+    """
+    value = data.get(key)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, type_):
+        names = [t.__name__ for t in type_] \
+            if isinstance(type_, tuple) else [type_.__name__]
+        raise ConfigError(
+            f"'{path}.{key}' should be of type {' or '.join(names)}, not "
+            f"{type(value).__name__}."
+        )
+    return value
+
+
+def _year_title(title, year):
+    return title.replace(YEAR_PLACEHOLDER, str(year))
+
+
+def _with_year(mapping, year, keys=False):
+    """Put the year in the keys or values of a mapping.
+
+    Parameters
+    ----------
+    mapping : dict
+        Mapping with titles. May be None.
+    year : int or str
+    keys : bool
+        If True, the year is put in the keys, otherwise in the values.
+
+    Returns
+    -------
+    dict
+    """
+    if mapping is None:
+        return None
+    if keys:
+        return {_year_title(str(k), year): v for k, v in mapping.items()}
+    return {k: _year_title(str(v), year) for k, v in mapping.items()}
+
+
+def _source_hash():
+    """Make a hash of this module's source.
+
+    Returns
+    -------
+    str
+        SHA-1 hash of the source, as hex string.
+    """
+    with open(__file__, "rb") as file_:
+        return hashlib.sha1(file_.read()).hexdigest()
+
+
+def _read_cache(path, key):
+    """Read a compiled config from the cache file.
+
+    Parameters
+    ----------
+    path : str
+    key : tuple
+        Hash and modification time of the config file, the year and
+        hash of this module's source.
+
+    Returns
+    -------
+    Config
+        The cached config. None if there is no cache file or if it's
+        for another key.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as file_:
+            cached_key, config = pickle.load(file_)
+    except (OSError, pickle.UnpicklingError, ValueError, EOFError,
+            AttributeError, TypeError) as error:
+        logging.warning(f"Could not read config cache '{path}': {error}")
+        return None
+    if cached_key != key:
+        return None
+    return config
+
+
+def _write_cache(path, key, config):
+    temporary_path = f"{path}.tmp"
+    try:
+        with open(temporary_path, "wb") as file_:
+            pickle.dump((key, config), file_)
+        os.replace(temporary_path, path)
+    except OSError as error:
+        logging.warning(f"Could not write config cache '{path}': {error}")
+
+
+class ConfigError(Exception):
+    pass
@@ -0,0 +1,304 @@
+import math
+from array import array
+from collections.abc import ItemsView, Mapping, ValuesView
+
+
+class GoalTable(Mapping):
+    """Planned goal values for projects, stored sparsely.
+
+    Goal names and project names are each stored once, in the order
+    they first appear, and referred to by index. The values are kept
+    in flat arrays sorted by project, so that the values for a project
+    are a contiguous slice, with an index sorted by goal for reading
+    the values for a goal across all projects.
+
+    Works as a read only map of project names to `ProjectGoals`, which
+    are views of the values for each project and don't copy them. It's
+    created from a map of project names to dicts that map goal names
+    to planned values, where projects without values are left out.
+
+    Attributes
+    ----------
+    _goal_names : list
+        Names of the goals.
+    _goal_ids : dict
+        Map of goal names to their indices.
+    _project_names : list
+        Names of the projects.
+    _project_ids : dict
+        Map of project names to their indices.
+    _offsets : array
+        Start of each project's values in the value arrays. Has one
+        more item than there are projects, which is the end of the
+        last project's values.
+    _goal_indices : array
+        Goal index for each value.
+    _project_indices : array
+        Project index for each value.
+    _values : list
+        The planned values, as strings.
+    _numbers : array
+        The planned values as numbers, NaN for values that aren't
+        numeric.
+    _goal_offsets : array
+        Start of each goal's positions in `_goal_positions`, like
+        `_offsets` for projects.
+    _goal_positions : array
+        Positions in the value arrays, grouped by goal.
+    """
+
+    def __init__(self, project_goals):
+        self._goal_names = []
+        self._goal_ids = {}
+        self._project_names = []
+        self._project_ids = {}
+        self._offsets = array("l", [0])
+        self._goal_indices = array("l")
+        self._project_indices = array("l")
+        self._values = []
+        self._numbers = array("d")
+        for project, values in project_goals.items():
+            if not values:
+                continue
+            project_id = len(self._project_names)
+            self._project_ids[project] = project_id
+            self._project_names.append(project)
+            for goal, value in values.items():
+                self._goal_indices.append(self._intern_goal(goal))
+                self._project_indices.append(project_id)
+                self._values.append(value)
+                self._numbers.append(_to_number(value))
+            self._offsets.append(len(self._values))
+        self._index_goals()
+
+    def _intern_goal(self, goal):
+        """Get the index of a goal name, adding it if it's new.
+
+        Parameters
+        ----------
+        goal : str
+
+        Returns
+        -------
+        int
+        """
+        goal_id = self._goal_ids.get(goal)
+        if goal_id is None:
+            goal_id = len(self._goal_names)
+            self._goal_ids[goal] = goal_id
+            self._goal_names.append(goal)
+        return goal_id
+
+    def _index_goals(self):
+        """Group the value positions by goal, with a counting sort."""
+        counts = [0] * (len(self._goal_names) + 1)
+        for goal_id in self._goal_indices:
+            counts[goal_id + 1] += 1
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+        self._goal_offsets = array("l", counts)
+        positions = [0] * len(self._values)
+        next_position = counts[:-1]
+        for position, goal_id in enumerate(self._goal_indices):
+            positions[next_position[goal_id]] = position
+            next_position[goal_id] += 1
+        self._goal_positions = array("l", positions)
+
+    def __getitem__(self, project):
+        return ProjectGoals(self, self._project_ids[project])
+
+    def __iter__(self):
+        return iter(self._project_names)
+
+    def __len__(self):
+        return len(self._project_names)
+
+    def __contains__(self, project):
+        return project in self._project_ids
+
+    @property
+    def goal_names(self):
+        """Names of all goals, in the order they first appear.
+
+        Returns
+        -------
+        list
+        """
+        return list(self._goal_names)
+
+    def goal_values(self, goal):
+        """Get the planned values for a goal in all projects.
+
+        Parameters
+        ----------
+        goal : str
+            Name of the goal.
+
+        Returns
+        -------
+        dict
+            Map of project names to planned values, for the projects
+            that have a value for the goal. Empty if the goal is
+            unknown.
+        """
+        goal_id = self._goal_ids.get(goal)
+        if goal_id is None:
+            return {}
+        values = {}
+        for position in self._goal_slice(goal_id):
+            project_id = self._project_indices[position]
+            values[self._project_names[project_id]] = self._values[position]
+        return values
+
+    def totals(self):
+        """Sum the planned values for each goal over all projects.
+
+        Values that aren't numeric are left out.
+
+        Returns
+        -------
+        dict
+            Map of goal names to total planned values.
+        """
+        totals = [0.0] * len(self._goal_names)
+        for goal_id, number in zip(self._goal_indices, self._numbers):
+            if not math.isnan(number):
+                totals[goal_id] += number
+        return dict(zip(self._goal_names, totals))
+
+    def total(self, goal):
+        """Sum the planned values for a goal over all projects.
+
+        Parameters
+        ----------
+        goal : str
+            Name of the goal.
+
+        Returns
+        -------
+        float
+            The total, where values that aren't numeric are left out.
+            0 if the goal is unknown.
+        """
+        goal_id = self._goal_ids.get(goal)
+        if goal_id is None:
+            return 0.0
+        return math.fsum(
+            self._numbers[p] for p in self._goal_slice(goal_id)
+            if not math.isnan(self._numbers[p])
+        )
+
+    def _goal_slice(self, goal_id):
+        """Get the positions of the values for a goal.
+
+        Parameters
+        ----------
+        goal_id : int
+
+        Returns
+        -------
+        array
+            Positions in the value arrays, in project order.
+        """
+        return self._goal_positions[
+            self._goal_offsets[goal_id]:self._goal_offsets[goal_id + 1]
+        ]
+
+
+class ProjectGoals(Mapping):
+    """Read only view of the planned values for one project.
+
+    Maps goal names to planned values, in the order the goals appear
+    in the goals file.
+
+    Attributes
+    ----------
+    _table : GoalTable
+        The table that holds the values.
+    _start : int
+        Position of the project's first value.
+    _end : int
+        Position after the project's last value.
+    """
+
+    def __init__(self, table, project_id):
+        self._table = table
+        self._start = table._offsets[project_id]
+        self._end = table._offsets[project_id + 1]
+
+    def __getitem__(self, goal):
+        goal_id = self._table._goal_ids.get(goal)
+        if goal_id is not None:
+            for position in range(self._start, self._end):
+                if self._table._goal_indices[position] == goal_id:
+                    return self._table._values[position]
+        raise KeyError(goal)
+
+    def __iter__(self):
+        goal_names = self._table._goal_names
+        for position in range(self._start, self._end):
+            yield goal_names[self._table._goal_indices[position]]
+
+    def __len__(self):
+        return self._end - self._start
+
+    def items(self):
+        return _ProjectGoalsItems(self)
+
+    def values(self):
+        return _ProjectGoalsValues(self)
+
+    def _positions(self):
+        """Get the goal names and positions of the project's values.
+
+        Returns
+        -------
+        iterator
+            Tuples of goal name and position in the value arrays.
+        """
+        goal_names = self._table._goal_names
+        goal_indices = self._table._goal_indices
+        for position in range(self._start, self._end):
+            yield goal_names[goal_indices[position]], position
+
+
+class _ProjectGoalsItems(ItemsView):
+    """Items of `ProjectGoals`, read in one pass over its slice.
+
+    The default view looks up each goal by name, which makes reading
+    all values quadratic in the number of goals.
+    """
+
+    def __iter__(self):
+        values = self._mapping._table._values
+        for goal, position in self._mapping._positions():
+            yield goal, values[position]
+
+
+class _ProjectGoalsValues(ValuesView):
+    """Values of `ProjectGoals`, read in one pass over its slice."""
+
+    def __iter__(self):
+        values = self._mapping._table._values
+        for _, position in self._mapping._positions():
+            yield values[position]
+
+
+def _to_number(value):
+    """Parse a planned value as a number.
+
+    Parameters
+    ----------
+    value : str
+        Planned value, where spaces are ignored and comma may be used
+        as decimal separator.
+
+    Returns
+    -------
+    float
+        The number. NaN if the value isn't numeric.
+    """
+    try:
+        return float(value.replace(" ", "").replace(",", "."))
+    except ValueError:
+        return math.nan
@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import threading
+
+
+class Journal:
+    """Append-only record of completed operations, for resuming runs.
+
+    Each operation is written as a line of Json as soon as it's done,
+    so that the journal is intact even if the run is killed. A run that
+    is resumed reads the journal and skips the operations in it,
+    without asking Phabricator or the wiki about them again.
+
+    The operations are:
+
+    - "phab_project": a Phabricator project was created or found. The
+      key is the English project name and the value is the id and the
+      name of the Phabricator project.
+    - "page": a page was saved, or left as it was since it wouldn't
+      change. The key is the title and the value is the latest
+      revision id. This includes the project name and number
+      templates, so the rows added to them are covered by their page.
+
+    The first line describes the run, e.g. year, input files and
+    selected components. A journal can only be resumed by a run with
+    the same description.
+    When not resuming, any existing journal file is replaced.
+
+    Attributes
+    ----------
+    _path : str
+        Path to the journal file.
+    _entries : dict
+        Map of (operation, key) to values.
+    _file : file object
+        The journal file, opened for appending.
+    _lock : threading.Lock
+        Guards writes, since several stages record operations at the
+        same time.
+    """
+
+    def __init__(self, path, run, resume):
+        self._path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        if resume and os.path.exists(path):
+            self._load(run)
+            self._file = open(path, "a")
+        else:
+            if resume:
+                logging.warning(
+                    f"No journal '{path}' to resume from. Starting from "
+                    "the beginning."
+                )
+            self._file = open(path, "w")
+            self._write({"operation": "run", "value": run})
+
+    def get(self, operation, key):
+        """Get the value of a completed operation.
+
+        Parameters
+        ----------
+        operation : str
+            Type of operation.
+        key : str or list
+            What the operation was done on.
+
+        Returns
+        -------
+        object
+            The value recorded for the operation. None if the operation
+            isn't in the journal.
+        """
+        return self._entries.get((operation, self._to_hashable(key)))
+
+    def record(self, operation, key, value):
+        """Record a completed operation.
+
+        Parameters
+        ----------
+        operation : str
+            Type of operation.
+        key : str or list
+            What the operation was done on.
+        value : object
+            Result of the operation. Must be serializable to Json.
+        """
+        with self._lock:
+            self._entries[(operation, self._to_hashable(key))] = value
+            self._write({"operation": operation, "key": key, "value": value})
+
+    def close(self):
+        """Close the journal file."""
+        self._file.close()
+
+    def _load(self, run):
+        """Read the operations in the journal file.
+
+        A last line that was only partly written when the run stopped
+        is removed from the file.
+
+        Parameters
+        ----------
+        run : dict
+            Description of the current run.
+
+        Raises
+        ------
+        JournalMismatchError
+            If the journal is from a different run.
+        """
+        with open(self._path) as file_:
+            lines = file_.read().splitlines()
+        for line_number, line in enumerate(lines):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                if line_number == len(lines) - 1:
+                    logging.warning(
+                        f"Removing incomplete last line in journal "
+                        f"'{self._path}'."
+                    )
+                    with open(self._path, "w") as file_:
+                        file_.writelines(f"{valid}\n" for valid in lines[:-1])
+                    break
+                raise
+            if entry["operation"] == "run":
+                if entry["value"] != run:
+                    raise JournalMismatchError(self._path, entry["value"])
+                continue
+            key = self._to_hashable(entry["key"])
+            self._entries[(entry["operation"], key)] = entry["value"]
+        logging.info(
+            f"Resuming with {len(self._entries)} completed operations from "
+            f"journal '{self._path}'."
+        )
+
+    def _write(self, entry):
+        """Append an entry to the journal file.
+
+        Parameters
+        ----------
+        entry : dict
+        """
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    @staticmethod
+    def _to_hashable(key):
+        """Make a key usable in a dict.
+
+        Keys read from Json have lists where tuples are needed.
+
+        Parameters
+        ----------
+        key : str or list
+
+        Returns
+        -------
+        str or tuple
+        """
+        if isinstance(key, list):
+            return tuple(key)
+        return key
+
+
+class JournalMismatchError(Exception):
+    def __init__(self, path, run):
+        message = (f"Journal '{path}' is from another run ({run}) and "
+                   "can't be resumed.")
+        super().__init__(message)
@@ -0,0 +1,446 @@
+import logging
+import sqlite3
+import threading
+from collections import Counter
+from time import sleep
+
+# Number of pages loaded per request, like Pywikibot's preloading.
+PRELOAD_BATCH_SIZE = 50
+
+
+class LocalSite:
+    """Site backend that keeps the pages in SQLite instead of a wiki.
+
+    Has the same interface as `site_backend.PywikibotSite`, so that
+    runs can be made without a wiki, e.g. to test or benchmark them.
+    The pages are kept in memory, or in a database file if a path is
+    given, in which case they are kept between runs.
+
+    Each operation that would be a request to a MediaWiki site counts
+    as a request to its API module, i.e. "query" for loading pages,
+    "parse" for the pre-save transform and "edit" for saving, and
+    waits for `latency` seconds to simulate a remote wiki. Requests
+    from different threads wait at the same time.
+
+    Saving doesn't fail with any errors from a wiki, so there are no
+    save errors to handle, and new text replaces the current text
+    without asking, as if all changes were accepted when merging.
+
+    Attributes
+    ----------
+    retryable_save_errors : tuple
+        Empty, since saving is never retried.
+    save_errors : tuple
+        Empty, since there are no errors from a wiki.
+    _connection : sqlite3.Connection
+        Connection to the database with the pages.
+    _latency : float
+        Time in seconds that each request takes.
+    _requests : Counter
+        Number of requests made to each API module.
+    _lock : threading.Lock
+        Guards the database connection and the request counter.
+    """
+
+    retryable_save_errors = ()
+    save_errors = ()
+
+    def __init__(self, path=":memory:", latency=0):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "title TEXT PRIMARY KEY, "
+            "text TEXT NOT NULL, "
+            "revision_id INTEGER NOT NULL)"
+        )
+        self._connection.commit()
+        self._latency = latency
+        self._requests = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def requests(self):
+        """Number of requests made to each API module.
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            return dict(self._requests)
+
+    def page(self, title, namespace=None):
+        """Make a page object.
+
+        Parameters
+        ----------
+        title : str
+            Title of the page.
+        namespace : str
+            Namespace of the page. If None, the default namespace will
+            be used.
+
+        Returns
+        -------
+        LocalPage
+        """
+        return LocalPage(self, title, namespace)
+
+    def preload(self, pages):
+        """Load existence, latest revision and content of pages.
+
+        Pages are loaded 50 per request.
+
+        Parameters
+        ----------
+        pages : list
+
+        Yields
+        ------
+        LocalPage
+            The pages, as they are loaded.
+        """
+        pages = list(pages)
+        for start in range(0, len(pages), PRELOAD_BATCH_SIZE):
+            batch = pages[start:start + PRELOAD_BATCH_SIZE]
+            states = self._load([page.title() for page in batch])
+            for page in batch:
+                page._set_state(*states.get(page.title(), (None, None)))
+                yield page
+
+    def pre_save_transform(self, page, text):
+        """Get the text as it would be saved.
+
+        Only removes trailing whitespace, like MediaWiki does.
+        Templates aren't substituted, since there are no templates to
+        substitute them with.
+
+        Parameters
+        ----------
+        page : LocalPage
+            The page that the text is for.
+        text : str
+
+        Returns
+        -------
+        str
+            The transformed text.
+        """
+        self._request("parse")
+        return text.rstrip()
+
+    def add_lag_listener(self, listener):
+        """Do nothing, since the local database never lags.
+
+        Parameters
+        ----------
+        listener : function
+        """
+
+    def merge(self, current_text, new_text):
+        """Merge new text into the current text of a page.
+
+        Parameters
+        ----------
+        current_text : str
+            Text in the database.
+        new_text : str
+            Text to save.
+
+        Returns
+        -------
+        str
+            The new text, which replaces the current one.
+        """
+        return new_text
+
+    def add_page(self, title, text):
+        """Add or replace a page, without counting it as a request.
+
+        Used to set up pages that are read by runs, e.g. the project
+        name templates.
+
+        Parameters
+        ----------
+        title : str
+            Full title of the page, including namespace.
+        text : str
+
+        Returns
+        -------
+        int
+            The revision id of the page.
+        """
+        with self._lock:
+            return self._store(title, text)
+
+    def get_text(self, title):
+        """Get the text of a page, without counting it as a request.
+
+        Parameters
+        ----------
+        title : str
+            Full title of the page, including namespace.
+
+        Returns
+        -------
+        str
+            The text of the page. None if the page doesn't exist.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT text FROM pages WHERE title = ?",
+                (title,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def log_report(self):
+        """Log the number of requests made to each API module."""
+        logging.info(
+            "Local wiki requests: {}".format(
+                ", ".join(
+                    "{}: {}".format(module, count)
+                    for module, count in sorted(self.requests.items())
+                ) or "none"
+            )
+        )
+
+    def _load(self, titles):
+        """Load pages in one request.
+
+        Parameters
+        ----------
+        titles : list
+
+        Returns
+        -------
+        dict
+            Map of titles to text and revision id, for the pages that
+            exist.
+        """
+        self._request("query")
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT title, text, revision_id FROM pages "
+                "WHERE title IN ({})".format(", ".join("?" * len(titles))),
+                titles
+            ).fetchall()
+        return {title: (text, revision_id)
+                for title, text, revision_id in rows}
+
+    def _save(self, title, text):
+        """Save a page in one request.
+
+        Parameters
+        ----------
+        title : str
+        text : str
+
+        Returns
+        -------
+        int
+            The new revision id.
+        """
+        self._request("edit")
+        with self._lock:
+            return self._store(title, text)
+
+    def _store(self, title, text):
+        """Write a page to the database as a new revision.
+
+        Revision ids are shared by all pages, like on MediaWiki. Must
+        be called with the lock held.
+
+        Parameters
+        ----------
+        title : str
+        text : str
+
+        Returns
+        -------
+        int
+            The new revision id.
+        """
+        (revision_id,) = self._connection.execute(
+            "SELECT COALESCE(MAX(revision_id), 0) + 1 FROM pages"
+        ).fetchone()
+        self._connection.execute(
+            "INSERT OR REPLACE INTO pages (title, text, revision_id) "
+            "VALUES (?, ?, ?)",
+            (title, text, revision_id)
+        )
+        self._connection.commit()
+        return revision_id
+
+    def _request(self, module):
+        """Count a request and wait for the simulated latency.
+
+        Parameters
+        ----------
+        module : str
+            The API module that the request would be made to.
+        """
+        with self._lock:
+            self._requests[module] += 1
+        if self._latency:
+            sleep(self._latency)
+
+
+class LocalPage:
+    """Page in a `LocalSite`.
+
+    Works like `pywikibot.Page`: the state of the page is loaded from
+    the site the first time it's needed, unless it has been preloaded,
+    and `text` is the text to save, which is the text on the site
+    until it's changed.
+
+    Attributes
+    ----------
+    _site : LocalSite
+        The site that the page is on.
+    _title : str
+        Full title of the page, including namespace.
+    _loaded : bool
+        Whether the state of the page has been loaded from the site.
+    _content : str
+        Text of the latest revision. None if the page doesn't exist.
+    _revision_id : int
+        Id of the latest revision. None if the page doesn't exist.
+    _text : str
+        Text to save. None if it hasn't been set.
+    """
+
+    def __init__(self, site, title, namespace=None):
+        self._site = site
+        title = title.replace("_", " ").strip()
+        title = title[:1].upper() + title[1:]
+        if namespace is not None:
+            title = "{}:{}".format(namespace, title)
+        self._title = title
+        self._loaded = False
+        self._content = None
+        self._revision_id = None
+        self._text = None
+
+    def __str__(self):
+        return "[[{}]]".format(self._title)
+
+    def __repr__(self):
+        return "LocalPage({!r})".format(self._title)
+
+    def title(self):
+        """Get the title of the page.
+
+        Returns
+        -------
+        str
+            Full title, including namespace.
+        """
+        return self._title
+
+    @property
+    def text(self):
+        """Text to save.
+
+        Returns
+        -------
+        str
+            The text that has been set, otherwise the text on the
+            site. Empty string if the page doesn't exist.
+        """
+        if self._text is None:
+            self._ensure_loaded()
+            return self._content or ""
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = value
+
+    @property
+    def latest_revision_id(self):
+        """Id of the latest revision.
+
+        Returns
+        -------
+        int
+            None if the page doesn't exist.
+        """
+        self._ensure_loaded()
+        return self._revision_id
+
+    def exists(self):
+        """Check if the page exists.
+
+        Returns
+        -------
+        bool
+        """
+        self._ensure_loaded()
+        return self._content is not None
+
+    def get(self, force=False, get_redirect=False):
+        """Get the text of the latest revision.
+
+        Parameters
+        ----------
+        force : bool
+            If True, the page is loaded again, even if it has been
+            loaded before.
+        get_redirect : bool
+            Ignored, since there are no redirects. Only here to match
+            `pywikibot.Page.get()`.
+
+        Returns
+        -------
+        str
+
+        Raises
+        ------
+        NoPageError
+            If the page doesn't exist.
+        """
+        if force:
+            self._loaded = False
+        self._ensure_loaded()
+        if self._content is None:
+            raise NoPageError(self._title)
+        return self._content
+
+    def save(self, summary=None):
+        """Save `text` to the page.
+
+        Parameters
+        ----------
+        summary : str
+            Edit summary. Not stored.
+        """
+        text = self.text
+        revision_id = self._site._save(self._title, text)
+        self._set_state(text, revision_id)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            state = self._site._load([self._title]).get(self._title)
+            self._set_state(*(state or (None, None)))
+
+    def _set_state(self, content, revision_id):
+        """Set the state of the page, as loaded from the site.
+
+        Parameters
+        ----------
+        content : str
+            Text of the latest revision. None if the page doesn't
+            exist.
+        revision_id : int
+            Id of the latest revision. None if the page doesn't exist.
+        """
+        self._content = content
+        self._revision_id = revision_id
+        self._loaded = True
+
+
+class NoPageError(Exception):
+    def __init__(self, title):
+        message = f"Page '{title}' doesn't exist."
+        super().__init__(message)
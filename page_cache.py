@@ -0,0 +1,175 @@
+import logging
+import threading
+
+
+class PageCache:
+    """Identity map of wiki pages and what is known about them.
+
+    Keeps one page object per title together with its state, i.e.
+    whether it exists, its text and its latest revision id. The state
+    of a page is loaded at most once, unless it's invalidated by
+    saving the page. If several threads ask for the same page at once,
+    only one of them loads it and the others wait for the result.
+
+    Attributes
+    ----------
+    _site : PywikibotSite or LocalSite
+        Site backend that makes the page objects and loads them.
+    _pages : dict
+        Map of page titles to page objects.
+    _states : dict
+        Map of page titles to dicts with "exists", "text" and "revid".
+    _page_locks : dict
+        Map of page titles to locks that are held while the page is
+        loaded.
+    _stale : set
+        Titles of pages that have been saved since they were loaded.
+    _lock : threading.Lock
+        Guards the maps.
+    """
+
+    def __init__(self, site):
+        self._site = site
+        self._pages = {}
+        self._states = {}
+        self._page_locks = {}
+        self._stale = set()
+        self._lock = threading.Lock()
+
+    def get_page(self, title, namespace=None):
+        """Get the page object for a title.
+
+        The same object is returned every time a page is requested.
+
+        Parameters
+        ----------
+        title : str
+            Title of the page.
+        namespace : str
+            Namespace of the page. If None, the default namespace will
+            be used.
+
+        Returns
+        -------
+        Page
+        """
+        page = self._site.page(title, namespace)
+        with self._lock:
+            return self._pages.setdefault(page.title(), page)
+
+    def prefetch(self, pages):
+        """Load the state of pages in batches.
+
+        Pages are loaded 50 per request.
+
+        Parameters
+        ----------
+        pages : list
+            Pages to load. Pages that are already loaded are skipped.
+        """
+        with self._lock:
+            pages = [
+                page for page in dict.fromkeys(pages)
+                if page.title() not in self._states
+            ]
+        logging.info("Loading {} pages from the wiki.".format(len(pages)))
+        for page in self._site.preload(pages):
+            # Since the pages are preloaded, this doesn't make any
+            # more requests.
+            self._get_state(page)
+
+    def exists(self, page):
+        """Check if a page exists.
+
+        Parameters
+        ----------
+        page : Page
+
+        Returns
+        -------
+        bool
+        """
+        return self._get_state(page)["exists"]
+
+    def get_text(self, page):
+        """Get the text of a page, as it is on the wiki.
+
+        Parameters
+        ----------
+        page : Page
+
+        Returns
+        -------
+        str
+            The text of the latest revision. None if the page doesn't
+            exist.
+        """
+        return self._get_state(page)["text"]
+
+    def get_revision_id(self, page):
+        """Get the id of the latest revision of a page.
+
+        Parameters
+        ----------
+        page : Page
+
+        Returns
+        -------
+        int
+            The revision id. None if the page doesn't exist.
+        """
+        return self._get_state(page)["revid"]
+
+    def saved(self, page):
+        """Invalidate the state of a page after it has been saved.
+
+        The page is known to exist, but its text and revision will be
+        loaded again if they are needed.
+
+        Parameters
+        ----------
+        page : Page
+        """
+        title = page.title()
+        with self._lock:
+            self._states.pop(title, None)
+            self._stale.add(title)
+
+    def _get_state(self, page):
+        """Get the state of a page, loading it if needed.
+
+        Parameters
+        ----------
+        page : Page
+
+        Returns
+        -------
+        dict
+            Whether the page exists, its text and latest revision id.
+        """
+        title = page.title()
+        with self._lock:
+            state = self._states.get(title)
+            if state is not None:
+                return state
+            page_lock = self._page_locks.setdefault(title, threading.Lock())
+        with page_lock:
+            # Another thread may have loaded the page while this one
+            # was waiting.
+            with self._lock:
+                state = self._states.get(title)
+                reload = title in self._stale
+            if state is not None:
+                return state
+            if page.exists():
+                state = {
+                    "exists": True,
+                    "text": page.get(force=reload, get_redirect=True),
+                    "revid": page.latest_revision_id
+                }
+            else:
+                state = {"exists": False, "text": None, "revid": None}
+            with self._lock:
+                self._states[title] = state
+                self._stale.discard(title)
+            return state
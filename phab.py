@@ -1,10 +1,19 @@
 import logging
 import os
-from time import sleep, time
+import threading
+from time import perf_counter, sleep
 
-import pywikibot
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from cache import LookupCache
+from rate_limiter import RateLimiter
+
+# Endpoints that only read data and can safely be retried.
+IDEMPOTENT_ENDPOINTS = {"project.search"}
 
 
 class Phab:
@@ -14,19 +23,66 @@ class Phab:
 
     Attributes
     ----------
-    _config : dict
+    _config : PhabConfig
         Parameters read from configuration file.
     _dry_run : bool
         If True, no data is written to Phabricator.
-    _last_request_time : float
-        Time when last request was made, in seconds.
+    _rate_limiter : RateLimiter
+        Limits the rate of requests to Conduit.
+    _lookup_cache : LookupCache
+        Resolved project PHIDs and names, keyed by API URL and project
+        id, since the same cache file may be used for several sites.
+    _project_index : dict
+        Map of names and slugs of the parent project's subprojects to
+        their ids. None until `prefetch_projects` has been called.
+    _session : requests.Session
+        Session that keeps connections to the API open between
+        requests.
+    _stats : dict
+        Counters for requests, retries, opened connections and time
+        spent connecting.
+    _stats_lock : threading.Lock
+        Guards the counters, since requests can be made from several
+        threads.
+    _wiki_url : str
+        URL to the wiki's article path. Read from the config if it's
+        there, otherwise None until first needed.
+    _plan : Plan
+        If given, projects to create are recorded in this instead of
+        being created.
+    _journal : Journal
+        If given, added projects are recorded in this and projects
+        already in it are not looked up again.
     """
 
-    def __init__(self, main_config, dry_run):
-        self._config = main_config.get("phab")
-        self._wiki_config = main_config.get("wiki")
+    def __init__(self, main_config, dry_run, plan=None, journal=None):
+        self._config = main_config.phab
+        self._wiki_config = main_config.wiki
         self._dry_run = dry_run
-        self._last_request_time = 0.0
+        self._plan = plan
+        self._journal = journal
+        self._rate_limiter = RateLimiter.from_config(self._config)
+        self._lookup_cache = LookupCache(
+            self._config.cache_file,
+            self._config.cache_ttl
+        )
+        self._project_index = None
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "connections": 0,
+            "connect_time": 0.0
+        }
+        self._stats_lock = threading.Lock()
+        self._wiki_url = self._config.wiki_url
+        self._session = requests.Session()
+        adapter = _TimedAdapter(
+            self._record_connection,
+            pool_connections=1,
+            pool_maxsize=self._config.pool_size
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
         load_dotenv()
         self._api_token = os.getenv("PHAB_API_TOKEN")
 
@@ -52,8 +108,18 @@ class Phab:
             Project id and name of the project that was created.
 
         """
+        if self._journal is not None:
+            journaled = self._journal.get("phab_project", name_en)
+            if journaled is not None:
+                logging.info(
+                    "Project '{}' was added in a previous run.".format(
+                        journaled[1]
+                    )
+                )
+                return tuple(journaled)
+
         parent_phid, parent_name = \
-            self._get_project_phid_and_name(self._config["parent_project_id"])
+            self._get_project_phid_and_name(self._config.parent_project_id)
         phab_name_en = self._to_phab_project_name(name_en, parent_name)
         phab_name_sv = self._to_phab_project_name(name_sv, parent_name)
         project_id = self._get_project_id(phab_name_en)
@@ -65,38 +131,152 @@ class Phab:
             )
         else:
             description = self._make_description(description, name_sv)
-            parameters = {
-                "transactions": {
-                    "0": {
-                        "type": "name",
-                        "value": phab_name_en
-                    },
-                    "1": {
-                        "type": "slugs",
-                        "value": [phab_name_sv]
-                    },
-                    "2": {
-                        "type": "description",
-                        "value": description
-                    },
-                    "3": {
-                        "type": "parent",
-                        "value": parent_phid
-                    }
-                }
-            }
-            if self._dry_run:
-                logging.debug(f"MOCK REQUEST: {parameters}")
-                project_id = 1
+            if self._plan is not None:
+                self._plan.add_phab_project(
+                    phab_name_en,
+                    phab_name_sv,
+                    description,
+                    parent_phid
+                )
+                project_id = self._plan.phab_id_placeholder(phab_name_en)
             else:
-                response = self._make_request("project.edit", parameters)
-                project_id = response["result"]["object"]["id"]
+                project_id = self.create_project(
+                    phab_name_en,
+                    phab_name_sv,
+                    description,
+                    parent_phid
+                )
+            if self._project_index is not None:
+                self._index_project(project_id, phab_name_en)
+        if self._journal is not None:
+            self._journal.record(
+                "phab_project",
+                name_en,
+                [project_id, phab_name_en]
+            )
         return project_id, phab_name_en
 
+    def create_project(self, name, slug, description, parent_phid):
+        """Create a project.
+
+        Uses the Conduit endpoint "project.edit".
+
+        Parameters
+        ----------
+        name : str
+            Name of the project, following Wikimedia conventions.
+        slug : str
+            Additional hashtag for the project.
+        description : str
+            Description of the project.
+        parent_phid : str
+            PHID of the parent project.
+
+        Returns
+        -------
+        int
+            Id of the created project. 1 if this is a dry run.
+        """
+        parameters = {
+            "transactions": {
+                "0": {
+                    "type": "name",
+                    "value": name
+                },
+                "1": {
+                    "type": "slugs",
+                    "value": [slug]
+                },
+                "2": {
+                    "type": "description",
+                    "value": description
+                },
+                "3": {
+                    "type": "parent",
+                    "value": parent_phid
+                }
+            }
+        }
+        if self._dry_run:
+            logging.debug(f"MOCK REQUEST: {parameters}")
+            return 1
+        response = self._make_request("project.edit", parameters)
+        return response["result"]["object"]["id"]
+
+    def prefetch_projects(self):
+        """Index all existing subprojects of the parent project.
+
+        Pages through the subprojects with the Conduit endpoint
+        "project.search". After this, `_get_project_id` looks up
+        projects in the index instead of searching for each of them.
+
+        """
+        parent_phid, parent_name = \
+            self._get_project_phid_and_name(self._config.parent_project_id)
+        self._project_index = {}
+        after = None
+        while True:
+            parameters = {
+                "constraints": {"parents": [parent_phid]},
+                "limit": 100
+            }
+            if after is not None:
+                parameters["after"] = after
+            response = self._make_request("project.search", parameters)
+            for project in response["result"]["data"]:
+                self._index_project(
+                    project["id"],
+                    project["fields"]["name"],
+                    project["fields"].get("slug")
+                )
+            after = response["result"]["cursor"]["after"]
+            if after is None:
+                break
+        logging.info(
+            "Found {} existing subprojects of '{}'.".format(
+                len(set(self._project_index.values())),
+                parent_name
+            )
+        )
+
+    def _index_project(self, id_, name, slug=None):
+        """Add a project to the project index.
+
+        Parameters
+        ----------
+        id_ : int
+            Id of the project.
+        name : str
+            Name of the project.
+        slug : str
+            Primary hashtag of the project. If not given, it's derived
+            from the name.
+        """
+        self._project_index[name] = id_
+        if slug is None:
+            slug = self._to_slug(name)
+        self._project_index[slug] = id_
+
+    def _to_slug(self, name):
+        """Convert a project name to the hashtag Phabricator makes from it.
+
+        Parameters
+        ----------
+        name : str
+            Project name.
+
+        Returns
+        -------
+        str
+            Name in lower case with spaces replaced by underscores.
+        """
+        return name.lower().replace(" ", "_")
+
     def _get_project_phid_and_name(self, id_):
         """Get the PHID and name of a project.
 
-        Uses the Conduit endpoint "project.search".
+        Uses the Conduit endpoint "project.search". The result is
+        cached, so each project is only looked up once.
 
         Parameters
         ----------
@@ -113,10 +293,18 @@ class Phab:
             Name of the given project.
 
         """
+        cache_key = f"{self._config.api_url} project:{id_}"
+        cached = self._lookup_cache.get(cache_key)
+        if cached is not None:
+            logging.debug(f"Using cached PHID and name for project {id_}.")
+            phid, name = cached
+            return phid, name
+
         parameters = {"constraints": {"ids": [id_]}}
         response = self._make_request("project.search", parameters)
         phid = response["result"]["data"][0]["phid"]
         name = response["result"]["data"][0]["fields"]["name"]
+        self._lookup_cache.set(cache_key, [phid, name])
         return phid, name
 
     def _make_request(self, endpoint, parameters_dict):
@@ -139,35 +327,152 @@ class Phab:
         PhabApiError
             If the Conduit API response contains an error.
         """
-        wait_time = self._last_request_time - time() + \
-            self._config["request_delay"]
-        if wait_time > 0:
-            logging.debug("Waiting for {} seconds before making the next request to Conduit.".format(wait_time))  # noqa: E501
-            sleep(wait_time)
         parameters = self._to_phab_parameters(parameters_dict)
         # Add placeholder API token to not reveal the real one in logs.
         logged_parameters = parameters.copy()
         logged_parameters["api.token"] = "api-REDACTED"
         logging.debug(
             "POST to Phabricator API on {}/{}: {}".format(
-                self._config["api_url"],
+                self._config.api_url,
                 endpoint,
                 logged_parameters
             )
         )
         parameters["api.token"] = self._api_token
-        self._last_request_time = time()
-        response = requests.post(
-            "{}/{}".format(self._config["api_url"], endpoint),
-            parameters
-        ).json()
+        response = self._post(
+            "{}/{}".format(self._config.api_url, endpoint),
+            parameters,
+            endpoint in IDEMPOTENT_ENDPOINTS
+        )
         if response["error_info"]:
+            self._rate_limiter.backoff()
             raise PhabApiError("Error from Phabricator API: {}".format(
                 response["error_info"]
             ))
+        self._rate_limiter.recover()
         logging.debug("Response: {}".format(response))
         return response
 
+    def _post(self, url, parameters, retry):
+        """Send a POST request in the session.
+
+        Waits for the rate limiter before each attempt. Transient
+        errors, i.e. connection errors, timeouts and server errors,
+        lower the request rate and are retried with exponential backoff
+        if `retry` is True.
+
+        Parameters
+        ----------
+        url : str
+            URL to send the request to.
+        parameters : dict
+            Parameters in the Conduit format.
+        retry : bool
+            Whether the request can be retried.
+
+        Returns
+        -------
+        dict
+            Response from the API, parsed from Json.
+
+        Raises
+        ------
+        RequestException
+            If the request fails and can't be retried.
+        """
+        if retry:
+            attempts = self._config.retries + 1
+        else:
+            attempts = 1
+        for attempt in range(attempts):
+            self._rate_limiter.acquire()
+            self._add_to_stats("requests")
+            try:
+                response = self._session.post(
+                    url,
+                    parameters,
+                    timeout=self._config.timeout
+                )
+                response.raise_for_status()
+                return response.json()
+            except RequestException as error:
+                if self._is_transient(error):
+                    self._rate_limiter.backoff()
+                if attempt == attempts - 1 or not self._is_transient(error):
+                    raise
+                wait_time = self._config.retry_backoff * 2**attempt
+                logging.warning(
+                    "Request to Conduit failed: {}. Retrying in {} "
+                    "seconds.".format(error, wait_time)
+                )
+                self._add_to_stats("retries")
+                sleep(wait_time)
+
+    def _is_transient(self, error):
+        """Check if a request error is likely to go away on retry.
+
+        Parameters
+        ----------
+        error : RequestException
+            The error raised for the request.
+
+        Returns
+        -------
+        bool
+            True if there was no response, e.g. because of a connection
+            error or timeout, or if the response had a server error or
+            rate limit status.
+        """
+        if error.response is None:
+            return True
+        status = error.response.status_code
+        return status >= 500 or status == 429
+
+    def _add_to_stats(self, counter, value=1):
+        """Add to one of the request counters.
+
+        Parameters
+        ----------
+        counter : str
+            Name of the counter.
+        value : int or float
+            Value to add.
+        """
+        with self._stats_lock:
+            self._stats[counter] += value
+
+    def _record_connection(self, connect_time):
+        """Count a new connection to the API.
+
+        Parameters
+        ----------
+        connect_time : float
+            Time in seconds it took to connect, including TLS handshake.
+        """
+        self._add_to_stats("connections")
+        self._add_to_stats("connect_time", connect_time)
+
+    def log_report(self):
+        """Log statistics for the requests made to Conduit."""
+        logging.info(
+            "Made {} requests to Conduit, {} of them retries.".format(
+                self._stats["requests"],
+                self._stats["retries"]
+            )
+        )
+        logging.info(
+            "Opened {} connections, spending {:.2f} seconds on connecting "
+            "and TLS handshakes.".format(
+                self._stats["connections"],
+                self._stats["connect_time"]
+            )
+        )
+        logging.info(
+            "Waited {:.2f} seconds in the rate limiter.".format(
+                self._rate_limiter.wait_time
+            )
+        )
+
     def _to_phab_parameters(
             self,
             dict_parameters,
@@ -221,27 +526,25 @@ class Phab:
         if phab_parameters is None:
             phab_parameters = {}
         for key, value in dict_parameters.items():
+            if top:
+                parameter_name = key
+            else:
+                parameter_name = "{}[{}]".format(prefix, key)
             if type(value) is dict:
-                if top:
-                    new_prefix = "{}{}".format(prefix, key)
-                else:
-                    new_prefix = "{}[{}]".format(prefix, key)
                 new_parameters = \
                     self._to_phab_parameters(
                         value,
                         phab_parameters,
-                        new_prefix,
+                        parameter_name,
                         False
                     )
                 phab_parameters.update(new_parameters)
             elif type(value) is list:
                 for index, item in enumerate(value):
-                    parameter_key = \
-                        "{}[{}][{}]".format(prefix, key, index)
+                    parameter_key = "{}[{}]".format(parameter_name, index)
                     phab_parameters[parameter_key] = item
             else:
-                parameter_key = "{}[{}]".format(prefix, key)
-                phab_parameters[parameter_key] = value
+                phab_parameters[parameter_name] = value
         return phab_parameters
 
     def _to_phab_project_name(self, name, parent_name):
@@ -266,6 +569,10 @@ class Phab:
     def _get_project_id(self, name):
         """Get the id of a project.
 
+        Uses the project index if `prefetch_projects` has been called,
+        otherwise searches for the project. Only projects with exactly
+        the given name or hashtag are matched.
+
         Parameters
         ----------
         name : str
@@ -274,15 +581,23 @@ class Phab:
         Returns
         -------
         int
-            Project id.
+            Project id. None if there is no such project.
 
         """
+        if self._project_index is not None:
+            project_id = self._project_index.get(name)
+            if project_id is None:
+                project_id = self._project_index.get(self._to_slug(name))
+            return project_id
+
         parameters = {"constraints": {"query": name}}
         response = self._make_request("project.search", parameters)
-        if len(response["result"]["data"]) == 0:
-            return None
-        else:
-            return response["result"]["data"][0]["id"]
+        for project in response["result"]["data"]:
+            fields = project["fields"]
+            if name == fields["name"] or \
+                    self._to_slug(name) == fields.get("slug"):
+                return project["id"]
+        return None
 
     def _make_description(self, description, name_sv):
         """Make a project description.
@@ -301,15 +616,70 @@ class Phab:
         str
             Project description.
         """
-        siteinfo = pywikibot.Site().siteinfo
-        article_path = (siteinfo.get('articlepath').removesuffix('$1')
-                        .removesuffix('/'))
-        wiki_url = f"{siteinfo.get('server')}{article_path}"
-        project_namespace = self._wiki_config.get("project_namespace")
+        if self._wiki_url is None:
+            # Imported here, since loading Pywikibot is slow and it's
+            # only needed when the wiki URL isn't in the config.
+            import pywikibot
+            siteinfo = pywikibot.Site().siteinfo
+            article_path = (siteinfo.get('articlepath').removesuffix('$1')
+                            .removesuffix('/'))
+            self._wiki_url = f"{siteinfo.get('server')}{article_path}"
+        wiki_url = self._wiki_url
+        project_namespace = self._wiki_config.project_namespace
         return (f"//[[{wiki_url}/{project_namespace}:{name_sv} | "
                 f"More project information (in Swedish)]]//\n\n{description}")
 
 
+class _TimedAdapter(HTTPAdapter):
+    """Transport adapter that records connections opened by its pools.
+
+    Attributes
+    ----------
+    _on_connect : callable
+        Called with the time in seconds it took to connect, every time
+        a connection is opened.
+    """
+
+    def __init__(self, on_connect, *args, **kwargs):
+        self._on_connect = on_connect
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": self._timed_pool_class(HTTPConnectionPool),
+            "https": self._timed_pool_class(HTTPSConnectionPool)
+        }
+
+    def _timed_pool_class(self, pool_class):
+        """Make a connection pool class that times new connections.
+
+        Parameters
+        ----------
+        pool_class : type
+            Connection pool class to extend.
+
+        Returns
+        -------
+        type
+            Subclass of `pool_class` with connections that report the
+            time it took when they connect.
+        """
+        on_connect = self._on_connect
+
+        class TimedConnection(pool_class.ConnectionCls):
+            def connect(self):
+                start = perf_counter()
+                super().connect()
+                on_connect(perf_counter() - start)
+
+        return type(
+            "Timed" + pool_class.__name__,
+            (pool_class,),
+            {"ConnectionCls": TimedConnection}
+        )
+
+
 class PhabApiError(Exception):
     """Raised when Conduit API returns an error."""
     pass
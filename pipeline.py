@@ -0,0 +1,257 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter
+
+# Put in a queue after the last item.
+_STOP = object()
+
+
+class Pipeline:
+    """Runs items through stages that work at the same time.
+
+    Each stage runs in its own thread and gets its items from a
+    bounded queue, which is filled by the previous stage. This allows
+    e.g. the second stage to work on one item while the first stage
+    works on the next one. Items keep their order through the
+    pipeline. If a stage returns None for an item, that item is not
+    passed on to the following stages.
+
+    If a stage fails on an item, no new items are taken in and the
+    items after the failing one are dropped, but the items before it
+    still pass through all the stages. Since items keep their order,
+    these are the items in the stages after the failing one.
+
+    Attributes
+    ----------
+    _stages : list
+        The stages, as dicts with name, function and number of workers.
+    _queue_size : int
+        Maximum number of items waiting between two stages.
+    _error : BaseException
+        First exception raised by a stage. None if no stage has failed.
+    _failed_stage : int
+        Index of the last stage in the pipeline that has failed. -1 if
+        no stage has failed. This stage and the ones before it only
+        have items that come after a failing item.
+    _lock : threading.Lock
+        Guards the error and the statistics.
+    stats : dict
+        Map of stage names to dicts with number of items in and out and
+        the time spent on processing them, in seconds.
+    """
+
+    def __init__(self, queue_size=4):
+        self._stages = []
+        self._queue_size = queue_size
+        self._error = None
+        self._failed_stage = -1
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def add_stage(self, name, function, workers=1):
+        """Add a stage at the end of the pipeline.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage, used in the report.
+        function : callable
+            Called with each item. The return value is passed on to the
+            next stage.
+        workers : int
+            Number of items that the stage processes at the same time.
+            If more than one, the items are processed in a thread pool.
+        """
+        self._stages.append({
+            "name": name,
+            "function": function,
+            "workers": workers
+        })
+        self.stats[name] = {"in": 0, "out": 0, "time": 0.0}
+
+    def run(self, items):
+        """Run items through all the stages.
+
+        Returns when all items have passed the last stage, or when a
+        stage fails.
+
+        Parameters
+        ----------
+        items : iterable
+            Items for the first stage.
+
+        Raises
+        ------
+        Exception
+            The first exception raised by a stage, after the items
+            before the failing one have passed all the stages.
+        """
+        queues = [queue.Queue(self._queue_size)]
+        threads = []
+        executors = []
+        for index, stage in enumerate(self._stages):
+            output = queue.Queue(max(self._queue_size, stage["workers"]))
+            if stage["workers"] > 1:
+                executor = ThreadPoolExecutor(
+                    max_workers=stage["workers"],
+                    thread_name_prefix=stage["name"]
+                )
+                executors.append(executor)
+            else:
+                executor = None
+            thread = threading.Thread(
+                target=self._run_stage,
+                args=(index, queues[-1], output, executor),
+                name=stage["name"]
+            )
+            thread.start()
+            threads.append(thread)
+            queues.append(output)
+        # Results from the last stage aren't used, so just consume them.
+        drain = threading.Thread(target=self._drain, args=(queues[-1],))
+        drain.start()
+        threads.append(drain)
+
+        try:
+            for item in items:
+                if self._error is not None:
+                    break
+                queues[0].put(item)
+        finally:
+            queues[0].put(_STOP)
+            for thread in threads:
+                thread.join()
+            for executor in executors:
+                executor.shutdown()
+        if self._error is not None:
+            raise self._error
+
+    def _run_stage(self, index, input_, output, executor):
+        """Process items from a queue until it's stopped.
+
+        Items are dropped if this stage, or a stage after it, has
+        failed, or if an earlier item failed in the previous stage.
+
+        Parameters
+        ----------
+        index : int
+            Index of the stage to run.
+        input_ : queue.Queue
+            Queue to get items from.
+        output : queue.Queue
+            Queue to put processed items in. If `executor` is given,
+            futures for the items are put in it instead.
+        executor : ThreadPoolExecutor
+            Executor to process items in. If None, items are processed
+            in this thread.
+        """
+        stage = self._stages[index]
+        input_failed = False
+        while True:
+            item = input_.get()
+            if item is _STOP:
+                break
+            if input_failed or self._failed_stage >= index:
+                # Keep taking items, so that the previous stage isn't
+                # blocked, but don't process them.
+                continue
+            if isinstance(item, Future):
+                try:
+                    item = item.result()
+                except BaseException as error:
+                    # The items after this one in the queue come after
+                    # it.
+                    input_failed = True
+                    self._fail(index - 1, error)
+                    continue
+            if item is None:
+                continue
+            try:
+                if executor is None:
+                    result = self._process(stage, item)
+                    if result is not None:
+                        output.put(result)
+                else:
+                    output.put(executor.submit(self._process, stage, item))
+            except BaseException as error:
+                self._fail(index, error)
+        output.put(_STOP)
+
+    def _process(self, stage, item):
+        """Process one item and record statistics.
+
+        Parameters
+        ----------
+        stage : dict
+            The stage to process the item in.
+        item : object
+            The item to process.
+
+        Returns
+        -------
+        object
+            What the stage's function returned.
+        """
+        start = perf_counter()
+        result = stage["function"](item)
+        with self._lock:
+            stats = self.stats[stage["name"]]
+            stats["in"] += 1
+            if result is not None:
+                stats["out"] += 1
+            stats["time"] += perf_counter() - start
+        return result
+
+    def _drain(self, input_):
+        """Wait for the items from the last stage.
+
+        Parameters
+        ----------
+        input_ : queue.Queue
+            Output queue of the last stage.
+        """
+        while True:
+            item = input_.get()
+            if item is _STOP:
+                break
+            if isinstance(item, Future):
+                try:
+                    item.result()
+                except BaseException as error:
+                    self._fail(len(self._stages) - 1, error)
+
+    def _fail(self, index, error):
+        """Stop the pipeline because a stage failed.
+
+        Parameters
+        ----------
+        index : int
+            Index of the stage that failed.
+        error : BaseException
+            The exception that was raised.
+        """
+        with self._lock:
+            logging.error(
+                "Stage '{}' failed: {}".format(
+                    self._stages[index]["name"],
+                    error
+                )
+            )
+            if self._error is None:
+                self._error = error
+            self._failed_stage = max(self._failed_stage, index)
+
+    def log_report(self):
+        """Log the number of items and the time spent in each stage."""
+        logging.info("Time spent in each stage:")
+        for name, stats in self.stats.items():
+            logging.info(
+                "{}: {:.2f} seconds for {} items ({} passed on).".format(
+                    name,
+                    stats["time"],
+                    stats["in"],
+                    stats["out"]
+                )
+            )
@@ -0,0 +1,170 @@
+import json
+import logging
+import threading
+
+
+class Plan:
+    """Changes that a run would make, recorded instead of made.
+
+    A plan is made by running with Phab and Wiki in plan mode, where
+    everything is read as usual but nothing is written. It can then be
+    saved to a Json file, reviewed and applied later.
+
+    Phabricator projects that don't exist yet have no id when the plan
+    is made. Their ids are replaced by placeholders in page texts,
+    which are filled in when the projects are created.
+
+    Attributes
+    ----------
+    phab_projects : list
+        Phabricator projects to create, as dicts with name, slug,
+        description and parent PHID.
+    pages : list
+        Pages to write, as dicts with title, the rendered text and the
+        id of the revision the text was based on. The text is
+        substituted and merged with the page when the plan is
+        applied.
+    template_rows : list
+        Rows to add to the project name and number templates, as dicts
+        with template title and rows. These are already included in
+        the template texts in `pages` and are only for review.
+    _lock : threading.Lock
+        Guards the lists, since several stages record changes at the
+        same time.
+    """
+
+    def __init__(self, phab_projects=None, pages=None, template_rows=None):
+        self.phab_projects = phab_projects or []
+        self.pages = pages or []
+        self.template_rows = template_rows or []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def phab_id_placeholder(name):
+        """Make a placeholder for the id of a Phabricator project.
+
+        Parameters
+        ----------
+        name : str
+            Name of the Phabricator project.
+
+        Returns
+        -------
+        str
+        """
+        return "<PHAB_ID:{}>".format(name)
+
+    def add_phab_project(self, name, slug, description, parent_phid):
+        """Record a Phabricator project to create.
+
+        Parameters
+        ----------
+        name : str
+            Name of the project.
+        slug : str
+            Additional hashtag for the project.
+        description : str
+            Description of the project.
+        parent_phid : str
+            PHID of the parent project.
+        """
+        with self._lock:
+            self.phab_projects.append({
+                "name": name,
+                "slug": slug,
+                "description": description,
+                "parent": parent_phid
+            })
+
+    def add_page(self, title, text, revision_id):
+        """Record a page to write.
+
+        Parameters
+        ----------
+        title : str
+            Full title of the page, including namespace.
+        text : str
+            Text to write, before substitution and merging.
+        revision_id : int
+            Id of the latest revision when the plan was made. None if
+            the page doesn't exist.
+        """
+        with self._lock:
+            self.pages.append({
+                "title": title,
+                "text": text,
+                "revision_id": revision_id
+            })
+
+    def add_template_rows(self, title, rows):
+        """Record rows to add to a template.
+
+        Parameters
+        ----------
+        title : str
+            Title of the template.
+        rows : list
+            The rows to add.
+        """
+        if not rows:
+            return
+        with self._lock:
+            self.template_rows.append({"title": title, "rows": rows})
+
+    def resolve_phab_ids(self, phab_ids):
+        """Replace Phabricator id placeholders in page texts.
+
+        Parameters
+        ----------
+        phab_ids : dict
+            Map of Phabricator project names to their ids.
+        """
+        for page in self.pages:
+            for name, id_ in phab_ids.items():
+                page["text"] = page["text"].replace(
+                    self.phab_id_placeholder(name),
+                    str(id_)
+                )
+
+    def save(self, path):
+        """Write the plan to a Json file.
+
+        Parameters
+        ----------
+        path : str
+        """
+        with open(path, "w") as file_:
+            json.dump(
+                {
+                    "phab_projects": self.phab_projects,
+                    "pages": self.pages,
+                    "template_rows": self.template_rows
+                },
+                file_,
+                ensure_ascii=False,
+                indent=2
+            )
+        logging.info(
+            "Wrote plan with {} Phabricator projects and {} pages to "
+            "'{}'.".format(len(self.phab_projects), len(self.pages), path)
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Read a plan from a Json file.
+
+        Parameters
+        ----------
+        path : str
+
+        Returns
+        -------
+        Plan
+        """
+        with open(path) as file_:
+            data = json.load(file_)
+        return cls(
+            data["phab_projects"],
+            data["pages"],
+            data["template_rows"]
+        )
@@ -3,14 +3,19 @@
 import argparse
 import csv
 import datetime
+import json
 import logging
-from collections import OrderedDict
-
-import yaml
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from time import perf_counter
 
+from config import ConfigError, load_config
 from const import Components
-from phab import Phab
-from wiki import Wiki
+from goal_table import GoalTable
+from journal import Journal
+from pipeline import Pipeline
+from plan import Plan
 
 
 def setup_logging(verbose):
@@ -60,8 +65,8 @@ def pick_components():
         "Phabricator project",
         "Categories"
     ]
-    subpages = config["wiki"]["subpages"]
-    options += [s["title"] for s in subpages]
+    subpages = config.wiki.subpages
+    options += [s.title for s in subpages]
     for i, option in enumerate(options, start=1):
         print("{}: {}".format(i, option))
 
@@ -88,29 +93,137 @@ def pick_components():
     return selection
 
 
+def uses_wiki(components):
+    """Check if any of the selected components are on the wiki.
+
+    Parameters
+    ----------
+    components : list
+        Numbers of the selected components. None if all components are
+        selected.
+
+    Returns
+    -------
+    bool
+    """
+    return components is None or any(
+        c != Components.PHABRICATOR.value for c in components
+    )
+
+
+def uses_phab(components):
+    """Check if Phabricator is among the selected components.
+
+    Parameters
+    ----------
+    components : list
+        Numbers of the selected components. None if all components are
+        selected.
+
+    Returns
+    -------
+    bool
+    """
+    return components is None or Components.PHABRICATOR.value in components
+
+
+def create_wiki(*args):
+    """Create a `Wiki`.
+
+    The wiki module is imported here rather than at the top, since it
+    loads Pywikibot, which is slow and not needed unless the wiki is
+    used.
+
+    Parameters
+    ----------
+    args
+        Passed on to `Wiki`.
+
+    Returns
+    -------
+    Wiki
+    """
+    from wiki import Wiki
+    return Wiki(*args)
+
+
+def create_site(backend, database, latency):
+    """Create the site backend that the wiki is reached through.
+
+    Parameters
+    ----------
+    backend : str
+        "pywikibot" for the wiki configured for Pywikibot or "local"
+        for a local database.
+    database : str
+        Path to the database file for the local backend.
+    latency : float
+        Simulated time in seconds for each request to the local
+        backend.
+
+    Returns
+    -------
+    PywikibotSite or LocalSite
+    """
+    if backend == "local":
+        from local_site import LocalSite
+        logging.info(
+            "Using local wiki backend with database '{}'.".format(database)
+        )
+        return LocalSite(database, latency)
+    from site_backend import PywikibotSite
+    return PywikibotSite()
+
+
+def create_phab(*args):
+    """Create a `Phab`.
+
+    The phab module is imported here rather than at the top, since it
+    loads Requests, which isn't needed unless Phabricator is used.
+
+    Parameters
+    ----------
+    args
+        Passed on to `Phab`.
+
+    Returns
+    -------
+    Phab
+    """
+    from phab import Phab
+    return Phab(*args)
+
+
 def read_goals(tsv, settings):
     """Read goal values from tab separated data.
 
+    Rows are read one at a time. The project names are read from the
+    project row into a list with one project per column, which is then
+    used to look up the project for each goal value.
+
     Parameters
     ----------
     tsv : iterator
         Gives one list per row from tab separated data.
-    settings: dict
+    settings: GoalsConfig
         Goals settings from the config
 
     Returns
     -------
-    dict
-        Map of project names to dicts that maps goal name to planned
-        value.
+    GoalTable
+        Planned values for each project and goal.
     dict
         Map of goal names to goal fulfillment texts.
     """
-    goals = OrderedDict()
+    first_project_column = column_index(settings.first_project_column)
+    # Project for each column, starting with the first project
+    # column. None for columns without a project.
+    column_projects = []
+    goals = {}
     fulfillments = {}
     for i, unsanitized_row in enumerate(tsv):
         row = sanitize(unsanitized_row)
-        if i == settings["last_row"]:
+        if i == settings.last_row:
             # Stop reading when we all projects have been read.
             break
         elif row[0] == "":
@@ -122,36 +235,39 @@ def read_goals(tsv, settings):
         fulfillment = row[1]
         if fulfillment:
             fulfillments[name] = fulfillment
-        # Convert alphabetic label of column to numeric one where A = 0
-        first_project_column = ord(settings["first_project_column"]) - 65
-        for j, field in enumerate(row):
-            if j >= first_project_column:
-                if i == settings["project_row"]:
-                    # Add keys for all of the projects. Since we
-                    # use an ordered dictionary, this allows us to
-                    # find the correct project when we add goal
-                    # values.
-                    project = field
-                    if project == "":
-                        # Temporarily add empty columns to maintain
-                        # the indices.
-                        goals[j] = None
-                    else:
-                        # Use ordered dictionary here to keep the
-                        # order of the goals when they are added to
-                        # the template.
-                        goals[project] = OrderedDict()
-                elif i > settings["project_row"]:
-                    planned_value = field
-                    project_index = j - first_project_column
-                    project_name = list(goals.keys())[project_index]
-                    if planned_value:
-                        goals[project_name][name] = planned_value
-    # Remove any empty columns.
-    goals = {k: v for k, v in goals.items() if v}
-    # Make it a normal dictionary, since we don't need to keep track
-    # of project indices anymore.
-    return dict(goals), fulfillments
+        if i == settings.project_row:
+            for project in row[first_project_column:]:
+                if project == "":
+                    column_projects.append(None)
+                else:
+                    # Dicts keep the order of the goals when they are
+                    # added to the template.
+                    column_projects.append(goals.setdefault(project, {}))
+        elif i > settings.project_row:
+            values = zip(column_projects, row[first_project_column:])
+            for project_goals, planned_value in values:
+                if planned_value and project_goals is not None:
+                    project_goals[name] = planned_value
+    return GoalTable(goals), fulfillments
+
+
+def column_index(label):
+    """Convert an alphabetic column label to a numeric index.
+
+    Parameters
+    ----------
+    label : str
+        Column label as in a spreadsheet, e.g. "F" or "AA".
+
+    Returns
+    -------
+    int
+        Index of the column, where A = 0, Z = 25 and AA = 26.
+    """
+    index = 0
+    for letter in label.upper():
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
 
 
 def sanitize(unsanitized):
@@ -218,57 +334,56 @@ def is_active(project_information, project_columns):
     return project_information.get(project_columns.get("active")) == "1"
 
 
-def add_wiki_project_pages(project_information, project_columns,
-                           phab_id, phab_name):
-    """Add a project page to the wiki.
-
-    Also adds relevant subpages.
-
-    Parameters
-    ----------
-    project_information : dict
-    project_columns: dict
-    phab_id : int
-        Id of the project on Phabricator.
-    phab_name : str
-        Name of the project on Phabricator
-    """
-    logging.info("Adding wiki pages.")
-    wiki.add_project_page(
-        project_information,
-        phab_id,
-        phab_name
-    )
-
-
 def add_phab_project(project_information, project_columns):
     """Add a project on Phabricator.
 
+    Subprojects and projects missing from the goals file are skipped.
+
     Parameters
     ----------
     project_information : dict
     project_columns: dict
+
+    Returns
+    -------
+    tuple
+        Project information and project id and name of the Phabricator
+        project. Id and name are empty strings if Phabricator isn't
+        among the selected components. None if the project is skipped.
     """
-    logging.info("Adding Phabricator project.")
+    if not should_process(project_information, project_columns):
+        return None
+    if components is not None and \
+            Components.PHABRICATOR.value not in components:
+        return project_information, "", ""
+
     name_en = project_information[project_columns["english_name"]]
     name_sv = project_information[project_columns["swedish_name"]]
     description = project_information[project_columns["about_english"]]
-    return phab.add_project(name_en, name_sv, description)
+    logging.info("Adding Phabricator project for '{}'.".format(name_sv))
+    phab_id, phab_name = phab.add_project(name_en, name_sv, description)
+    return project_information, phab_id, phab_name
 
 
-def process_project(project_information, project_columns):
-    """Process a single project.
+def should_process(project_information, project_columns):
+    """Check if a project should be processed.
 
     Parameters
     ----------
     project_information : dict
     project_columns : dict
+
+    Returns
+    -------
+    bool
+        False for subprojects and projects that are missing from the
+        goals file, if one is given, else True.
     """
     superproject = project_information[project_columns["super_project"]]
     project_name = project_information[project_columns["english_name"]]
     if superproject:
         # Don't add anything for subprojects.
-        return
+        return False
     if goals and project_name not in goals:
         logging.warning(
             "Project name '{}' found in projects file, but not in goals file. "
@@ -276,29 +391,304 @@ def process_project(project_information, project_columns):
             "don't require goal information, run without the goal "
             "file.".format(project_name)
         )
-        return
+        return False
+    return True
+
+
+def add_wiki_main_page(project, project_columns):
+    """Add the main project page to the wiki.
+
+    Parameters
+    ----------
+    project : tuple
+        Project information and project id and name of the Phabricator
+        project.
+    project_columns: dict
+
+    Returns
+    -------
+    tuple
+        The same as `project`.
+    """
+    project_information, phab_id, phab_name = project
     logging.info(
-        "Processing project '{}'.".format(
+        "Adding wiki pages for '{}'.".format(
             project_information[project_columns["swedish_name"]]
         )
     )
-    if components is None or Components.PHABRICATOR.value in components:
-        phab_id, phab_name = add_phab_project(
-            project_information,
-            project_columns
-        )
-    else:
-        phab_id = phab_name = ""
-    add_wiki_project_pages(project_information, project_columns,
-                           phab_id, phab_name)
-    if goals:
-        goals[project_name]["added"] = True
+    wiki.add_project_main_page(project_information, phab_id, phab_name)
+    return project
+
+
+def add_wiki_subpages(project, project_columns):
+    """Add subpages and categories to the wiki.
+
+    Also stores the project for the year pages and marks it as added.
+
+    Parameters
+    ----------
+    project : tuple
+        Project information and project id and name of the Phabricator
+        project.
+    project_columns: dict
+
+    Returns
+    -------
+    tuple
+        The same as `project`.
+    """
+    project_information = project[0]
+    wiki.add_project_subpages(project_information)
+    project_name = project_information[project_columns["english_name"]]
+    added_projects.add(project_name)
     wiki.add_project(
         project_information[project_columns["project_number"]],
         project_information[project_columns["swedish_name"]],
         project_information[project_columns["english_name"]],
         project_information[project_columns["program"]]
     )
+    return project
+
+
+def is_selected(project_information, project_columns, single_project):
+    """Check if a row in the projects file should be read as a project.
+
+    Parameters
+    ----------
+    project_information : dict
+        A sanitized row from the projects file.
+    project_columns : dict
+    single_project : str
+        English or Swedish name of the only project to read. If None,
+        all active projects are read.
+
+    Returns
+    -------
+    bool
+    """
+    if not project_information[project_columns["swedish_name"]]:
+        # Check if there is a name and skip if not. This is
+        # likely a row that has some text, but not actually
+        # project information.
+        return False
+
+    if single_project:
+        return single_project in (
+            project_information[project_columns["swedish_name"]],
+            project_information[project_columns["english_name"]]
+        )
+    # handle skip outside of should_process to allow specifying a
+    # single project to override the skip value.
+    return is_active(project_information, project_columns)
+
+
+def read_project(project_information, project_columns, single_project):
+    """Read a project from a row in the projects file.
+
+    Parameters
+    ----------
+    project_information : dict
+        A sanitized row from the projects file.
+    project_columns : dict
+    single_project : str
+        English or Swedish name of the only project to read. If None,
+        all active projects are read.
+
+    Returns
+    -------
+    dict
+        The project information. None if the row isn't a project that
+        should be read.
+    """
+    if not is_selected(project_information, project_columns,
+                       single_project):
+        if project_information[project_columns["swedish_name"]] and \
+                not single_project:
+            logging.info(
+                "Skipping '{}', marked as inactive.".format(
+                    project_information[
+                        project_columns["english_name"]]))
+        return None
+
+    if single_project and wiki is not None:
+        wiki.single_project_info(
+            project_information[project_columns["project_number"]],
+            project_information[project_columns["swedish_name"]]
+        )
+    return project_information
+
+
+def process_projects(projects, project_columns, single_project,
+                     phab_workers):
+    """Process projects in a pipeline.
+
+    The stages are parsing, adding Phabricator project, adding wiki
+    main page and adding wiki subpages and categories. They work at
+    the same time, e.g. the wiki pages for one project can be written
+    while the Phabricator project for the next one is added. Projects
+    are handled in the order they appear in the projects file, except
+    that up to `phab_workers` Phabricator projects are added
+    concurrently.
+
+    Parameters
+    ----------
+    projects : list
+        Sanitized rows from the projects file.
+    project_columns : dict
+    single_project : str
+        English or Swedish name of the only project to process. If
+        None, all active projects are processed.
+    phab_workers : int
+        Maximum number of Phabricator projects to add at the same time.
+
+    Returns
+    -------
+    Pipeline
+        The pipeline that processed the projects. Its stats contain
+        the number of projects and time spent in each stage.
+    """
+    pipeline = Pipeline(max(4, phab_workers))
+    pipeline.add_stage(
+        "parse",
+        lambda row: read_project(row, project_columns, single_project)
+    )
+    pipeline.add_stage(
+        "Phabricator project",
+        lambda project: add_phab_project(project, project_columns),
+        phab_workers
+    )
+    if wiki is not None:
+        pipeline.add_stage(
+            "wiki main page",
+            lambda project: add_wiki_main_page(project, project_columns)
+        )
+        pipeline.add_stage(
+            "wiki subpages and categories",
+            lambda project: add_wiki_subpages(project, project_columns)
+        )
+    pipeline.run(projects)
+    return pipeline
+
+
+def apply_plan(plan, phab_workers):
+    """Make the changes in a plan.
+
+    First creates the Phabricator projects, then fills in their ids in
+    the page texts and writes the pages.
+
+    Parameters
+    ----------
+    plan : Plan
+        Plan made by an earlier run with `--plan`.
+    phab_workers : int
+        Maximum number of Phabricator projects to create at the same
+        time.
+    """
+    logging.info(
+        "Creating {} Phabricator projects.".format(len(plan.phab_projects))
+    )
+    with ThreadPoolExecutor(max_workers=phab_workers) as executor:
+        ids = executor.map(
+            lambda project: phab.create_project(
+                project["name"],
+                project["slug"],
+                project["description"],
+                project["parent"]
+            ),
+            plan.phab_projects
+        )
+        phab_ids = {
+            project["name"]: id_
+            for project, id_ in zip(plan.phab_projects, ids)
+        }
+    plan.resolve_phab_ids(phab_ids)
+    if wiki is not None:
+        wiki.apply_plan(plan)
+
+
+@contextmanager
+def timed_phase(name, phase_times):
+    """Measure the time spent in a phase of the run.
+
+    Parameters
+    ----------
+    name : str
+        Name of the phase, used in the report.
+    phase_times : dict
+        Map of phase names to time in seconds, that the time is added
+        to.
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        phase_times[name] = \
+            phase_times.get(name, 0.0) + perf_counter() - start
+
+
+def log_phase_report(phase_times):
+    """Log the time spent in each phase of the run.
+
+    Parameters
+    ----------
+    phase_times : dict
+        Map of phase names to time in seconds.
+    """
+    logging.info("Time spent in each phase:")
+    for name, time in phase_times.items():
+        logging.info("{}: {:.2f} seconds.".format(name, time))
+
+
+def write_stats(path, phase_times, pipeline=None, site=None):
+    """Write statistics for the run to a JSON file.
+
+    Parameters
+    ----------
+    path : str
+        File to write to.
+    phase_times : dict
+        Map of phase names to time in seconds.
+    pipeline : Pipeline
+        The pipeline that processed the projects. None if no projects
+        were processed.
+    site : LocalSite
+        The local site backend, for the number of requests to it. None
+        if the local backend isn't used.
+    """
+    stats = {
+        "phases": phase_times,
+        "stages": pipeline.stats if pipeline else {},
+        "wiki_requests": site.requests if site else {}
+    }
+    with open(path, "w") as file_:
+        json.dump(stats, file_, indent=2)
+
+
+def positive_int(value):
+    """Parse a command line argument that must be a positive integer.
+
+    Parameters
+    ----------
+    value : str
+
+    Returns
+    -------
+    int
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        If the value isn't an integer of at least 1.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = None
+    if number is None or number < 1:
+        raise argparse.ArgumentTypeError(
+            "'{}' is not a positive integer".format(value)
+        )
+    return number
 
 
 def load_args():
@@ -359,11 +749,79 @@ def load_args():
         action="store_true",
         help="Prompt before adding each general (non-project specific) page."
     )
+    parser.add_argument(
+        "--phab-workers",
+        type=positive_int,
+        default=1,
+        help=("Number of Phabricator projects to add concurrently. "
+              "Requests are still limited by the configured rate limit.")
+    )
+    parser.add_argument(
+        "--journal",
+        metavar="JOURNAL_FILE",
+        default="project-start.journal",
+        help=("File where completed operations are recorded, so that an "
+              "interrupted run can be resumed. Default: %(default)s.")
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=("Continue an interrupted run, skipping the operations "
+              "recorded in the journal file.")
+    )
+    parser.add_argument(
+        "--check-config",
+        action="store_true",
+        help="Only check that the config file is valid."
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["pywikibot", "local"],
+        default="pywikibot",
+        help=("Where to read and write wiki pages. \"local\" keeps the "
+              "pages in a local database instead of on the wiki, e.g. for "
+              "testing. Default: %(default)s.")
+    )
+    parser.add_argument(
+        "--local-database",
+        metavar="DATABASE_FILE",
+        default=":memory:",
+        help=("SQLite file for the local backend. If not given, the pages "
+              "are only kept in memory during the run.")
+    )
+    parser.add_argument(
+        "--local-latency",
+        metavar="SECONDS",
+        type=float,
+        default=0,
+        help="Simulated time for each request to the local backend."
+    )
+    parser.add_argument(
+        "--stats-file",
+        metavar="STATS_FILE",
+        help=("Write the time spent in each phase and stage of the run, "
+              "and the number of requests to the local backend, to "
+              "STATS_FILE as JSON.")
+    )
+    plan_group = parser.add_mutually_exclusive_group()
+    plan_group.add_argument(
+        "--plan",
+        metavar="PLAN_FILE",
+        help=("Don't write anything, instead save the changes that would "
+              "be made to PLAN_FILE, for review.")
+    )
+    plan_group.add_argument(
+        "--apply",
+        metavar="PLAN_FILE",
+        help=("Make the changes saved in PLAN_FILE by an earlier run with "
+              "--plan. Pages that have been edited since are not written.")
+    )
     parser.add_argument(
         "project_file",
         help=("Path to a file containing project information. "
-              "The data should be tab separated values."),
-        nargs=1
+              "The data should be tab separated values. Not used with "
+              "--apply."),
+        nargs="?"
     )
     parser.add_argument(
         "goal_file",
@@ -373,17 +831,41 @@ def load_args():
               "in the config."),
         nargs="?"
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.project_file is None and args.apply is None \
+            and not args.check_config:
+        parser.error("the following arguments are required: project_file")
+    return args
 
 
 if __name__ == "__main__":
     args = load_args()
     setup_logging(args.verbose)
     logging.info("Creating projects.")
+    if args.year:
+        year = args.year
+    else:
+        year = datetime.date.today().year
+    # Time spent in each phase of the run.
+    phase_times = {}
     config_path = args.config
-    with open(config_path) as config_file:
-        config = yaml.safe_load(config_file)
+    try:
+        with timed_phase("load config", phase_times):
+            config = load_config(config_path, year, f"{config_path}.cache")
+    except ConfigError as error:
+        logging.error("Invalid config '{}': {}".format(config_path, error))
+        sys.exit(1)
     logging.debug("Loaded config from '{}'".format(config_path))
+    if args.check_config:
+        logging.info("Config '{}' is valid.".format(config_path))
+        sys.exit()
+
+    if args.apply:
+        plan = Plan.load(args.apply)
+    elif args.plan:
+        plan = Plan()
+    else:
+        plan = None
 
     if args.components:
         components = pick_components()
@@ -391,81 +873,159 @@ if __name__ == "__main__":
         components = None
 
     if args.goal_file:
-        with open(args.goal_file, newline="") as file_:
+        if config.goals is None:
+            logging.error(
+                "Config '{}' has no goals parameters, which are needed to "
+                "read the goal file.".format(config_path)
+            )
+            sys.exit(1)
+        with timed_phase("read goals", phase_times), \
+                open(args.goal_file, newline="") as file_:
             goals_reader = csv.reader(file_, delimiter="\t")
             goals, goal_fulfillments = read_goals(
                 goals_reader,
-                config["goals"]
+                config.goals
             )
     else:
         goals = goal_fulfillments = None
 
-    if args.year:
-        year = args.year
+    project_columns = config.project_columns
+    # English names of the projects that pages have been added for.
+    added_projects = set()
+    if args.dry_run or args.plan or args.apply:
+        journal = None
     else:
-        year = datetime.date.today().year
-    project_columns = config["project_columns"]
-    wiki = Wiki(
-        config["wiki"],
-        project_columns,
-        args.dry_run,
-        args.overwrite_wiki,
-        year,
-        goals,
-        goal_fulfillments,
-        components,
-        args.prompt_add_pages
-    )
-    phab = Phab(config, args.dry_run)
+        journal = Journal(
+            args.journal,
+            {
+                "year": str(year),
+                "project_file": args.project_file,
+                "goal_file": args.goal_file,
+                "project": args.project,
+                "components": components
+            },
+            args.resume
+        )
+    if args.apply:
+        wiki_needed = bool(plan.pages or plan.template_rows)
+        phab_needed = bool(plan.phab_projects)
+    else:
+        wiki_needed = uses_wiki(components)
+        phab_needed = uses_phab(components)
+    with timed_phase("set up backends", phase_times):
+        if wiki_needed:
+            site = create_site(
+                args.backend,
+                args.local_database,
+                args.local_latency
+            )
+            wiki = create_wiki(
+                config.wiki,
+                project_columns,
+                args.dry_run,
+                args.overwrite_wiki,
+                year,
+                goals,
+                goal_fulfillments,
+                components,
+                args.prompt_add_pages,
+                plan if args.plan else None,
+                journal,
+                site
+            )
+        else:
+            logging.info(
+                "The wiki isn't used in this run, not connecting to it."
+            )
+            wiki = None
+        if phab_needed:
+            phab = create_phab(
+                config,
+                args.dry_run,
+                plan if args.plan else None,
+                journal
+            )
+        else:
+            phab = None
+    if wiki is not None and args.backend == "local":
+        local_site = site
+    else:
+        local_site = None
+    if args.apply:
+        with timed_phase("apply plan", phase_times):
+            apply_plan(plan, args.phab_workers)
+        if wiki is not None:
+            wiki.log_report()
+            if local_site is not None:
+                local_site.log_report()
+        if phab is not None:
+            phab.log_report()
+        log_phase_report(phase_times)
+        if args.stats_file:
+            write_stats(args.stats_file, phase_times, site=local_site)
+        sys.exit()
+
+    if not args.project and phab is not None:
+        # Looking up all existing projects at once is only worth it
+        # when many projects are added.
+        with timed_phase("prefetch Phabricator projects", phase_times):
+            phab.prefetch_projects()
 
-    with open(args.project_file[0], newline="") as file_:
+    with timed_phase("read projects", phase_times), \
+            open(args.project_file, newline="") as file_:
         projects_reader = csv.DictReader(file_, delimiter="\t")
-        single_project_found = False
-        for unsanitized_project_information in projects_reader:
-            project_information = sanitize(unsanitized_project_information)
-            if not project_information[project_columns["swedish_name"]]:
-                # Check if there is a name and skip if not. This is
-                # likely a row that has some text, but not actually
-                # project information.
-                continue
-
-            if args.project:
-                if args.project not in (
-                        project_information[project_columns["swedish_name"]],
-                        project_information[project_columns["english_name"]]):
-                    continue
-                else:
-                    single_project_found = True
-                    wiki.single_project_info(
-                        project_information[project_columns["project_number"]],
-                        project_information[project_columns["swedish_name"]]
-                    )
-            elif not is_active(project_information, project_columns):
-                # handle skip outside of process_project to allow specifying a
-                # single project to override the skip value.
-                logging.info(
-                    "Skipping '{}', marked as inactive.".format(
-                        project_information[
-                            project_columns["english_name"]]))
-                continue
-            process_project(project_information, project_columns)
-
-    if not args.project:
-        # don't create these pages or run the checks unless it's a full run
-        if goals:
-            for project, parameters in goals.items():
-                if "added" not in parameters:
-                    logging.warning(
-                        "Project name '{}' found in goals file, but "
-                        "not in projects file. It will not be "
-                        "created.".format(project)
-                    )
-        wiki.add_year_pages()
-    elif not single_project_found:
+        projects = [sanitize(row) for row in projects_reader]
+    if wiki is not None:
+        with timed_phase("prefetch wiki pages", phase_times):
+            wiki.prefetch_pages(
+                [p for p in projects
+                 if is_selected(p, project_columns, args.project)],
+                not args.project
+            )
+    with timed_phase("process projects", phase_times):
+        pipeline = process_projects(
+            projects,
+            project_columns,
+            args.project,
+            args.phab_workers
+        )
+    single_project_found = pipeline.stats["parse"]["out"] > 0
+
+    if args.project and not single_project_found:
         logging.warning(
             "Project name '{}' could not be found in projects file. "
             "It will not be created.".format(args.project)
         )
-
-    wiki.update_project_name_templates()
-    wiki.log_report()
+    if wiki is not None:
+        if not args.project:
+            # don't create these pages or run the checks unless it's a
+            # full run
+            if goals:
+                for project in goals:
+                    if project not in added_projects:
+                        logging.warning(
+                            "Project name '{}' found in goals file, but "
+                            "not in projects file. It will not be "
+                            "created.".format(project)
+                        )
+            with timed_phase("year pages", phase_times):
+                wiki.add_year_pages()
+        with timed_phase("project name templates", phase_times):
+            wiki.update_project_name_templates()
+    if args.plan:
+        plan.save(args.plan)
+    if wiki is not None:
+        with timed_phase("finish saving", phase_times):
+            wiki.flush_saves()
+    if journal is not None:
+        journal.close()
+    if wiki is not None:
+        wiki.log_report()
+        if local_site is not None:
+            local_site.log_report()
+    if phab is not None:
+        phab.log_report()
+    pipeline.log_report()
+    log_phase_report(phase_times)
+    if args.stats_file:
+        write_stats(args.stats_file, phase_times, pipeline, local_site)
@@ -0,0 +1,145 @@
+import logging
+import threading
+from time import monotonic, sleep
+
+
+class RateLimiter:
+    """Token bucket rate limiter that slows down on errors.
+
+    Tokens are added to a bucket at the current rate, up to the burst
+    size, and each request takes one token. When the bucket is empty,
+    requests wait for the next token. The current rate is lowered by
+    `backoff` and raised again by `recover`, but never above the
+    configured rate.
+
+    Attributes
+    ----------
+    _rate : float
+        Maximum number of requests per second. If None, requests are
+        never delayed.
+    _burst : int
+        Maximum number of tokens in the bucket.
+    _backoff_factor : float
+        Factor that the current rate is divided by on backoff and
+        multiplied by on recovery.
+    _min_rate : float
+        The current rate is never lowered below this.
+    _current_rate : float
+        Number of requests per second currently allowed.
+    _tokens : float
+        Tokens in the bucket. Negative when tokens have been reserved
+        by waiting requests.
+    _last_update : float
+        Time when tokens were last added, in seconds.
+    _lock : threading.Lock
+        Guards the bucket, so that the limiter can be shared between
+        threads.
+    wait_time : float
+        Total time in seconds that requests have waited.
+    """
+
+    def __init__(self, rate, burst=1, backoff_factor=2.0, min_rate=None):
+        self._rate = rate
+        self._burst = burst
+        self._backoff_factor = backoff_factor
+        if min_rate is None and rate is not None:
+            min_rate = rate / 16
+        self._min_rate = min_rate
+        self._current_rate = rate
+        self._tokens = float(burst)
+        self._last_update = monotonic()
+        self._lock = threading.Lock()
+        self.wait_time = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        """Create a rate limiter from the Phabricator config.
+
+        Uses the parameters in `rate_limit` if present. Otherwise
+        allows one request per `request_delay` seconds without bursts.
+
+        Parameters
+        ----------
+        config : PhabConfig
+            Phabricator parameters from the config.
+
+        Returns
+        -------
+        RateLimiter
+        """
+        rate_limit = config.rate_limit
+        if rate_limit:
+            return cls(
+                rate_limit.rate,
+                rate_limit.burst,
+                rate_limit.backoff_factor,
+                rate_limit.min_rate
+            )
+        request_delay = config.request_delay
+        if request_delay:
+            return cls(1 / request_delay)
+        return cls(None)
+
+    def acquire(self):
+        """Take a token, waiting until one is available.
+
+        Returns
+        -------
+        float
+            Time in seconds that was spent waiting.
+        """
+        if self._rate is None:
+            return 0.0
+        with self._lock:
+            self._refill()
+            # Reserve the token before waiting, so that other threads
+            # queue up after this one.
+            self._tokens -= 1
+            wait_time = max(0.0, -self._tokens / self._current_rate)
+            self.wait_time += wait_time
+        if wait_time > 0:
+            logging.debug(
+                "Waiting for {:.2f} seconds before making the next "
+                "request.".format(wait_time)
+            )
+            sleep(wait_time)
+        return wait_time
+
+    def backoff(self):
+        """Lower the current rate, e.g. after an error or throttling."""
+        if self._rate is None:
+            return
+        with self._lock:
+            self._refill()
+            self._current_rate = max(
+                self._min_rate,
+                self._current_rate / self._backoff_factor
+            )
+            logging.debug(
+                "Lowered request rate to {:.2f} per second.".format(
+                    self._current_rate
+                )
+            )
+
+    def recover(self):
+        """Raise the current rate towards the configured rate."""
+        if self._rate is None or self._current_rate == self._rate:
+            return
+        with self._lock:
+            self._refill()
+            self._current_rate = min(
+                self._rate,
+                self._current_rate * self._backoff_factor
+            )
+
+    def _refill(self):
+        """Add the tokens accumulated at the current rate since last time.
+
+        Must be called with the lock held, before the rate is changed.
+        """
+        now = monotonic()
+        self._tokens = min(
+            self._burst,
+            self._tokens + (now - self._last_update) * self._current_rate
+        )
+        self._last_update = now
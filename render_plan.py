@@ -0,0 +1,94 @@
+from config import ConfigError
+
+
+class RenderPlan:
+    """Template parameters for a page, compiled from the config.
+
+    The parameter specifications in the config are resolved once, so
+    that rendering the parameters for a project only has to apply the
+    steps. Each specification is a single key value pair, where the
+    key dictates how the value is used:
+    "string" - the value is used as is.
+    "column" - the value is a key in project_columns in the config.
+      The parameter gets the project's value in that column.
+
+    Attributes
+    ----------
+    _steps : list
+        Pairs of template parameter name and a function that takes
+        the project parameters and returns the parameter's value.
+    """
+
+    def __init__(self, specifications, project_columns, page):
+        self._steps = [
+            (name, _compile(specification, project_columns, page, name))
+            for name, specification in (specifications or {}).items()
+        ]
+
+    def render(self, project_parameters):
+        """Get the template parameters for a project.
+
+        Parameters
+        ----------
+        project_parameters : dict
+            Parameters for the project.
+
+        Returns
+        -------
+        dict
+            Map of template parameter names to values, in the order
+            they are specified in the config.
+        """
+        return {
+            name: accessor(project_parameters)
+            for name, accessor in self._steps
+        }
+
+
+def _compile(specification, project_columns, page, name):
+    """Compile the specification of a parameter to an accessor.
+
+    Parameters
+    ----------
+    specification : dict
+        A single key value pair. The key is the type of value, either
+        "string" or "column".
+    project_columns : dict
+        Mapping of canonical labels to column headers in the projects
+        spreadsheet.
+    page : str
+        The page that the parameter is for, used in error messages.
+    name : str
+        Name of the template parameter.
+
+    Returns
+    -------
+    function
+        Takes the project parameters and returns the value.
+
+    Raises
+    ------
+    ConfigError
+        If the specification isn't a single pair of a known type, or if
+        it refers to a column that isn't in project_columns.
+    """
+    if not isinstance(specification, dict) or len(specification) != 1:
+        raise ConfigError(
+            f"Parameter '{name}' for page '{page}' should have exactly one "
+            "of 'string' and 'column'."
+        )
+    [(value_type, value)] = specification.items()
+    if value_type == "string":
+        return lambda project_parameters: value
+    elif value_type == "column":
+        if value not in project_columns:
+            raise ConfigError(
+                f"Parameter '{name}' for page '{page}' refers to column "
+                f"'{value}', which is not in project_columns."
+            )
+        label = project_columns[value]
+        return lambda project_parameters: project_parameters.get(label)
+    raise ConfigError(
+        f"Parameter '{name}' for page '{page}' has unknown type "
+        f"'{value_type}'."
+    )
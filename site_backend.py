@@ -0,0 +1,163 @@
+class PywikibotSite:
+    """Site backend for a MediaWiki site, using Pywikibot.
+
+    A site backend is what `Wiki` and `PageCache` use to reach the
+    wiki. It makes the page objects and does the operations that
+    aren't on a single page: loading pages in batches, the pre-save
+    transform and merging new text into edited pages. It also gives
+    the errors that saving can fail with. The page objects have the
+    parts of the interface of `pywikibot.Page` that are used:
+    `title()`, `text`, `exists()`, `get()`, `latest_revision_id` and
+    `save()`.
+
+    `local_site.LocalSite` is a backend with the same interface that
+    doesn't need a wiki.
+
+    Pywikibot is imported when it's first used rather than at the top,
+    since loading it is slow and other backends don't need it.
+
+    Attributes
+    ----------
+    _site : Site
+        `Site` object used by Pywikibot
+    """
+
+    def __init__(self, site=None):
+        if site is None:
+            from pywikibot import Site
+            site = Site()
+        self._site = site
+
+    @property
+    def retryable_save_errors(self):
+        """Errors on save that mean that the wiki is under load and
+        that the save can be retried later.
+
+        Returns
+        -------
+        tuple
+            Exception classes.
+        """
+        from pywikibot.exceptions import (
+            MaxlagTimeoutError,
+            Server504Error,
+            TimeoutError
+        )
+        return (MaxlagTimeoutError, Server504Error, TimeoutError)
+
+    @property
+    def save_errors(self):
+        """Errors that saving a page can fail with.
+
+        Returns
+        -------
+        tuple
+            Exception classes.
+        """
+        from pywikibot.exceptions import Error
+        return (Error,)
+
+    def page(self, title, namespace=None):
+        """Make a page object.
+
+        Parameters
+        ----------
+        title : str
+            Title of the page.
+        namespace : str
+            Namespace of the page. If None, the default namespace will
+            be used.
+
+        Returns
+        -------
+        Page
+        """
+        from pywikibot import Page
+        if namespace is None:
+            return Page(self._site, title)
+        return Page(self._site, title, namespace)
+
+    def preload(self, pages):
+        """Load existence, latest revision and content of pages.
+
+        Pages are loaded 50 per request.
+
+        Parameters
+        ----------
+        pages : list
+
+        Returns
+        -------
+        iterator
+            The pages, as they are loaded.
+        """
+        return self._site.preloadpages(pages, groupsize=50)
+
+    def pre_save_transform(self, page, text):
+        """Get the text as it would be saved, e.g. with templates
+        substituted.
+
+        Parameters
+        ----------
+        page : Page
+            The page that the text is for.
+        text : str
+
+        Returns
+        -------
+        str
+            The transformed text.
+        """
+        request = self._site.simple_request(
+            action="parse",
+            title=page.title(),
+            text=text,
+            contentmodel="wikitext",
+            prop="",
+            onlypst=1
+        )
+        data = request.submit()
+        return data["parse"]["text"]["*"]
+
+    def add_lag_listener(self, listener):
+        """Call a function whenever the wiki reports that it's lagging.
+
+        Pywikibot waits and retries when a request gets a maxlag
+        error, and only raises an error after several retries. The
+        listener is called on each of these, so that the caller can
+        slow down before that.
+
+        Parameters
+        ----------
+        listener : function
+            Called with the lag in seconds.
+        """
+        throttle = self._site.throttle
+        lag = throttle.lag
+
+        def lag_and_notify(lagtime=None):
+            listener(lagtime)
+            lag(lagtime)
+
+        throttle.lag = lag_and_notify
+
+    def merge(self, current_text, new_text):
+        """Merge new text into the current text of a page.
+
+        Each changed part is shown and the user is asked whether to
+        accept it.
+
+        Parameters
+        ----------
+        current_text : str
+            Text on the wiki.
+        new_text : str
+            Text to save, after the pre-save transform.
+
+        Returns
+        -------
+        str
+            The merged text.
+        """
+        from pywikibot.diff import cherry_pick
+        return cherry_pick(current_text, new_text)
@@ -0,0 +1,114 @@
+import re
+
+# Matches a row in a switch, e.g. "| 240101 = Projekt". The value is
+# everything after the first equals sign.
+ROW_PATTERN = re.compile(r"^\s*\|([^=\n]*)=(.*)$", re.MULTILINE)
+DEFAULT_ROW_PATTERN = re.compile(r"\| #default")
+
+
+class SwitchTemplate:
+    """Text of a template with a #switch, parsed for adding rows.
+
+    The text is parsed once into the keys and values of the existing
+    rows. Rows that are added are collected and inserted together just
+    above the default row when the text is rendered, so adding many
+    rows doesn't rewrite the text for each row.
+
+    Attributes
+    ----------
+    _head : str
+        Text before the default row. All of the text if there is no
+        default row.
+    _tail : str
+        Text from the default row to the end. None if there is no
+        default row.
+    _keys : set
+        Keys of the rows, stripped of whitespace.
+    _values : set
+        Values of the rows, stripped of whitespace.
+    _new_rows : list
+        Rows that have been added.
+    """
+
+    def __init__(self, text):
+        default_row = DEFAULT_ROW_PATTERN.search(text)
+        if default_row is None:
+            self._head = text
+            self._tail = None
+        else:
+            self._head = text[:default_row.start()]
+            self._tail = text[default_row.start():]
+        self._keys = set()
+        self._values = set()
+        for match in ROW_PATTERN.finditer(text):
+            self._keys.add(match.group(1).strip())
+            self._values.add(match.group(2).strip())
+        self._new_rows = []
+
+    @property
+    def has_default(self):
+        """Whether the switch has a default row.
+
+        Returns
+        -------
+        bool
+        """
+        return self._tail is not None
+
+    def has_key(self, key):
+        """Check if there is a row with a key.
+
+        Parameters
+        ----------
+        key : str
+
+        Returns
+        -------
+        bool
+        """
+        return key in self._keys
+
+    def has_value(self, value):
+        """Check if there is a row with a value.
+
+        Parameters
+        ----------
+        value : str
+
+        Returns
+        -------
+        bool
+        """
+        return value in self._values
+
+    def add_row(self, key, value):
+        """Add a row above the default row.
+
+        Parameters
+        ----------
+        key : str
+        value : str
+
+        Returns
+        -------
+        str
+            The added row.
+
+        Raises
+        ------
+        ValueError
+            If there is no default row to add the row above.
+        """
+        if not self.has_default:
+            raise ValueError("Switch has no default row.")
+        row = f"| {key} = {value}"
+        self._new_rows.append(row)
+        self._keys.add(key)
+        self._values.add(value)
+        return row
+
+    def __str__(self):
+        if not self._new_rows:
+            return self._head + (self._tail or "")
+        rows = "".join(f"{row}\n" for row in self._new_rows)
+        return self._head + rows + self._tail
@@ -4,6 +4,12 @@ from collections import OrderedDict
 class Template:
     """Representation of Mediawiki templates.
 
+    Templates are rendered by passing the parts of the output in order
+    to a write function, which either collects them to be joined or
+    writes them to a file-like object. Nested templates write their
+    parts to the same function instead of being rendered to strings
+    first.
+
     Attributes
     ----------
     _name : str
@@ -26,18 +32,9 @@ class Template:
             self._parameters = parameters
 
     def __str__(self):
-        output = "{{" + "{}{}".format("subst:" * self._subst, self._name)
-        if self._parameters:
-            for name, value in self._parameters.items():
-                if isinstance(value, Template):
-                    output += \
-                        "\n| {} = {}".format(name, value.oneline_string())
-                else:
-                    output += "\n| {} = {}".format(name, value)
-            output += "\n}}"
-        else:
-            output += "}}"
-        return output
+        parts = []
+        self._render(parts.append)
+        return "".join(parts)
 
     def add_parameter(self, name, value):
         """Add a template parameter.
@@ -53,30 +50,92 @@ class Template:
         self._parameters[name] = value
 
     def multiline_string(self, nesting_level=0):
-        output = "{{" + "{}{}".format("subst:" * self._subst, self._name)
+        parts = []
+        self._render_multiline(parts.append, nesting_level)
+        return "".join(parts)
+
+    def oneline_string(self):
+        parts = []
+        self._render_oneline(parts.append)
+        return "".join(parts)
+
+    def write(self, file_):
+        """Write the template as `str` renders it.
+
+        Parameters
+        ----------
+        file_ : file object
+            Text stream to write to.
+
+        """
+        self._render(file_.write)
+
+    def write_multiline(self, file_, nesting_level=0):
+        """Write the template as `multiline_string` renders it.
+
+        Parameters
+        ----------
+        file_ : file object
+            Text stream to write to.
+        nesting_level : int
+            How many templates this one is nested in.
+
+        """
+        self._render_multiline(file_.write, nesting_level)
+
+    def write_oneline(self, file_):
+        """Write the template as `oneline_string` renders it.
+
+        Parameters
+        ----------
+        file_ : file object
+            Text stream to write to.
+
+        """
+        self._render_oneline(file_.write)
+
+    def _start(self):
+        if self._subst:
+            return "{{subst:" + str(self._name)
+        return "{{" + str(self._name)
+
+    def _render(self, write):
+        write(self._start())
+        if self._parameters:
+            for name, value in self._parameters.items():
+                write("\n| {} = ".format(name))
+                if isinstance(value, Template):
+                    value._render_oneline(write)
+                else:
+                    write(str(value))
+            write("\n}}")
+        else:
+            write("}}")
+
+    def _render_multiline(self, write, nesting_level):
+        write(self._start())
         if self._parameters:
             indentation = "  " * nesting_level
+            row_start = "\n{}| ".format(indentation * 2)
             for name, value in self._parameters.items():
+                write("{}{} = ".format(row_start, name))
                 if isinstance(value, Template):
-                    value_string = value.multiline_string(nesting_level + 1)
+                    value._render_multiline(write, nesting_level + 1)
                 else:
-                    value_string = value
-                output += "\n{}| {} = {}".format(
-                    indentation * 2,
-                    name,
-                    value_string
-                )
-            output += "\n{}".format(indentation) + "}}"
+                    write(str(value))
+            write("\n{}".format(indentation) + "}}")
         else:
-            output += "}}"
-        return output
+            write("}}")
 
-    def oneline_string(self):
-        output = "{{" + "{}{}".format("subst:" * self._subst, self._name)
+    def _render_oneline(self, write):
+        write(self._start())
         if self._parameters:
             for name, value in self._parameters.items():
-                output += "|{}={}".format(name, value)
-            output += "}}"
+                write("|{}=".format(name))
+                if isinstance(value, Template):
+                    value._render(write)
+                else:
+                    write(str(value))
+            write("}}")
         else:
-            output += "}}"
-        return output
+            write("}}")
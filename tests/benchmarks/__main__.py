@@ -0,0 +1,65 @@
+"""Run the benchmarks and print their scaling curves.
+
+Usage: python -m tests.benchmarks [--update-baseline] [NAME ...]
+"""
+import argparse
+
+from tests.benchmarks.suite import (
+    BENCHMARKS,
+    load_baseline,
+    measure,
+    reference_workload,
+    run_benchmark,
+    save_baseline
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m tests.benchmarks",
+        description="Run the benchmarks and print their scaling curves."
+    )
+    parser.add_argument(
+        "names",
+        nargs="*",
+        metavar="NAME",
+        help="Benchmarks to run. All are run if none are given."
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store the results as the baseline that the tests compare to."
+    )
+    args = parser.parse_args()
+    baseline = load_baseline()
+    reference_time = measure(reference_workload)
+    print("Reference workload: {:.3f} ms".format(reference_time * 1000))
+    results = {}
+    for benchmark in BENCHMARKS:
+        if args.names and benchmark.name not in args.names:
+            continue
+        result = run_benchmark(benchmark, reference_time)
+        results[benchmark.name] = result
+        print()
+        print("{} (exponent {:.2f})".format(benchmark.name, result.exponent))
+        stored = baseline.get(benchmark.name)
+        for i, (size, time) in enumerate(zip(result.sizes, result.times)):
+            line = "  {:>6}: {:10.4f} ({:.3f} ms)".format(
+                size,
+                time,
+                time * reference_time * 1000
+            )
+            if stored is not None and stored.sizes == result.sizes:
+                line += "  {:+.0%} from baseline".format(
+                    time / stored.times[i] - 1
+                )
+            print(line)
+    if args.update_baseline:
+        baseline.update(results)
+        save_baseline(baseline)
+        print()
+        print("Baseline updated.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Synthetic input for the benchmarks.
+
+The generators are deterministic, so that the same size always gives
+the same input.
+"""
+import csv
+import io
+
+from project_start import column_index
+
+PROGRAMS = ["Tillgång", "Användning", "Gemenskap", "Möjliggörande"]
+
+
+def goal_rows(projects, goals=100, density=3):
+    """Make rows of a goals spreadsheet.
+
+    Parameters
+    ----------
+    projects : int
+        Number of project columns.
+    goals : int
+        Number of goal rows.
+    density : int
+        Every `density`th cell has a value.
+
+    Returns
+    -------
+    list
+        The header row with project names, followed by one row per
+        goal. Project columns start at column C.
+    """
+    rows = [["Mål", ""] + [f"Project {j}" for j in range(projects)]]
+    for i in range(goals):
+        rows.append(
+            [f"T.{i} - Mål {i}", f"Uppfyllnad {i}"]
+            + [str(i) if (i + j) % density == 0 else ""
+               for j in range(projects)]
+        )
+    return rows
+
+
+def project_rows(rows, columns=60):
+    """Make wide rows of a projects spreadsheet, as read by DictReader.
+
+    Values have whitespace around them, for sanitize to strip.
+
+    Parameters
+    ----------
+    rows : int
+        Number of projects.
+    columns : int
+        Number of columns.
+
+    Returns
+    -------
+    list
+        Dicts mapping column headers to values.
+    """
+    headers = [f" Kolumn {c} " for c in range(columns)]
+    text = io.StringIO()
+    writer = csv.writer(text, delimiter="\t", lineterminator="\n")
+    writer.writerow(headers)
+    for i in range(rows):
+        writer.writerow([f" Värde {i} {c}  " for c in range(columns)])
+    text.seek(0)
+    return list(csv.DictReader(text, delimiter="\t"))
+
+
+def template_parameters(count):
+    """Make template parameters.
+
+    Parameters
+    ----------
+    count : int
+
+    Returns
+    -------
+    dict
+        Map of parameter names to values.
+    """
+    return {f"parameter_{i}": f"Värde {i}" for i in range(count)}
+
+
+def project_goals(count):
+    """Make planned goal values for a project.
+
+    Parameters
+    ----------
+    count : int
+        Number of goals.
+
+    Returns
+    -------
+    dict
+        Map of goal names to planned values.
+    """
+    return {f"T.{i}": str(i * 10) for i in range(count)}
+
+
+def conduit_parameters(count):
+    """Make nested parameters for a Conduit request.
+
+    Parameters
+    ----------
+    count : int
+        Number of ids in the constraints and of transactions.
+
+    Returns
+    -------
+    dict
+    """
+    return {
+        "constraints": {"ids": list(range(count))},
+        "transactions": {
+            str(i): {"type": "name", "value": f"Project {i}"}
+            for i in range(count)
+        },
+        "limit": 100
+    }
+
+
+def switch_template(rows):
+    """Make the text of a project name template with a #switch.
+
+    Parameters
+    ----------
+    rows : int
+        Number of rows before the default row.
+
+    Returns
+    -------
+    str
+    """
+    lines = ["{{#switch:{{{1}}}"]
+    lines += [
+        f"| {100000 + i} = {{{{#if: {{{{{{en|}}}}}}| Project {i} "
+        f"| Projekt {i} }}}}"
+        for i in range(rows)
+    ]
+    lines += ["| #default = -", "}}"]
+    return "\n".join(lines)
+
+
+def projects(count):
+    """Make projects to add to a wiki.
+
+    Parameters
+    ----------
+    count : int
+
+    Returns
+    -------
+    list
+        Tuples of number, Swedish name, English name and program.
+    """
+    return [
+        (
+            f"2{i % 9 + 1}{i:04d}",
+            f"Projekt {i}",
+            f"Project {i}",
+            PROGRAMS[i % len(PROGRAMS)]
+        )
+        for i in range(count)
+    ]
+
+
+def project_file_rows(count, project_columns, year):
+    """Make the rows of a projects file.
+
+    All projects are active and none are subprojects. Columns that
+    aren't used to identify projects get a value made from the label.
+
+    Parameters
+    ----------
+    count : int
+        Number of projects.
+    project_columns : dict
+        Mapping of canonical labels to column headers, as in the
+        config.
+    year : int
+        Year for the project numbers.
+
+    Returns
+    -------
+    list
+        Dicts mapping column headers to values.
+    """
+    rows = []
+    for i in range(count):
+        values = {
+            "project_number": f"{year % 100}{i:04d}",
+            "program": PROGRAMS[i % len(PROGRAMS)],
+            "swedish_name": f"Projekt {i}",
+            "english_name": f"Project {i}",
+            "super_project": "",
+            "active": "1"
+        }
+        rows.append({
+            header: values.get(label, f"{label} {i}")
+            for label, header in project_columns.items()
+        })
+    return rows
+
+
+def goal_file_rows(project_names, settings, density=3):
+    """Make the rows of a goals file.
+
+    Parameters
+    ----------
+    project_names : list
+        English names of the projects.
+    settings : GoalsConfig
+        Where the projects and goals are in the file.
+    density : int
+        Every `density`th cell has a value.
+
+    Returns
+    -------
+    list
+        Lists of values, with one goal per row after the project row.
+    """
+    padding = [""] * (column_index(settings.first_project_column) - 2)
+    rows = [[""] for _ in range(settings.project_row)]
+    rows.append(["Mål", "Uppfyllnad"] + padding + list(project_names))
+    for i in range(settings.project_row + 1, settings.last_row):
+        rows.append(
+            [f"T.{i} - Mål {i}", f"Uppfyllnad {i}"]
+            + padding
+            + [str(i) if (i + j) % density == 0 else ""
+               for j in range(len(project_names))]
+        )
+    return rows
@@ -0,0 +1,325 @@
+"""Run whole project start runs against local backends.
+
+Synthetic project and goal files are generated for each number of
+projects, and project_start.py is run with them in a new process,
+with the wiki in a local database and Phabricator replaced by
+`ConduitEmulator`. Both add latency to each request, to simulate the
+real sites. This shows how a run scales with the number of projects
+and which part of it takes the time.
+
+For each run, the wall time, the number of requests to each wiki API
+module and Conduit endpoint, the peak memory use and the time spent in
+each phase of the run are reported.
+
+Usage: python -m tests.benchmarks.load_simulation [--sizes N ...]
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+import yaml
+
+from conduit_emulator import ConduitEmulator
+from config import compile_config
+from local_site import LocalSite
+from tests.benchmarks import generators
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)
+)))
+PROJECT_START = os.path.join(REPO_DIR, "project_start.py")
+# Text of the project name and number templates before the run.
+EMPTY_SWITCH = "{{#switch:{{{1}}}\n| #default = -\n}}"
+
+
+def simulate(
+        size,
+        directory,
+        config_data,
+        year,
+        wiki_latency=0,
+        conduit_latency=0,
+        phab_workers=1
+):
+    """Run project_start.py for a number of synthetic projects.
+
+    Parameters
+    ----------
+    size : int
+        Number of projects.
+    directory : str
+        Where the input files, the config and the files written by the
+        run are put. The run is made in this directory.
+    config_data : dict
+        Config, as read from the YAML file. The Phabricator settings
+        are replaced to use the emulator, without request delay or
+        rate limit.
+    year : int
+    wiki_latency : float
+        Time in seconds for each request to the wiki.
+    conduit_latency : float
+        Time in seconds for each request to Conduit.
+    phab_workers : int
+        Number of Phabricator projects to add concurrently.
+
+    Returns
+    -------
+    dict
+        Number of projects, wall time in seconds, peak resident memory
+        in kilobytes, requests to each wiki module and Conduit endpoint
+        and time in seconds spent in each phase and pipeline stage.
+
+    Raises
+    ------
+    SimulationError
+        If the run fails.
+    """
+    config = compile_config(config_data, year)
+    projects_path = os.path.join(directory, "projects.tsv")
+    project_rows = generators.project_file_rows(
+        size,
+        config.project_columns,
+        year
+    )
+    with open(projects_path, "w", newline="") as file_:
+        writer = csv.DictWriter(
+            file_,
+            list(config.project_columns.values()),
+            delimiter="\t"
+        )
+        writer.writeheader()
+        writer.writerows(project_rows)
+    goals_path = os.path.join(directory, "goals.tsv")
+    project_names = [
+        row[config.project_columns["english_name"]] for row in project_rows
+    ]
+    with open(goals_path, "w", newline="") as file_:
+        csv.writer(file_, delimiter="\t").writerows(
+            generators.goal_file_rows(project_names, config.goals)
+        )
+
+    database_path = os.path.join(directory, "wiki.db")
+    site = LocalSite(database_path)
+    site.add_page(config.wiki.project_name_template, EMPTY_SWITCH)
+    site.add_page(config.wiki.project_number_template, EMPTY_SWITCH)
+
+    endpoints = ["project.search", "project.edit"]
+    with ConduitEmulator(
+            latency={endpoint: conduit_latency for endpoint in endpoints}
+    ) as emulator:
+        parent = emulator.add_project("Wikimedia-Sverige")
+        phab_data = dict(config_data["phab"])
+        phab_data.pop("request_delay", None)
+        phab_data.pop("rate_limit", None)
+        phab_data["api_url"] = emulator.api_url
+        phab_data["parent_project_id"] = parent["id"]
+        config_path = os.path.join(directory, "config.yaml")
+        with open(config_path, "w") as file_:
+            yaml.safe_dump(
+                dict(config_data, phab=phab_data),
+                file_,
+                allow_unicode=True
+            )
+
+        stats_path = os.path.join(directory, "stats.json")
+        output_path = os.path.join(directory, "output.log")
+        command = [
+            sys.executable,
+            PROJECT_START,
+            "--config", config_path,
+            "--year", str(year),
+            "--backend", "local",
+            "--local-database", database_path,
+            "--local-latency", str(wiki_latency),
+            "--phab-workers", str(phab_workers),
+            "--stats-file", stats_path,
+            projects_path,
+            goals_path
+        ]
+        with open(output_path, "w") as output:
+            start = perf_counter()
+            process = subprocess.Popen(
+                command,
+                cwd=directory,
+                stdin=subprocess.DEVNULL,
+                stdout=output,
+                stderr=subprocess.STDOUT
+            )
+            # Unlike getrusage(), wait4() gives the resource use of
+            # this run only.
+            _, status, usage = os.wait4(process.pid, 0)
+            wall_time = perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        conduit_requests = emulator.requests
+    if process.returncode != 0:
+        raise SimulationError(size, process.returncode, output_path)
+
+    with open(stats_path) as file_:
+        stats = json.load(file_)
+    return {
+        "projects": size,
+        "wall_time": wall_time,
+        "peak_rss": usage.ru_maxrss,
+        "wiki_requests": stats["wiki_requests"],
+        "conduit_requests": conduit_requests,
+        "phases": stats["phases"],
+        "stages": {
+            name: stage["time"] for name, stage in stats["stages"].items()
+        }
+    }
+
+
+def format_report(result):
+    """Format the result of a run for printing.
+
+    Parameters
+    ----------
+    result : dict
+        As returned by `simulate`.
+
+    Returns
+    -------
+    str
+    """
+    lines = [
+        "{} projects: {:.2f} seconds, peak memory {:.1f} MB".format(
+            result["projects"],
+            result["wall_time"],
+            result["peak_rss"] / 1024
+        )
+    ]
+    for label, requests in [
+            ("Wiki requests", result["wiki_requests"]),
+            ("Conduit requests", result["conduit_requests"])
+    ]:
+        lines.append("  {}: {}".format(
+            label,
+            ", ".join(
+                "{} {}".format(name, count)
+                for name, count in sorted(requests.items())
+            ) or "none"
+        ))
+    for label, times in [
+            ("Phases", result["phases"]),
+            ("Pipeline stages", result["stages"])
+    ]:
+        lines.append("  {}:".format(label))
+        lines += [
+            "    {:<32} {:8.2f} s".format(name, time)
+            for name, time in times.items()
+        ]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m tests.benchmarks.load_simulation",
+        description=("Run project_start.py with synthetic projects against "
+                     "a local wiki and Conduit emulator.")
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=[10, 100, 1000],
+        metavar="N",
+        help="Numbers of projects to run with. Default: %(default)s."
+    )
+    parser.add_argument(
+        "--config",
+        default=os.path.join(REPO_DIR, "config.yaml"),
+        help="Config to base the runs on. Default: the repository's config."
+    )
+    parser.add_argument(
+        "--wiki-latency",
+        type=float,
+        default=0.01,
+        metavar="SECONDS",
+        help="Time for each request to the wiki. Default: %(default)s."
+    )
+    parser.add_argument(
+        "--conduit-latency",
+        type=float,
+        default=0.05,
+        metavar="SECONDS",
+        help="Time for each request to Conduit. Default: %(default)s."
+    )
+    parser.add_argument(
+        "--phab-workers",
+        type=int,
+        default=1,
+        help="Passed on to project_start.py. Default: %(default)s."
+    )
+    parser.add_argument(
+        "--report-json",
+        metavar="FILE",
+        help="Also write the results to FILE as JSON."
+    )
+    parser.add_argument(
+        "--keep",
+        metavar="DIRECTORY",
+        help=("Keep the input, output and log of each run in a "
+              "subdirectory of DIRECTORY.")
+    )
+    args = parser.parse_args()
+    with open(args.config) as file_:
+        config_data = yaml.safe_load(file_)
+    year = datetime.date.today().year
+    results = []
+    for size in args.sizes:
+        if args.keep:
+            directory = os.path.join(args.keep, str(size))
+            os.makedirs(directory)
+            temporary = None
+        else:
+            temporary = tempfile.TemporaryDirectory()
+            directory = temporary.name
+        try:
+            result = simulate(
+                size,
+                directory,
+                config_data,
+                year,
+                args.wiki_latency,
+                args.conduit_latency,
+                args.phab_workers
+            )
+        except SimulationError as error:
+            sys.exit(str(error))
+        finally:
+            if temporary is not None:
+                temporary.cleanup()
+        results.append(result)
+        print(format_report(result))
+        print(flush=True)
+    if len(results) > 1:
+        print("Time per project:")
+        for result in results:
+            print("  {:>6}: {:.3f} seconds".format(
+                result["projects"],
+                result["wall_time"] / result["projects"]
+            ))
+    if args.report_json:
+        with open(args.report_json, "w") as file_:
+            json.dump(results, file_, indent=2)
+
+
+class SimulationError(Exception):
+    def __init__(self, size, returncode, output_path):
+        with open(output_path) as file_:
+            output = file_.read()
+        message = (
+            f"Run with {size} projects failed with exit code {returncode}. "
+            f"Last output:\n{output[-2000:]}"
+        )
+        super().__init__(message)
+
+
+if __name__ == "__main__":
+    main()
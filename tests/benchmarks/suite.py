@@ -0,0 +1,327 @@
+"""Microbenchmarks for the CPU heavy parts of a run.
+
+Each benchmark is run for a few input sizes, which gives a scaling
+curve. Times are divided by the time of a fixed reference workload,
+so that results from different machines can be compared to the same
+baseline. How the time grows with the size is summarised as the
+exponent of a power law fitted to the curve: 1 is linear, 2 is
+quadratic.
+"""
+import gc
+import json
+import math
+import os
+from time import perf_counter
+from typing import Callable, NamedTuple
+
+from config import (
+    CategoriesConfig,
+    Config,
+    GoalsConfig,
+    PageConfig,
+    PhabConfig,
+    WikiConfig,
+    YearPagesConfig
+)
+from goal_table import GoalTable
+from local_site import LocalSite
+from phab import Phab
+from project_start import read_goals, sanitize
+from switch_template import SwitchTemplate
+from template import Template
+from tests.benchmarks import generators
+from wiki import Wiki
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Shortest time in seconds to measure a benchmark for. Fast
+# benchmarks are called repeatedly until it's reached.
+MIN_TIME = 0.005
+# Number of measurements for each size, of which the fastest is used.
+REPEATS = 5
+
+
+class Benchmark(NamedTuple):
+    """A benchmark and the input sizes to run it for.
+
+    `setup` takes an input size and returns a function without
+    arguments that runs the code to measure.
+    """
+    name: str
+    sizes: tuple
+    setup: Callable
+
+
+class Result(NamedTuple):
+    """Normalised times for each input size of a benchmark."""
+    sizes: tuple
+    times: tuple
+
+    @property
+    def exponent(self):
+        return scaling_exponent(self.sizes, self.times)
+
+
+BENCHMARKS = []
+
+
+def benchmark(*sizes):
+    """Register a benchmark setup function.
+
+    Parameters
+    ----------
+    sizes : int
+        Input sizes to run the benchmark for.
+
+    Returns
+    -------
+    function
+        Decorator that adds the setup function to `BENCHMARKS`.
+    """
+    def register(setup):
+        BENCHMARKS.append(Benchmark(setup.__name__, sizes, setup))
+        return setup
+    return register
+
+
+@benchmark(50, 200, 800)
+def read_goals_table(size):
+    """Read a goals spreadsheet with `size` projects and 100 goals."""
+    rows = generators.goal_rows(size)
+    settings = GoalsConfig(
+        project_row=0,
+        last_row=len(rows),
+        first_project_column="C"
+    )
+    return lambda: read_goals(iter(rows), settings)
+
+
+@benchmark(100, 400, 1600)
+def sanitize_rows(size):
+    """Sanitize `size` rows with 60 columns, as read by DictReader."""
+    rows = generators.project_rows(size)
+    return lambda: [sanitize(row) for row in rows]
+
+
+@benchmark(100, 1000, 10000)
+def template_multiline(size):
+    """Render a template with `size` parameters on multiple lines."""
+    template = Template(
+        "Mall:Projekt-sida",
+        True,
+        generators.template_parameters(size)
+    )
+    return template.multiline_string
+
+
+@benchmark(50, 200, 800)
+def template_nested_goals(size):
+    """Render a subpage template with `size` goals in a nested template.
+    """
+    goals = GoalTable({"Project": generators.project_goals(size)})
+    template = Template(
+        "Mall:Mål-sida",
+        True,
+        {
+            "år": 2024,
+            "mål": Template("Mall:Mål 2024", parameters=goals["Project"])
+        }
+    )
+    return template.multiline_string
+
+
+@benchmark(10, 100, 1000)
+def phab_parameters(size):
+    """Convert Conduit parameters with `size` transactions."""
+    phab = Phab(Config(phab=PhabConfig()), False)
+    parameters = generators.conduit_parameters(size)
+    return lambda: phab._to_phab_parameters(parameters)
+
+
+@benchmark(100, 1000, 10000)
+def switch_template(size):
+    """Parse a switch with `size` rows, add a tenth more and render it."""
+    text = generators.switch_template(size)
+    new_rows = [
+        (str(200000 + i), f"Nytt projekt {i}") for i in range(size // 10)
+    ]
+
+    def run():
+        template = SwitchTemplate(text)
+        for key, value in new_rows:
+            if not template.has_key(key):
+                template.add_row(key, value)
+        return str(template)
+    return run
+
+
+@benchmark(100, 1000, 5000)
+def year_pages(size):
+    """Render the year pages that list all `size` projects."""
+    config = WikiConfig(
+        edit_summary="Sidan skapad",
+        project_namespace="Projekt",
+        year_pages=YearPagesConfig(
+            current_projects_template="Mall:Aktuella projekt 2024",
+            simple={},
+            projects=PageConfig("Projekt 2024", "Mall:Årsida för projekt"),
+            categories=CategoriesConfig("Föreningen 2024", {}),
+            volunteer_tasks=PageConfig(
+                "Frivilliguppdrag 2024",
+                "Mall:Frivilliguppdrag"
+            )
+        )
+    )
+    wiki = Wiki(
+        config, {}, True, False, 2024, None, None, None, False,
+        site=LocalSite()
+    )
+    for project in generators.projects(size):
+        wiki.add_project(*project)
+
+    def run():
+        wiki._add_projects_year_page()
+        wiki._create_current_projects_template()
+        wiki._add_volunteer_tasks_page()
+        # Dry runs keep the pages that would have been saved.
+        wiki._touched_pages.clear()
+    return run
+
+
+def reference_workload():
+    """Fixed pure Python work that times are measured relative to."""
+    words = [f"ord {i}" for i in range(2000)]
+    return len(sorted(words, key=lambda word: word[::-1]))
+
+
+def measure(function):
+    """Measure how long a function takes.
+
+    The function is called repeatedly, doubling the number of calls
+    until they take at least `MIN_TIME`. Garbage collection is turned
+    off while timing.
+
+    Parameters
+    ----------
+    function : function
+        Takes no arguments.
+
+    Returns
+    -------
+    float
+        Fastest time for one call, in seconds, out of `REPEATS`
+        measurements.
+    """
+    calls = 1
+    while True:
+        elapsed = _time_calls(function, calls)
+        if elapsed >= MIN_TIME:
+            break
+        calls *= 2
+    best = elapsed
+    for _ in range(REPEATS - 1):
+        best = min(best, _time_calls(function, calls))
+    return best / calls
+
+
+def _time_calls(function, calls):
+    # Garbage collection is turned off while timing, like timeit does,
+    # since how long it takes depends on everything else in memory.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = perf_counter()
+        for _ in range(calls):
+            function()
+        return perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def run_benchmark(benchmark_, reference_time):
+    """Run a benchmark for all its sizes.
+
+    Parameters
+    ----------
+    benchmark_ : Benchmark
+    reference_time : float
+        Time for the reference workload, in seconds.
+
+    Returns
+    -------
+    Result
+        Times relative to the reference workload.
+    """
+    times = []
+    for size in benchmark_.sizes:
+        function = benchmark_.setup(size)
+        times.append(measure(function) / reference_time)
+    return Result(benchmark_.sizes, tuple(times))
+
+
+def scaling_exponent(sizes, times):
+    """Fit a power law to a scaling curve.
+
+    Parameters
+    ----------
+    sizes : list
+    times : list
+
+    Returns
+    -------
+    float
+        Exponent k in time = c * size ** k, fitted by least squares
+        on a log-log scale.
+    """
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(time) for time in times]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return covariance / variance
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Load stored benchmark results.
+
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    dict
+        Map of benchmark names to `Result`. Empty if there is no
+        baseline file.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file_:
+        data = json.load(file_)
+    return {
+        name: Result(tuple(result["sizes"]), tuple(result["times"]))
+        for name, result in data.items()
+    }
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    """Store benchmark results as the baseline.
+
+    Parameters
+    ----------
+    results : dict
+        Map of benchmark names to `Result`.
+    path : str
+    """
+    data = {
+        name: {
+            "sizes": list(result.sizes),
+            "times": [float(f"{time:.4g}") for time in result.times],
+            "exponent": round(result.exponent, 2)
+        }
+        for name, result in results.items()
+    }
+    with open(path, "w") as file_:
+        json.dump(data, file_, indent=2)
+        file_.write("\n")
@@ -0,0 +1,78 @@
+import os
+import unittest
+from time import perf_counter
+
+from config import GoalsConfig
+from project_start import read_goals
+from tests.benchmarks.suite import (
+    BENCHMARKS,
+    load_baseline,
+    measure,
+    reference_workload,
+    run_benchmark
+)
+
+# Factor that a time may grow by compared to the baseline.
+TOLERANCE = float(os.environ.get("BENCHMARK_TOLERANCE", 2.0))
+# How much the scaling exponent may grow by compared to the baseline.
+EXPONENT_TOLERANCE = 0.35
+
+
+@unittest.skipUnless(
+    os.environ.get("RUN_BENCHMARKS"),
+    "Set RUN_BENCHMARKS to run the benchmarks."
+)
+class TestBenchmarks(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.baseline = load_baseline()
+        cls.reference_time = measure(reference_workload)
+
+    def test_benchmarks(self):
+        for benchmark in BENCHMARKS:
+            with self.subTest(benchmark.name):
+                self._check(benchmark)
+
+    def test_read_goals_wall_time(self):
+        # 500 goals for 300 projects, with a value in every third cell.
+        settings = GoalsConfig(
+            project_row=0,
+            last_row=501,
+            first_project_column="C"
+        )
+        rows = [["Mål", ""] + [f"Project {j}" for j in range(300)]]
+        for i in range(500):
+            rows.append(
+                [f"T.{i} - Mål {i}", ""]
+                + [str(i) if (i + j) % 3 == 0 else "" for j in range(300)]
+            )
+
+        start = perf_counter()
+        read_goals(iter(rows), settings)
+        elapsed = perf_counter() - start
+
+        # Reading cell by cell used to take over a second.
+        self.assertLess(elapsed, 1.0)
+
+    def _check(self, benchmark):
+        stored = self.baseline.get(benchmark.name)
+        if stored is None or stored.sizes != benchmark.sizes:
+            self.skipTest(f"No baseline for '{benchmark.name}'.")
+        result = run_benchmark(benchmark, self.reference_time)
+        for size, time, stored_time in zip(
+                result.sizes,
+                result.times,
+                stored.times
+        ):
+            self.assertLessEqual(
+                time,
+                stored_time * TOLERANCE,
+                f"'{benchmark.name}' with size {size} is slower than the "
+                "baseline."
+            )
+        self.assertLessEqual(
+            result.exponent,
+            stored.exponent + EXPONENT_TOLERANCE,
+            f"'{benchmark.name}' scales worse than the baseline."
+        )
@@ -0,0 +1,26 @@
+import os
+import tempfile
+import unittest
+
+import yaml
+
+from tests.benchmarks.load_simulation import REPO_DIR, simulate
+
+
+class TestLoadSimulation(unittest.TestCase):
+
+    def test_simulate(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with open(os.path.join(REPO_DIR, "config.yaml")) as file_:
+            config_data = yaml.safe_load(file_)
+
+        result = simulate(3, directory.name, config_data, 2024)
+
+        self.assertEqual(result["projects"], 3)
+        self.assertEqual(result["conduit_requests"]["project.edit"], 3)
+        # Several pages for each project, besides the year pages.
+        self.assertGreater(result["wiki_requests"]["edit"], 3 * 4)
+        self.assertGreater(result["peak_rss"], 0)
+        self.assertIn("process projects", result["phases"])
+        self.assertIn("Phabricator project", result["stages"])
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from cache import LookupCache
+
+
+class TestLookupCache(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self._path = os.path.join(directory.name, "cache.json")
+
+    def test_get_missing(self):
+        cache = LookupCache()
+
+        self.assertIsNone(cache.get("key"))
+
+    def test_values_reused_between_runs(self):
+        LookupCache(self._path, 60).set("key", ["PHID-PROJ-abc123", "Name"])
+
+        cache = LookupCache(self._path, 60)
+
+        self.assertEqual(cache.get("key"), ["PHID-PROJ-abc123", "Name"])
+
+    def test_values_written_on_save_without_autosave(self):
+        cache = LookupCache(self._path, autosave=False)
+        cache.set("key", "value")
+
+        self.assertFalse(os.path.exists(self._path))
+
+        cache.save()
+
+        self.assertEqual(LookupCache(self._path).get("key"), "value")
+
+    @patch("cache.time")
+    def test_expired_values_not_loaded(self, mock_time):
+        mock_time.return_value = 1000.0
+        LookupCache(self._path, 60).set("key", "value")
+        mock_time.return_value = 1061.0
+
+        cache = LookupCache(self._path, 60)
+
+        self.assertIsNone(cache.get("key"))
@@ -0,0 +1,183 @@
+import unittest
+from time import perf_counter
+
+from conduit_emulator import ConduitEmulator
+from config import Config, PhabConfig, WikiConfig
+from phab import Phab, PhabApiError
+
+
+class TestConduitEmulator(unittest.TestCase):
+
+    def setUp(self):
+        self._emulator = ConduitEmulator()
+        self._parent = self._emulator.add_project("Parent")
+
+    def search(self, parameters):
+        status, response = self._emulator.handle("project.search", parameters)
+        self.assertEqual(status, 200)
+        return response["result"]
+
+    def test_search_by_ids(self):
+        project = self._emulator.add_project("Project")
+
+        result = self.search({"constraints[ids][0]": str(project["id"])})
+
+        self.assertEqual(result["data"], [project])
+        self.assertIsNone(result["cursor"]["after"])
+
+    def test_search_by_query(self):
+        self._emulator.add_project("Parent-Project One")
+        self._emulator.add_project("Parent-Project Two")
+
+        result = self.search({"constraints[query]": "project two"})
+
+        self.assertEqual(
+            [p["fields"]["name"] for p in result["data"]],
+            ["Parent-Project Two"]
+        )
+
+    def test_search_by_parents_with_cursor(self):
+        for i in range(250):
+            self._emulator.add_project(
+                f"Project {i}",
+                parent_phid=self._parent["phid"]
+            )
+        self._emulator.add_project("Other")
+
+        names = []
+        parameters = {"constraints[parents][0]": self._parent["phid"]}
+        while True:
+            result = self.search(parameters)
+            names += [p["fields"]["name"] for p in result["data"]]
+            if result["cursor"]["after"] is None:
+                break
+            parameters["after"] = result["cursor"]["after"]
+
+        self.assertEqual(len(names), 250)
+        self.assertEqual(set(names), {f"Project {i}" for i in range(250)})
+        self.assertEqual(self._emulator.requests, {"project.search": 3})
+
+    def test_edit_creates_project(self):
+        status, response = self._emulator.handle("project.edit", {
+            "transactions[0][type]": "name",
+            "transactions[0][value]": "Parent-Project",
+            "transactions[1][type]": "slugs",
+            "transactions[1][value][0]": "Parent-Projekt",
+            "transactions[2][type]": "parent",
+            "transactions[2][value]": self._parent["phid"]
+        })
+
+        self.assertEqual(status, 200)
+        project_id = response["result"]["object"]["id"]
+        [project] = self.search({"constraints[ids][0]": str(project_id)})[
+            "data"
+        ]
+        self.assertEqual(project["fields"]["slug"], "parent-project")
+        self.assertEqual(project["fields"]["parent"]["name"], "Parent")
+
+    def test_edit_duplicate_hashtag(self):
+        self._emulator.add_project("Project", ["projekt"])
+
+        _, response = self._emulator.handle("project.edit", {
+            "transactions[0][type]": "name",
+            "transactions[0][value]": "Projekt"
+        })
+
+        self.assertEqual(response["error_code"], "ERR-CONDUIT-CORE")
+        self.assertIn("projekt", response["error_info"])
+
+    def test_error_rate(self):
+        emulator = ConduitEmulator(
+            error_rates={"project.search": 0.5},
+            seed=1
+        )
+
+        statuses = [
+            emulator.handle("project.search", {})[0] for _ in range(200)
+        ]
+
+        errors = emulator.errors["project.search"]
+        self.assertEqual(statuses.count(500), errors)
+        self.assertGreater(statuses.count(500), 50)
+        self.assertLess(statuses.count(500), 150)
+        self.assertNotIn("project.edit", emulator.errors)
+
+
+class TestPhabWithConduitEmulator(unittest.TestCase):
+
+    def start_emulator(self, **parameters):
+        self._emulator = ConduitEmulator(**parameters)
+        self._parent = self._emulator.add_project("Wikimedia-Sverige")
+        self._emulator.start()
+        self.addCleanup(self._emulator.stop)
+
+    def make_phab(self, **parameters):
+        config = Config(
+            phab=PhabConfig(
+                api_url=self._emulator.api_url,
+                parent_project_id=self._parent["id"],
+                wiki_url="https://se.wikimedia.org/wiki",
+                retry_backoff=0,
+                **parameters
+            ),
+            wiki=WikiConfig(project_namespace="Projekt")
+        )
+        return Phab(config, False)
+
+    def test_add_projects(self):
+        self.start_emulator()
+        phab = self.make_phab()
+        self._emulator.add_project(
+            "Wikimedia-Sverige-Existing",
+            parent_phid=self._parent["phid"]
+        )
+        phab.prefetch_projects()
+
+        new_id, new_name = phab.add_project("New", "Ny", "Description")
+        existing_id, _ = phab.add_project("Existing", "Befintlig", "")
+
+        self.assertEqual(new_name, "Wikimedia-Sverige-New")
+        self.assertEqual(existing_id, 2)
+        self.assertEqual(
+            self._emulator.requests,
+            {"project.search": 2, "project.edit": 1}
+        )
+        self.assertEqual(phab._stats["connections"], 1)
+
+    def test_retries_server_errors(self):
+        self.start_emulator(error_rates={"project.search": 0.3}, seed=3)
+        phab = self.make_phab(retries=10)
+
+        for i in range(20):
+            phab._get_project_id(f"Project {i}")
+
+        errors = self._emulator.errors["project.search"]
+        self.assertGreater(errors, 0)
+        self.assertEqual(phab._stats["retries"], errors)
+
+    def test_edit_not_retried(self):
+        self.start_emulator(error_rates={"project.edit": 1})
+        phab = self.make_phab(retries=10)
+
+        with self.assertRaises(Exception):
+            phab.create_project("Name", "Slug", "", self._parent["phid"])
+
+        self.assertEqual(self._emulator.requests, {"project.edit": 1})
+
+    def test_api_error(self):
+        self.start_emulator()
+        phab = self.make_phab()
+        phab.create_project("Name", "slug", "", self._parent["phid"])
+
+        with self.assertRaises(PhabApiError):
+            phab.create_project("Name", "other", "", self._parent["phid"])
+
+    def test_latency(self):
+        self.start_emulator(latency={"project.search": 0.05})
+        phab = self.make_phab()
+
+        start = perf_counter()
+        phab._get_project_id("Project")
+        elapsed = perf_counter() - start
+
+        self.assertGreaterEqual(elapsed, 0.05)
@@ -0,0 +1,197 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import yaml
+
+import config
+from config import ConfigError, compile_config, load_config
+
+
+def make_config_data():
+    return {
+        "goals": {
+            "project_row": 1,
+            "last_row": 56,
+            "first_project_column": "F"
+        },
+        "project_columns": {
+            "project_number": "Projektnummer",
+            "program": "Program",
+            "swedish_name": "Svenskt projektnamn",
+            "english_name": "Engelskt projektnamn",
+            "about_english": "Mini-description of the project",
+            "about_swedish": "Om projektet",
+            "super_project": "Överprojekt",
+            "active": "Aktiv"
+        },
+        "wiki": {
+            "edit_summary": "Sidan skapad",
+            "project_namespace": "Projekt",
+            "project_template": "Mall:Projekt-sida",
+            "project_parameters": {
+                "beskrivning": {"column": "about_swedish"}
+            },
+            "subpages": [
+                {
+                    "title": "Mål",
+                    "template_name": "Mall:Mål-sida",
+                    "add_goals_parameters": {"mål": "Mall:Mål <YEAR>"}
+                }
+            ],
+            "year_pages": {
+                "current_projects_template": "Mall:Aktuella projekt <YEAR>",
+                "simple": {"Diarium/<YEAR>": "Mall:Diarium år"},
+                "projects": {
+                    "title": "Projekt <YEAR>",
+                    "template": "Mall:Årsida för projekt"
+                },
+                "categories": {
+                    "general": "Föreningen <YEAR>",
+                    "pages": {"Projekt <YEAR>": "Projekt efter år"}
+                },
+                "volunteer_tasks": {
+                    "title": "Frivilliguppdrag <YEAR>",
+                    "template": "Mall:Frivilliguppdrag"
+                }
+            },
+            "project_name_template": "Mall:Projektnamn",
+            "project_number_template": "Mall:Projektid"
+        },
+        "phab": {
+            "api_url": "https://phabricator.example/api",
+            "parent_project_id": 2480,
+            "rate_limit": {"rate": 2}
+        }
+    }
+
+
+class TestConfig(unittest.TestCase):
+
+    def test_compile_config(self):
+        result = compile_config(make_config_data(), 2024)
+
+        self.assertEqual(result.goals.first_project_column, "F")
+        self.assertEqual(result.wiki.save_retries, 3)
+        self.assertEqual(result.wiki.subpages[0].title, "Mål")
+        self.assertIsNone(result.wiki.subpages[0].parameters)
+        self.assertEqual(result.phab.rate_limit.rate, 2)
+        self.assertEqual(result.phab.rate_limit.burst, 1)
+        self.assertEqual(result.phab.pool_size, 4)
+
+    def test_compile_config_puts_year_in_titles(self):
+        result = compile_config(make_config_data(), 2024)
+
+        year_pages = result.wiki.year_pages
+        self.assertEqual(
+            year_pages.current_projects_template,
+            "Mall:Aktuella projekt 2024"
+        )
+        self.assertEqual(
+            year_pages.simple,
+            {"Diarium/2024": "Mall:Diarium år"}
+        )
+        self.assertEqual(year_pages.projects.title, "Projekt 2024")
+        self.assertEqual(year_pages.categories.general, "Föreningen 2024")
+        self.assertEqual(
+            year_pages.categories.pages,
+            {"Projekt 2024": "Projekt efter år"}
+        )
+        self.assertEqual(
+            year_pages.volunteer_tasks.title,
+            "Frivilliguppdrag 2024"
+        )
+        self.assertEqual(
+            result.wiki.subpages[0].add_goals_parameters,
+            {"mål": "Mall:Mål 2024"}
+        )
+
+    def test_compile_config_missing_value(self):
+        data = make_config_data()
+        del data["wiki"]["year_pages"]["projects"]["template"]
+
+        with self.assertRaisesRegex(
+                ConfigError,
+                r"'wiki\.year_pages\.projects\.template' is missing"
+        ):
+            compile_config(data, 2024)
+
+    def test_compile_config_missing_column(self):
+        data = make_config_data()
+        del data["project_columns"]["active"]
+
+        with self.assertRaisesRegex(ConfigError, "project_columns.active"):
+            compile_config(data, 2024)
+
+    def test_compile_config_wrong_type(self):
+        data = make_config_data()
+        data["phab"]["parent_project_id"] = "2480"
+
+        with self.assertRaisesRegex(
+                ConfigError,
+                "'phab.parent_project_id' should be of type int, not str"
+        ):
+            compile_config(data, 2024)
+
+    def test_compile_config_bool_is_not_a_number(self):
+        data = make_config_data()
+        data["wiki"]["save_workers"] = True
+
+        with self.assertRaises(ConfigError):
+            compile_config(data, 2024)
+
+    def test_compile_config_unknown_column_in_parameters(self):
+        data = make_config_data()
+        data["wiki"]["subpages"][0]["parameters"] = {
+            "budget": {"column": "budget"}
+        }
+
+        with self.assertRaisesRegex(ConfigError, "'budget'"):
+            compile_config(data, 2024)
+
+    def test_load_config_uses_cache(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "config.yaml")
+        cache_path = f"{path}.cache"
+        with open(path, "w") as file_:
+            yaml.safe_dump(make_config_data(), file_, allow_unicode=True)
+
+        first = load_config(path, 2024, cache_path)
+        with patch.object(
+                config,
+                "compile_config",
+                wraps=compile_config
+        ) as mock_compile:
+            second = load_config(path, 2024, cache_path)
+            other_year = load_config(path, 2025, cache_path)
+
+        self.assertEqual(second, first)
+        self.assertEqual(mock_compile.call_count, 1)
+        self.assertEqual(
+            other_year.wiki.year_pages.projects.title,
+            "Projekt 2025"
+        )
+
+    def test_load_config_cache_not_used_after_code_change(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "config.yaml")
+        cache_path = f"{path}.cache"
+        with open(path, "w") as file_:
+            yaml.safe_dump(make_config_data(), file_, allow_unicode=True)
+
+        load_config(path, 2024, cache_path)
+        with patch.object(
+                config,
+                "_source_hash",
+                return_value="changed"
+        ), patch.object(
+                config,
+                "compile_config",
+                wraps=compile_config
+        ) as mock_compile:
+            load_config(path, 2024, cache_path)
+
+        self.assertEqual(mock_compile.call_count, 1)
@@ -0,0 +1,58 @@
+import math
+import unittest
+from unittest.mock import patch
+
+from goal_table import GoalTable, ProjectGoals
+
+
+class TestGoalTable(unittest.TestCase):
+
+    def setUp(self):
+        self._table = GoalTable({
+            "Project A": {"T.1": "1", "T.3": "text"},
+            "Project B": {},
+            "Project C": {"T.2": "2,5", "T.1": "3"}
+        })
+
+    def test_projects_without_values_left_out(self):
+        self.assertEqual(list(self._table), ["Project A", "Project C"])
+        self.assertNotIn("Project B", self._table)
+
+    def test_project_view(self):
+        project_goals = self._table["Project C"]
+
+        self.assertEqual(list(project_goals.items()), [
+            ("T.2", "2,5"),
+            ("T.1", "3")
+        ])
+        self.assertEqual(project_goals["T.1"], "3")
+        self.assertNotIn("T.3", project_goals)
+        self.assertEqual(len(project_goals), 2)
+
+    def test_project_view_read_without_lookups(self):
+        project_goals = self._table["Project A"]
+
+        with patch.object(ProjectGoals, "__getitem__", side_effect=KeyError):
+            self.assertEqual(
+                dict(project_goals.items()),
+                {"T.1": "1", "T.3": "text"}
+            )
+            self.assertEqual(list(project_goals.values()), ["1", "text"])
+
+    def test_goal_names(self):
+        self.assertEqual(self._table.goal_names, ["T.1", "T.3", "T.2"])
+
+    def test_goal_values(self):
+        self.assertEqual(
+            self._table.goal_values("T.1"),
+            {"Project A": "1", "Project C": "3"}
+        )
+        self.assertEqual(self._table.goal_values("T.9"), {})
+
+    def test_totals(self):
+        totals = self._table.totals()
+
+        self.assertEqual(totals, {"T.1": 4.0, "T.3": 0.0, "T.2": 2.5})
+        self.assertEqual(self._table.total("T.1"), 4.0)
+        self.assertTrue(math.isclose(self._table.total("T.2"), 2.5))
+        self.assertEqual(self._table.total("T.9"), 0.0)
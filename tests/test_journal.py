@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+from journal import Journal, JournalMismatchError
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, "journal")
+        self._run = {"year": "2024", "project_file": "projects.tsv"}
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_resume(self):
+        journal = Journal(self._path, self._run, False)
+        journal.record("phab_project", "Project", [2, "Parent-Project"])
+        journal.record("template_row", ["Template:Name", "1"], "| 1 = A")
+        journal.close()
+
+        resumed = Journal(self._path, self._run, True)
+
+        self.assertEqual(
+            resumed.get("phab_project", "Project"),
+            [2, "Parent-Project"]
+        )
+        self.assertEqual(
+            resumed.get("template_row", ["Template:Name", "1"]),
+            "| 1 = A"
+        )
+        self.assertIsNone(resumed.get("page", "Page"))
+        resumed.close()
+
+    def test_not_resumed_replaced(self):
+        journal = Journal(self._path, self._run, False)
+        journal.record("page", "Page", 1)
+        journal.close()
+
+        new_journal = Journal(self._path, self._run, False)
+
+        self.assertIsNone(new_journal.get("page", "Page"))
+        new_journal.close()
+
+    def test_resume_other_run_raises(self):
+        Journal(self._path, self._run, False).close()
+
+        with self.assertRaises(JournalMismatchError):
+            Journal(self._path, {"year": "2025"}, True)
+
+    def test_incomplete_last_line_removed(self):
+        journal = Journal(self._path, self._run, False)
+        journal.record("page", "Page", 1)
+        journal.close()
+        with open(self._path, "a") as file_:
+            file_.write('{"operation": "pa')
+
+        resumed = Journal(self._path, self._run, True)
+        resumed.record("page", "Other page", 2)
+        resumed.close()
+        resumed_again = Journal(self._path, self._run, True)
+
+        self.assertEqual(resumed_again.get("page", "Page"), 1)
+        self.assertEqual(resumed_again.get("page", "Other page"), 2)
+        resumed_again.close()
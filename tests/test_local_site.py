@@ -0,0 +1,142 @@
+import os
+import subprocess
+import sys
+import threading
+import unittest
+from time import perf_counter
+
+from local_site import LocalSite, NoPageError
+from page_cache import PageCache
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Writes to an existing page with a local site and prints the saved
+# text and whether Pywikibot was loaded.
+WRITE_PAGE = """
+import sys
+sys.path.insert(0, {repo_dir!r})
+from config import WikiConfig
+from local_site import LocalSite
+from wiki import Wiki
+site = LocalSite()
+site.add_page("Sida", "Old text")
+wiki = Wiki(
+    WikiConfig(edit_summary="Summary"),
+    {{}}, False, True, 2024, None, None, None, False,
+    site=site
+)
+page = site.page("Sida")
+page.text = "New text"
+wiki._write_page(page)
+print(site.get_text("Sida"), "pywikibot" in sys.modules)
+"""
+
+
+class TestLocalSite(unittest.TestCase):
+
+    def setUp(self):
+        self._site = LocalSite()
+
+    def test_missing_page(self):
+        page = self._site.page("Sida")
+
+        self.assertFalse(page.exists())
+        self.assertIsNone(page.latest_revision_id)
+        self.assertEqual(page.text, "")
+        with self.assertRaises(NoPageError):
+            page.get()
+
+    def test_save_and_load(self):
+        page = self._site.page("sida_ett", "Projekt")
+        page.text = "Text"
+
+        page.save(summary="Summary")
+
+        self.assertEqual(page.title(), "Projekt:Sida ett")
+        self.assertEqual(self._site.get_text("Projekt:Sida ett"), "Text")
+        loaded = self._site.page("Sida ett", "Projekt")
+        self.assertTrue(loaded.exists())
+        self.assertEqual(loaded.get(), "Text")
+        self.assertEqual(loaded.latest_revision_id, page.latest_revision_id)
+
+    def test_revision_ids_increase(self):
+        first = self._site.add_page("A", "Text")
+        second = self._site.add_page("B", "Text")
+        page = self._site.page("A")
+        page.text = "New text"
+
+        page.save()
+
+        self.assertLess(first, second)
+        self.assertGreater(page.latest_revision_id, second)
+
+    def test_get_force_reloads(self):
+        self._site.add_page("Sida", "Old text")
+        page = self._site.page("Sida")
+        page.get()
+        self._site.add_page("Sida", "New text")
+
+        self.assertEqual(page.get(), "Old text")
+        self.assertEqual(page.get(force=True), "New text")
+
+    def test_preload_in_batches(self):
+        for i in range(60):
+            self._site.add_page(f"Sida {i}", f"Text {i}")
+        pages = [self._site.page(f"Sida {i}") for i in range(120)]
+
+        loaded = list(self._site.preload(pages))
+
+        self.assertEqual(loaded, pages)
+        self.assertEqual(pages[59].get(), "Text 59")
+        self.assertFalse(pages[60].exists())
+        self.assertEqual(self._site.requests, {"query": 3})
+
+    def test_requests_counted(self):
+        self._site.add_page("Sida", "Text")
+        page = self._site.page("Sida")
+        page.exists()
+        page.text = self._site.pre_save_transform(page, "New text\n\n")
+        page.save()
+
+        self.assertEqual(self._site.get_text("Sida"), "New text")
+        self.assertEqual(
+            self._site.requests,
+            {"query": 1, "parse": 1, "edit": 1}
+        )
+
+    def test_page_cache(self):
+        self._site.add_page("Mall:Projektnamn", "Text")
+        cache = PageCache(self._site)
+        page = cache.get_page("Projektnamn", "Mall")
+
+        self.assertIs(cache.get_page("Mall:Projektnamn"), page)
+        self.assertEqual(cache.get_text(page), "Text")
+
+    def test_latency_overlaps_between_threads(self):
+        site = LocalSite(latency=0.05)
+        pages = [site.page(f"Sida {i}") for i in range(8)]
+        for page in pages:
+            page.text = "Text"
+        threads = [threading.Thread(target=page.save) for page in pages]
+
+        start = perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = perf_counter() - start
+
+        self.assertEqual(site.requests, {"edit": 8})
+        # Saved one at a time, this would take 0.4 seconds.
+        self.assertLess(elapsed, 0.3)
+
+    def test_wiki_does_not_need_pywikibot(self):
+        # No input is given, so merging must not prompt.
+        result = subprocess.run(
+            [sys.executable, "-c", WRITE_PAGE.format(repo_dir=REPO_DIR)],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+
+        self.assertEqual(result.stdout.strip(), "New text False")
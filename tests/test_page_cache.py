@@ -0,0 +1,70 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from pywikibot import Page
+
+from page_cache import PageCache
+from site_backend import PywikibotSite
+
+
+def mock_page(title, text=None):
+    page = MagicMock(Page)
+    page.title.return_value = title
+    page.exists.return_value = text is not None
+    page.get.return_value = text
+    page.latest_revision_id = 1 if text is not None else None
+    return page
+
+
+class TestPageCache(unittest.TestCase):
+
+    def setUp(self):
+        self._cache = PageCache(MagicMock(PywikibotSite))
+
+    def test_page_loaded_once(self):
+        page = mock_page("Page", "Text")
+
+        self.assertTrue(self._cache.exists(page))
+        self.assertEqual(self._cache.get_text(page), "Text")
+        self.assertEqual(self._cache.get_revision_id(page), 1)
+
+        page.exists.assert_called_once()
+        page.get.assert_called_once()
+
+    def test_missing_page(self):
+        page = mock_page("Page")
+
+        self.assertFalse(self._cache.exists(page))
+        self.assertIsNone(self._cache.get_text(page))
+        page.get.assert_not_called()
+
+    def test_saved_page_reloaded(self):
+        page = mock_page("Page", "Old text")
+        self._cache.get_text(page)
+        page.get.return_value = "New text"
+
+        self._cache.saved(page)
+
+        self.assertEqual(self._cache.get_text(page), "New text")
+        page.get.assert_called_with(force=True, get_redirect=True)
+
+    def test_concurrent_lookups_load_once(self):
+        page = mock_page("Page", "Text")
+
+        def slow_exists():
+            time.sleep(0.05)
+            return True
+
+        page.exists.side_effect = slow_exists
+        threads = [
+            threading.Thread(target=self._cache.exists, args=(page,))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        page.exists.assert_called_once()
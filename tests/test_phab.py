@@ -1,8 +1,14 @@
+import json
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import MagicMock, patch
 
 import pywikibot
+import requests
 
+from config import Config, PhabConfig, WikiConfig
+from journal import Journal
 from phab import Phab
 
 
@@ -10,19 +16,17 @@ class TestPhab(unittest.TestCase):
 
     @patch("phab.requests")
     def test_add_project(self, mock_requests):
-        config = {
-            "phab": {
-                "parent_project_id": 1,
-                "request_delay": 0,
-                "api_url": "http://site.url"
-            },
-            "wiki": {
-                "project_namespace": "Project"
-            }
-        }
+        config = Config(
+            phab=PhabConfig(
+                parent_project_id=1,
+                request_delay=0,
+                api_url="http://site.url"
+            ),
+            wiki=WikiConfig(project_namespace="Project")
+        )
         self._phab = Phab(config, False)
 
-        def mock_post(url, data):
+        def mock_post(url, data, timeout):
             if url.endswith("/project.search"):
                 if data.get("constraints[ids][0]") == 1:
                     parent_project_data = {
@@ -42,7 +46,7 @@ class TestPhab(unittest.TestCase):
                 result_object = {"id": 2}
                 return mock_phab_request(result_object=result_object)
 
-        mock_requests.post.side_effect = mock_post
+        mock_requests.Session.return_value.post.side_effect = mock_post
         pywikibot.config.family = "wikimediachapter"
         pywikibot.config.mylang = "se"
         name_en = "Project in English"
@@ -51,7 +55,7 @@ class TestPhab(unittest.TestCase):
 
         result = self._phab.add_project(name_en, name_sv, description)
 
-        request_calls = mock_requests.post.mock_calls
+        request_calls = mock_requests.Session.return_value.post.mock_calls
         assert request_calls[2].args[0] == "http://site.url/project.edit"
         edit_arguments = request_calls[2].args[1]
         assert edit_arguments.get("transactions[0][type]") == "name"
@@ -68,8 +72,224 @@ class TestPhab(unittest.TestCase):
             "transactions[3][value]") == "PHID-PROJ-abc123"
         assert result == (2, "Parent-Project-in-English")
 
+    @patch("phab.requests")
+    def test_add_project_journaled_not_requested(self, mock_requests):
+        config = Config(
+            phab=PhabConfig(
+                parent_project_id=1,
+                request_delay=0,
+                api_url="http://site.url"
+            )
+        )
+        journal = MagicMock(Journal)
+        journal.get.return_value = [2, "Parent-Project"]
+        self._phab = Phab(config, False, journal=journal)
+
+        result = self._phab.add_project("Project", "Projekt", "Description")
+
+        mock_requests.Session.return_value.post.assert_not_called()
+        journal.get.assert_called_with("phab_project", "Project")
+        assert result == (2, "Parent-Project")
+
+    @patch("phab.requests")
+    def test_get_project_phid_and_name_cached(self, mock_requests):
+        config = Config(
+            phab=PhabConfig(
+                parent_project_id=1,
+                request_delay=0,
+                api_url="http://site.url"
+            )
+        )
+        phab = Phab(config, False)
+        parent_project_data = {
+            "id": 1,
+            "phid": "PHID-PROJ-abc123",
+            "fields": {
+                "name": "Parent"
+            }
+        }
+        mock_requests.Session.return_value.post.return_value = \
+            mock_phab_request(parent_project_data)
+
+        first = phab._get_project_phid_and_name(1)
+        second = phab._get_project_phid_and_name(1)
+
+        assert first == second == ("PHID-PROJ-abc123", "Parent")
+        assert mock_requests.Session.return_value.post.call_count == 1
+
+    @patch("phab.requests")
+    def test_cached_project_from_other_site_not_used(self, mock_requests):
+        config = Config(
+            phab=PhabConfig(
+                parent_project_id=1,
+                request_delay=0,
+                api_url="http://site.url"
+            )
+        )
+        phab = Phab(config, False)
+        phab._lookup_cache.set(
+            "http://other.url project:1",
+            ["PHID-PROJ-other", "Other"]
+        )
+        mock_requests.Session.return_value.post.return_value = \
+            mock_phab_request({
+                "id": 1,
+                "phid": "PHID-PROJ-abc123",
+                "fields": {
+                    "name": "Parent"
+                }
+            })
+
+        result = phab._get_project_phid_and_name(1)
+
+        assert result == ("PHID-PROJ-abc123", "Parent")
+
+    @patch("phab.requests")
+    def test_prefetch_projects(self, mock_requests):
+        config = Config(
+            phab=PhabConfig(
+                parent_project_id=1,
+                request_delay=0,
+                api_url="http://site.url"
+            )
+        )
+        phab = Phab(config, False)
+        phab._lookup_cache.set(
+            "http://site.url project:1",
+            ["PHID-PROJ-abc123", "Parent"]
+        )
+        pages = {
+            None: mock_phab_request(
+                {
+                    "id": 2,
+                    "fields": {
+                        "name": "Parent-Project",
+                        "slug": "parent-project"
+                    }
+                },
+                after="2"
+            ),
+            "2": mock_phab_request({
+                "id": 3,
+                "fields": {
+                    "name": "Parent-Project-Two",
+                    "slug": "parent-projekt-två"
+                }
+            })
+        }
+
+        def mock_post(url, data, timeout):
+            assert data["constraints[parents][0]"] == "PHID-PROJ-abc123"
+            assert data["limit"] == 100
+            return pages[data.get("after")]
+
+        mock_requests.Session.return_value.post.side_effect = mock_post
+
+        phab.prefetch_projects()
+
+        assert mock_requests.Session.return_value.post.call_count == 2
+        assert phab._get_project_id("Parent-Project") == 2
+        assert phab._get_project_id("Parent-Projekt-Två") == 3
+        assert phab._get_project_id("Parent-Proj") is None
+        assert mock_requests.Session.return_value.post.call_count == 2
+
+    @patch("phab.sleep")
+    @patch("phab.requests")
+    def test_search_retried_on_connection_error(self, mock_requests, _):
+        config = Config(
+            phab=PhabConfig(
+                parent_project_id=1,
+                request_delay=0,
+                api_url="http://site.url"
+            )
+        )
+        phab = Phab(config, False)
+        mock_post = mock_requests.Session.return_value.post
+        mock_post.side_effect = [
+            requests.exceptions.ConnectionError(),
+            mock_phab_request()
+        ]
+
+        result = phab._get_project_id("Parent-Project")
+
+        assert result is None
+        assert mock_post.call_count == 2
+        assert phab._stats["retries"] == 1
+
+    @patch("phab.requests")
+    def test_edit_not_retried(self, mock_requests):
+        config = Config(
+            phab=PhabConfig(request_delay=0, api_url="http://site.url")
+        )
+        phab = Phab(config, False)
+        mock_post = mock_requests.Session.return_value.post
+        mock_post.side_effect = requests.exceptions.ConnectionError()
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            phab._make_request("project.edit", {})
+
+        assert mock_post.call_count == 1
+
+    def test_connection_reused(self):
+        server = ThreadingHTTPServer(("localhost", 0), MockConduitHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        config = Config(
+            phab=PhabConfig(
+                request_delay=0,
+                api_url="http://localhost:{}/api".format(server.server_port)
+            )
+        )
+        phab = Phab(config, False)
+
+        parameters = {"constraints": {"ids": [1]}}
+        phab._make_request("project.search", parameters)
+        phab._make_request("project.search", parameters)
+
+        assert phab._stats["requests"] == 2
+        assert phab._stats["connections"] == 1
+
+    def test_to_phab_parameters(self):
+        phab = Phab(Config(phab=PhabConfig()), False)
+        parameters = {
+            "constraints": {"ids": [1, 2]},
+            "limit": 100
+        }
+
+        result = phab._to_phab_parameters(parameters)
+
+        assert result == {
+            "constraints[ids][0]": 1,
+            "constraints[ids][1]": 2,
+            "limit": 100
+        }
+
+
+class MockConduitHandler(BaseHTTPRequestHandler):
+    """Responds to every request with an empty Conduit result."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({
+            "error_info": None,
+            "result": {"data": []}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
 
-def mock_phab_request(result_data=None, result_object=None):
+def mock_phab_request(result_data=None, result_object=None, after=None):
     """Create a mock response.
 
     Parameters
@@ -79,6 +299,9 @@ def mock_phab_request(result_data=None, result_object=None):
         list if not given.
     result_object : dict, optional
         `result.object` the response. Empty dict if not given.
+    after : str, optional
+        `result.cursor.after` in the response, i.e. the cursor for the
+        next page. None if not given.
 
     Returns
     -------
@@ -93,7 +316,8 @@ def mock_phab_request(result_data=None, result_object=None):
         "error_info": "",
         "result": {
             "data": data,
-            "object": object_
+            "object": object_,
+            "cursor": {"after": after}
         }
     }
     response = MagicMock()
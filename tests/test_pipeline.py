@@ -0,0 +1,100 @@
+import time
+import unittest
+
+from pipeline import Pipeline
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_order_kept_with_workers(self):
+        results = []
+
+        def slow_first(item):
+            # Make earlier items finish later.
+            time.sleep((5 - item) * 0.01)
+            return item
+
+        pipeline = Pipeline()
+        pipeline.add_stage("first", slow_first, workers=3)
+        pipeline.add_stage("second", results.append)
+
+        pipeline.run(range(5))
+
+        self.assertEqual(results, [0, 1, 2, 3, 4])
+
+    def test_none_not_passed_on(self):
+        results = []
+        pipeline = Pipeline()
+        pipeline.add_stage(
+            "filter",
+            lambda item: item if item % 2 == 0 else None
+        )
+        pipeline.add_stage("collect", results.append)
+
+        pipeline.run(range(5))
+
+        self.assertEqual(results, [0, 2, 4])
+        self.assertEqual(pipeline.stats["filter"]["in"], 5)
+        self.assertEqual(pipeline.stats["filter"]["out"], 3)
+
+    def test_error_raised(self):
+        results = []
+
+        def fail_on_two(item):
+            if item == 2:
+                raise ValueError("Two")
+            return item
+
+        pipeline = Pipeline(queue_size=1)
+        pipeline.add_stage("fail", fail_on_two)
+        pipeline.add_stage("collect", results.append)
+
+        with self.assertRaises(ValueError):
+            pipeline.run(range(100))
+
+        self.assertEqual(results, [0, 1])
+
+    def test_earlier_items_finish_after_error(self):
+        results = []
+
+        def fail_on_three(item):
+            if item == 3:
+                raise ValueError("Three")
+            return item
+
+        def slow_collect(item):
+            # Keep the earlier items in the queues when the error
+            # happens.
+            time.sleep(0.02)
+            results.append(item)
+            return item
+
+        pipeline = Pipeline(queue_size=4)
+        pipeline.add_stage("fail", fail_on_three)
+        pipeline.add_stage("pass", lambda item: item)
+        pipeline.add_stage("collect", slow_collect)
+
+        with self.assertRaises(ValueError):
+            pipeline.run(range(100))
+
+        self.assertEqual(results, [0, 1, 2])
+        self.assertEqual(pipeline.stats["fail"]["out"], 3)
+
+    def test_earlier_items_finish_after_error_with_workers(self):
+        results = []
+
+        def fail_on_two(item):
+            if item == 2:
+                raise ValueError("Two")
+            # Make earlier items finish after the failing one.
+            time.sleep((5 - item) * 0.01)
+            return item
+
+        pipeline = Pipeline()
+        pipeline.add_stage("fail", fail_on_two, workers=3)
+        pipeline.add_stage("collect", results.append)
+
+        with self.assertRaises(ValueError):
+            pipeline.run(range(100))
+
+        self.assertEqual(results, [0, 1])
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+from plan import Plan
+
+
+class TestPlan(unittest.TestCase):
+
+    def test_save_and_load(self):
+        plan = Plan()
+        plan.add_phab_project("Name", "Namn", "Description", "PHID-1")
+        plan.add_page("Page", "Text", 3)
+        plan.add_template_rows("Template:Name", ["| 1 = Namn"])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "plan.json")
+            plan.save(path)
+            loaded = Plan.load(path)
+
+        self.assertEqual(loaded.phab_projects, plan.phab_projects)
+        self.assertEqual(loaded.pages, plan.pages)
+        self.assertEqual(loaded.template_rows, plan.template_rows)
+
+    def test_resolve_phab_ids(self):
+        plan = Plan()
+        placeholder = Plan.phab_id_placeholder("Name")
+        plan.add_page(
+            "Page",
+            f"{{{{Template|phab = {placeholder}}}}}",
+            None
+        )
+
+        plan.resolve_phab_ids({"Name": 12})
+
+        self.assertEqual(plan.pages[0]["text"], "{{Template|phab = 12}}")
+
+    def test_empty_template_rows_not_recorded(self):
+        plan = Plan()
+
+        plan.add_template_rows("Template:Name", [])
+
+        self.assertEqual(plan.template_rows, [])
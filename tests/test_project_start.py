@@ -1,6 +1,66 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
+from unittest.mock import MagicMock, patch
 
 import project_start
+from config import GoalsConfig
+from const import Components
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs project_start.py with the given arguments and prints which of
+# the heavy modules were loaded.
+RUN_MAIN = """
+import runpy
+import sys
+sys.path.insert(0, {repo_dir!r})
+sys.argv = ["project_start.py"] + {arguments!r}
+try:
+    runpy.run_path({script!r}, run_name="__main__")
+except SystemExit:
+    pass
+print(sorted(m for m in ("pywikibot", "requests") if m in sys.modules))
+"""
+
+
+def run_python(code, cwd=REPO_DIR):
+    """Run Python code in a new interpreter.
+
+    Parameters
+    ----------
+    code : str
+    cwd : str
+
+    Returns
+    -------
+    str
+        The last line written to standard out.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stdout.splitlines()[-1]
+
+
+def run_main(arguments, cwd=REPO_DIR):
+    return run_python(
+        RUN_MAIN.format(
+            repo_dir=REPO_DIR,
+            arguments=arguments,
+            script=os.path.join(REPO_DIR, "project_start.py")
+        ),
+        cwd
+    )
 
 
 class TestProjectStart(unittest.TestCase):
@@ -30,3 +90,199 @@ class TestProjectStart(unittest.TestCase):
             project_information,
             project_columns
         ))
+
+    def test_column_index(self):
+        self.assertEqual(project_start.column_index("A"), 0)
+        self.assertEqual(project_start.column_index("F"), 5)
+        self.assertEqual(project_start.column_index("Z"), 25)
+        self.assertEqual(project_start.column_index("AA"), 26)
+        self.assertEqual(project_start.column_index("BC"), 54)
+
+    def test_read_goals(self):
+        settings = GoalsConfig(
+            project_row=0,
+            last_row=4,
+            first_project_column="C"
+        )
+        rows = [
+            ["Mål", "", "Project A", "", "Project B"],
+            ["T.1 - Mål 1", "Fulfilled 1", "1", "", "2"],
+            ["", "", "", "", ""],
+            ["T.2 - Mål 2", "", "", "", "3"],
+            ["T.3 - Mål 3", "", "4", "", ""]
+        ]
+
+        goals, fulfillments = project_start.read_goals(iter(rows), settings)
+
+        self.assertEqual(
+            {project: dict(values) for project, values in goals.items()},
+            {
+                "Project A": {"T.1": "1"},
+                "Project B": {"T.1": "2", "T.2": "3"}
+            }
+        )
+        self.assertEqual(fulfillments, {"T.1": "Fulfilled 1"})
+
+    def test_read_goals_multi_letter_column(self):
+        settings = GoalsConfig(
+            project_row=0,
+            last_row=10,
+            first_project_column="AB"
+        )
+        padding = [""] * 26
+        rows = [
+            ["Mål", ""] + padding[2:] + ["Not a project", "Project"],
+            ["T.1 - Mål", ""] + padding[2:] + ["1", "2"]
+        ]
+
+        goals, _ = project_start.read_goals(iter(rows), settings)
+
+        self.assertEqual(dict(goals["Project"]), {"T.1": "2"})
+        self.assertEqual(len(goals), 1)
+
+    def test_read_goals_large_table(self):
+        # 500 goals for 300 projects, with a value in every third cell.
+        settings = GoalsConfig(
+            project_row=0,
+            last_row=501,
+            first_project_column="C"
+        )
+        rows = [["Mål", ""] + [f"Project {j}" for j in range(300)]]
+        for i in range(500):
+            rows.append(
+                [f"T.{i} - Mål {i}", ""]
+                + [str(i) if (i + j) % 3 == 0 else "" for j in range(300)]
+            )
+
+        goals, _ = project_start.read_goals(iter(rows), settings)
+
+        self.assertEqual(len(goals), 300)
+        self.assertEqual(len(goals["Project 0"]), 167)
+        self.assertEqual(goals["Project 1"]["T.2"], "2")
+
+    def test_uses_wiki(self):
+        self.assertTrue(project_start.uses_wiki(None))
+        self.assertTrue(project_start.uses_wiki([
+            Components.PHABRICATOR.value,
+            Components.CATEGORIES.value
+        ]))
+        self.assertTrue(project_start.uses_wiki([len(Components) + 1]))
+        self.assertFalse(
+            project_start.uses_wiki([Components.PHABRICATOR.value])
+        )
+
+    def test_uses_phab(self):
+        self.assertTrue(project_start.uses_phab(None))
+        self.assertTrue(
+            project_start.uses_phab([Components.PHABRICATOR.value])
+        )
+        self.assertFalse(
+            project_start.uses_phab([Components.PROJECT_MAIN_PAGE.value])
+        )
+
+    def test_positive_int(self):
+        self.assertEqual(project_start.positive_int("3"), 3)
+        for value in ["0", "-1", "two"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                project_start.positive_int(value)
+
+    def test_process_projects_keeps_order_with_phab_workers(self):
+        project_columns = {
+            "project_number": "NUMBER",
+            "program": "PROGRAM",
+            "english_name": "EN",
+            "swedish_name": "SV",
+            "about_english": "ABOUT",
+            "super_project": "SUPER",
+            "active": "ACTIVE"
+        }
+        projects = [
+            {
+                "NUMBER": str(i),
+                "PROGRAM": "",
+                "EN": f"Project {i}",
+                "SV": f"Projekt {i}",
+                "ABOUT": "",
+                "SUPER": "",
+                "ACTIVE": "1"
+            }
+            for i in range(5)
+        ]
+        phab = MagicMock()
+
+        def add_project(name_en, name_sv, description):
+            # Make earlier projects finish later.
+            index = int(name_en.split()[-1])
+            time.sleep((5 - index) * 0.01)
+            return index, f"Parent-{name_en}"
+
+        phab.add_project.side_effect = add_project
+        wiki = MagicMock()
+
+        with patch.multiple(
+                project_start,
+                create=True,
+                phab=phab,
+                wiki=wiki,
+                components=None,
+                goals=None,
+                added_projects=set()
+        ):
+            project_start.process_projects(
+                projects,
+                project_columns,
+                None,
+                3
+            )
+
+        self.assertEqual(
+            [c.args[1:] for c in wiki.add_project_main_page.call_args_list],
+            [(i, f"Parent-Project {i}") for i in range(5)]
+        )
+        self.assertEqual(
+            [c.args[0] for c in wiki.add_project.call_args_list],
+            [str(i) for i in range(5)]
+        )
+
+    def test_timed_phase(self):
+        phase_times = {}
+
+        with project_start.timed_phase("phase", phase_times):
+            pass
+        with self.assertRaises(ValueError), \
+                project_start.timed_phase("phase", phase_times):
+            raise ValueError()
+
+        self.assertEqual(list(phase_times), ["phase"])
+        self.assertGreater(phase_times["phase"], 0)
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_help_does_not_load_backends(self):
+        modules = run_main(["--help"])
+
+        self.assertEqual(modules, "[]")
+
+    def test_check_config_does_not_load_backends(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        config_path = os.path.join(directory.name, "config.yaml")
+        shutil.copy(os.path.join(REPO_DIR, "config.yaml"), config_path)
+
+        modules = run_main(
+            ["--check-config", "--config", config_path],
+            directory.name
+        )
+
+        self.assertEqual(modules, "[]")
+
+    def test_phab_does_not_load_pywikibot(self):
+        modules = run_python(
+            "import sys\n"
+            f"sys.path.insert(0, {REPO_DIR!r})\n"
+            "import phab\n"
+            "print('pywikibot' in sys.modules)"
+        )
+
+        self.assertEqual(modules, "False")
@@ -0,0 +1,73 @@
+import unittest
+from unittest.mock import patch
+
+from config import PhabConfig
+from rate_limiter import RateLimiter
+
+
+@patch("rate_limiter.sleep")
+@patch("rate_limiter.monotonic")
+class TestRateLimiter(unittest.TestCase):
+
+    def test_acquire_burst_without_waiting(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 0.0
+        limiter = RateLimiter(1.0, burst=3)
+
+        for _ in range(3):
+            limiter.acquire()
+
+        mock_sleep.assert_not_called()
+        self.assertEqual(limiter.wait_time, 0.0)
+
+    def test_acquire_waits_for_token(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 0.0
+        limiter = RateLimiter(2.0)
+
+        limiter.acquire()
+        limiter.acquire()
+        limiter.acquire()
+
+        self.assertEqual(limiter.wait_time, 1.5)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+    def test_tokens_refilled(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 0.0
+        limiter = RateLimiter(1.0)
+        limiter.acquire()
+        mock_monotonic.return_value = 1.0
+
+        limiter.acquire()
+
+        mock_sleep.assert_not_called()
+
+    def test_backoff_and_recover(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 0.0
+        limiter = RateLimiter(1.0, backoff_factor=2.0)
+        limiter.acquire()
+
+        limiter.backoff()
+        limiter.acquire()
+        mock_monotonic.return_value = 2.0
+        limiter.recover()
+        limiter.acquire()
+
+        # The second request waits for a token at half the rate, the
+        # third at the full rate again.
+        self.assertEqual(limiter.wait_time, 2.0 + 1.0)
+
+    def test_no_rate(self, mock_monotonic, mock_sleep):
+        limiter = RateLimiter.from_config(PhabConfig(request_delay=0))
+
+        limiter.acquire()
+        limiter.acquire()
+
+        mock_sleep.assert_not_called()
+
+    def test_from_config_request_delay(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 0.0
+        limiter = RateLimiter.from_config(PhabConfig(request_delay=2))
+
+        limiter.acquire()
+        limiter.acquire()
+
+        self.assertEqual(limiter.wait_time, 2.0)
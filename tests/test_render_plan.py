@@ -0,0 +1,60 @@
+import unittest
+
+from config import ConfigError
+from render_plan import RenderPlan
+
+
+class TestRenderPlan(unittest.TestCase):
+
+    def setUp(self):
+        self._project_columns = {
+            "lead": "Ansvarig",
+            "budget": "Budget"
+        }
+
+    def test_render(self):
+        plan = RenderPlan(
+            {
+                "ansvarig": {"column": "lead"},
+                "dolt_läge": {"string": 1},
+                "budget": {"column": "budget"}
+            },
+            self._project_columns,
+            "Projektdata"
+        )
+
+        parameters = plan.render({"Ansvarig": "Någon"})
+
+        self.assertEqual(
+            list(parameters.items()),
+            [("ansvarig", "Någon"), ("dolt_läge", 1), ("budget", None)]
+        )
+
+    def test_no_parameters(self):
+        plan = RenderPlan(None, self._project_columns, "Metrics")
+
+        self.assertEqual(plan.render({"Ansvarig": "Någon"}), {})
+
+    def test_unknown_column_raises(self):
+        with self.assertRaisesRegex(ConfigError, "'leader'"):
+            RenderPlan(
+                {"ansvarig": {"column": "leader"}},
+                self._project_columns,
+                "Projektdata"
+            )
+
+    def test_unknown_type_raises(self):
+        with self.assertRaisesRegex(ConfigError, "unknown type 'number'"):
+            RenderPlan(
+                {"budget": {"number": 1}},
+                self._project_columns,
+                "Projektdata"
+            )
+
+    def test_several_types_raises(self):
+        with self.assertRaises(ConfigError):
+            RenderPlan(
+                {"budget": {"string": 1, "column": "budget"}},
+                self._project_columns,
+                "Projektdata"
+            )
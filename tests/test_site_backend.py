@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from pywikibot import Page, Site
+from pywikibot.data.api import Request
+
+from site_backend import PywikibotSite
+
+
+class TestPywikibotSite(unittest.TestCase):
+
+    def test_pre_save_transform(self):
+        site = MagicMock(Site)
+        request = MagicMock(Request)
+        request.submit.return_value = {"parse": {"text": {"*": "New text"}}}
+        site.simple_request = MagicMock(return_value=request)
+        page = MagicMock(Page)
+        page.title.return_value = "Sida"
+
+        text = PywikibotSite(site).pre_save_transform(page, "{{subst:Mall}}")
+
+        self.assertEqual(text, "New text")
+        site.simple_request.assert_called_with(
+            action="parse",
+            title="Sida",
+            text="{{subst:Mall}}",
+            contentmodel="wikitext",
+            prop="",
+            onlypst=1
+        )
+
+    def test_preload(self):
+        site = MagicMock(Site)
+        site.preloadpages = MagicMock()
+        pages = [MagicMock(Page)]
+
+        PywikibotSite(site).preload(pages)
+
+        site.preloadpages.assert_called_with(pages, groupsize=50)
+
+    def test_lag_listener(self):
+        site = MagicMock(Site)
+        site.throttle = MagicMock()
+        lag = site.throttle.lag
+        listener = MagicMock()
+
+        PywikibotSite(site).add_lag_listener(listener)
+        site.throttle.lag(5)
+
+        listener.assert_called_with(5)
+        lag.assert_called_with(5)
+
+    def test_merge(self):
+        site = MagicMock(Site)
+
+        with patch(
+                "pywikibot.diff.cherry_pick",
+                return_value="Merged"
+        ) as cherry_pick:
+            text = PywikibotSite(site).merge("Old text", "New text")
+
+        self.assertEqual(text, "Merged")
+        cherry_pick.assert_called_with("Old text", "New text")
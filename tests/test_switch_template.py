@@ -0,0 +1,86 @@
+import re
+import unittest
+from time import perf_counter
+
+from switch_template import SwitchTemplate
+
+TEMPLATE = (
+    "{{#switch: {{{1}}}\n"
+    "| 240101 = {{#if: {{{en|}}}| A | A sv }}\n"
+    "| 2401021 = {{#if: {{{en|}}}| B | B sv }}\n"
+    "| #default = Okänt projekt\n"
+    "}}"
+)
+
+
+class TestSwitchTemplate(unittest.TestCase):
+
+    def test_keys_and_values(self):
+        switch = SwitchTemplate(TEMPLATE)
+
+        self.assertTrue(switch.has_default)
+        self.assertTrue(switch.has_key("240101"))
+        self.assertTrue(switch.has_value("Okänt projekt"))
+        # Only whole keys match, not parts of other keys.
+        self.assertFalse(switch.has_key("240102"))
+
+    def test_rows_added_above_default(self):
+        switch = SwitchTemplate(TEMPLATE)
+
+        switch.add_row("240103", "C")
+        switch.add_row("240104", "D")
+
+        self.assertEqual(
+            str(switch),
+            "{{#switch: {{{1}}}\n"
+            "| 240101 = {{#if: {{{en|}}}| A | A sv }}\n"
+            "| 2401021 = {{#if: {{{en|}}}| B | B sv }}\n"
+            "| 240103 = C\n"
+            "| 240104 = D\n"
+            "| #default = Okänt projekt\n"
+            "}}"
+        )
+        self.assertTrue(switch.has_key("240103"))
+
+    def test_unchanged_text(self):
+        self.assertEqual(str(SwitchTemplate(TEMPLATE)), TEMPLATE)
+
+    def test_no_default(self):
+        switch = SwitchTemplate("{{#switch: {{{1}}}\n| 1 = A\n}}")
+
+        self.assertFalse(switch.has_default)
+        with self.assertRaises(ValueError):
+            switch.add_row("2", "B")
+
+    def test_benchmark(self):
+        # Add 1000 rows to a template with 5000 rows.
+        rows = "".join(f"| {100000 + i} = Projekt {i}\n" for i in range(5000))
+        text = "{{#switch: {{{1}}}\n" + rows + "| #default = -\n}}"
+        new_rows = [
+            (str(200000 + i), f"Nytt projekt {i}") for i in range(1000)
+        ]
+
+        start = perf_counter()
+        switch = SwitchTemplate(text)
+        for key, value in new_rows:
+            if not switch.has_key(key):
+                switch.add_row(key, value)
+        result = str(switch)
+        elapsed = perf_counter() - start
+
+        # Searching and rewriting the whole text for each row, as
+        # before.
+        start = perf_counter()
+        expected = text
+        for key, value in new_rows:
+            if re.search(key, expected):
+                continue
+            expected = re.sub(
+                r"(\| #default.*)",
+                fr"| {key} = {value}\n\1",
+                expected
+            )
+        rewrite_elapsed = perf_counter() - start
+
+        self.assertEqual(result, expected)
+        self.assertLess(elapsed, rewrite_elapsed)
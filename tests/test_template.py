@@ -0,0 +1,96 @@
+import io
+import unittest
+from time import perf_counter
+
+from template import Template
+
+
+class TestTemplate(unittest.TestCase):
+
+    def setUp(self):
+        inner = Template("Inner", parameters={"a": "1", "b": 2})
+        self._template = Template(
+            "Outer",
+            True,
+            {"x": "text", "nested": inner}
+        )
+
+    def test_str(self):
+        self.assertEqual(
+            str(self._template),
+            "{{subst:Outer\n| x = text\n| nested = {{Inner|a=1|b=2}}\n}}"
+        )
+
+    def test_multiline_string(self):
+        self.assertEqual(
+            self._template.multiline_string(),
+            "{{subst:Outer\n"
+            "| x = text\n"
+            "| nested = {{Inner\n"
+            "    | a = 1\n"
+            "    | b = 2\n"
+            "  }}\n"
+            "}}"
+        )
+
+    def test_oneline_string(self):
+        self.assertEqual(
+            self._template.oneline_string(),
+            "{{subst:Outer|x=text|nested={{Inner\n| a = 1\n| b = 2\n}}}}"
+        )
+
+    def test_no_parameters(self):
+        template = Template("Name", parameters=[])
+
+        self.assertEqual(str(template), "{{Name}}")
+        self.assertEqual(template.multiline_string(), "{{Name}}")
+        self.assertEqual(template.oneline_string(), "{{Name}}")
+
+    def test_list_parameters(self):
+        template = Template("Utkommenterat", True, ["240101"])
+
+        self.assertEqual(
+            template.oneline_string(),
+            "{{subst:Utkommenterat|1=240101}}"
+        )
+
+    def test_write(self):
+        for write, render in [
+                (self._template.write, str),
+                (self._template.write_multiline, Template.multiline_string),
+                (self._template.write_oneline, Template.oneline_string)
+        ]:
+            file_ = io.StringIO()
+
+            write(file_)
+
+            self.assertEqual(file_.getvalue(), render(self._template))
+
+    def test_benchmark_many_parameters(self):
+        template = Template(
+            "Big",
+            True,
+            {i: Template("Inner", parameters=["x" * 50] * 10)
+             for i in range(10000)}
+        )
+
+        start = perf_counter()
+        text = template.multiline_string()
+        elapsed = perf_counter() - start
+
+        self.assertEqual(text.count("\n"), 10000 * 12 + 1)
+        self.assertLess(elapsed, 1.0)
+
+    def test_benchmark_deep_nesting(self):
+        # Each level used to copy the rendered text of all levels
+        # inside it.
+        template = Template("Leaf", parameters={"a": "x" * 100000})
+        for i in range(300):
+            template = Template("Level", parameters={"t": template})
+
+        start = perf_counter()
+        text = template.multiline_string()
+        elapsed = perf_counter() - start
+
+        self.assertEqual(text.count("{{Level"), 300)
+        self.assertLess(elapsed, 0.5)
@@ -1,10 +1,26 @@
+import os
+import tempfile
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock
 
 import pywikibot
-from pywikibot import Page, Site
-from pywikibot.data.api import Request
+from pywikibot import Page
 
+from cache import LookupCache
+from config import (
+    CategoriesConfig,
+    PageConfig,
+    SubpageConfig,
+    WikiConfig,
+    YearPagesConfig
+)
+from journal import Journal
+from page_cache import PageCache
+from plan import Plan
+from rate_limiter import RateLimiter
+from site_backend import PywikibotSite
 from wiki import Wiki
 
 
@@ -15,33 +31,467 @@ class TestWiki(unittest.TestCase):
         self._wiki = Wiki(*parameters)
 
     def test_write_page_exists_show_diff(self):
-        self._wiki._site = MagicMock(Site)
-        self._wiki._config = {"edit_summary": "edit_summary"}
+        self._wiki._site = MagicMock(PywikibotSite)
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
         page = MagicMock(Page)
         page.exists = MagicMock(return_value=True)
         page.get = MagicMock(return_value="Old text")
-        request = MagicMock(Request)
-        data = {"parse": {"text": {"*": "New text"}}}
-        request.submit = MagicMock(return_value=data)
-        self._wiki._site.simple_request = MagicMock(return_value=request)
-        pywikibot.diff.cherry_pick = MagicMock()
+        self._wiki._site.pre_save_transform.return_value = "New text"
 
         self._wiki._write_page(page)
 
-        pywikibot.diff.cherry_pick.assert_called_with("Old text", "New text")
+        self._wiki._site.merge.assert_called_with("Old text", "New text")
 
     def test_write_page_merged_text_saved(self):
-        self._wiki._site = MagicMock(Site)
-        self._wiki._config = {"edit_summary": "edit_summary"}
+        self._wiki._site = MagicMock(PywikibotSite)
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
         page = MagicMock(Page)
         page.exists = MagicMock(return_value=True)
-        page.text = "Old text"
+        page.text = "New text"
         page.get = MagicMock(return_value="Old text")
-        self._wiki._site.simple_request = MagicMock()
         merged_text = "Merged text"
-        pywikibot.diff.cherry_pick = MagicMock(return_value=merged_text)
+        self._wiki._site.merge.return_value = merged_text
 
         self._wiki._write_page(page)
 
         self.assertEqual(page.text, merged_text)
         page.save.assert_called()
+
+    def test_write_page_merges_one_page_at_a_time(self):
+        self._wiki._site = MagicMock(PywikibotSite)
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        self._wiki._dry_run = True
+        merging = []
+        overlaps = []
+
+        def merge(current_text, new_text):
+            merging.append(new_text)
+            overlaps.append(len(merging) > 1)
+            time.sleep(0.02)
+            merging.remove(new_text)
+            return new_text
+
+        self._wiki._site.merge.side_effect = merge
+        self._wiki._site.pre_save_transform.side_effect = \
+            lambda page, text: text
+        pages = []
+        for i in range(4):
+            page = MagicMock(Page)
+            page.title.return_value = f"Page {i}"
+            page.exists.return_value = True
+            page.get.return_value = "Old text"
+            page.text = f"New text {i}"
+            pages.append(page)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(self._wiki._write_page, pages))
+
+        self.assertEqual(overlaps, [False] * 4)
+
+    def test_write_page_unchanged_not_saved(self):
+        self._wiki._site = MagicMock(PywikibotSite)
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        page = MagicMock(Page)
+        page.exists = MagicMock(return_value=True)
+        page.text = "Same text"
+        page.get = MagicMock(return_value="Same text")
+
+        self._wiki._write_page(page)
+
+        self._wiki._site.pre_save_transform.assert_not_called()
+        page.save.assert_not_called()
+        self.assertEqual(self._wiki._skipped_pages, [page])
+
+    def test_write_page_parsed_unchanged_not_saved(self):
+        self._wiki._site = MagicMock(PywikibotSite)
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        page = MagicMock(Page)
+        page.exists = MagicMock(return_value=True)
+        page.text = "{{subst:Template}}"
+        page.get = MagicMock(return_value="Substituted text")
+        self._wiki._site.pre_save_transform.return_value = "Substituted text"
+
+        self._wiki._write_page(page)
+
+        self._wiki._site.merge.assert_not_called()
+        page.save.assert_not_called()
+        self.assertEqual(self._wiki._skipped_pages, [page])
+
+    def test_write_page_substitution_compared_after_parse(self):
+        self._wiki._site = MagicMock(PywikibotSite)
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        page = MagicMock(Page)
+        page.exists = MagicMock(return_value=True)
+        page.text = "{{subst:Template}}"
+        page.get = MagicMock(return_value="{{subst:Template}}")
+        self._wiki._site.pre_save_transform.return_value = "Substituted text"
+        self._wiki._site.merge.return_value = "Substituted text"
+
+        self._wiki._write_page(page)
+
+        self._wiki._site.pre_save_transform.assert_called()
+        page.save.assert_called()
+
+    def test_write_hashes_saved_on_flush(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "hashes.json")
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        self._wiki._write_hashes = LookupCache(path, autosave=False)
+        page = MagicMock(Page)
+        page.title.return_value = "Page"
+        page.latest_revision_id = 2
+
+        self._wiki._save(page, "Text")
+
+        self.assertFalse(os.path.exists(path))
+
+        self._wiki.flush_saves()
+
+        self.assertEqual(
+            LookupCache(path).get("Page"),
+            [self._wiki._hash_text("Text"), 2]
+        )
+
+    def test_write_page_last_written_not_saved(self):
+        self._wiki._site = MagicMock(PywikibotSite)
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        self._wiki._write_hashes = LookupCache()
+        page = MagicMock(Page)
+        page.title.return_value = "Page"
+        page.exists = MagicMock(return_value=True)
+        page.text = "{{subst:Template}}"
+        page.get = MagicMock(return_value="Substituted text")
+        page.latest_revision_id = 2
+        self._wiki._write_hashes.set(
+            "Page",
+            [self._wiki._hash_text("{{subst:Template}}"), 2]
+        )
+
+        self._wiki._write_page(page)
+
+        self._wiki._site.pre_save_transform.assert_not_called()
+        page.save.assert_not_called()
+
+    def test_write_page_queued_save(self):
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        self._wiki._save_executor = ThreadPoolExecutor(max_workers=2)
+        page = MagicMock(Page)
+        page.exists = MagicMock(return_value=False)
+        page.text = "Text"
+
+        self._wiki._write_page(page)
+        self._wiki.flush_saves()
+
+        page.save.assert_called_with(summary="edit_summary")
+        self.assertEqual(self._wiki._touched_pages, [page])
+
+    def test_write_page_recorded_in_plan(self):
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        self._wiki._plan = Plan()
+        page = MagicMock(Page)
+        page.title.return_value = "Page"
+        page.exists = MagicMock(return_value=False)
+        page.text = "Text"
+
+        self._wiki._write_page(page)
+
+        page.save.assert_not_called()
+        self.assertEqual(
+            self._wiki._plan.pages,
+            [{"title": "Page", "text": "Text", "revision_id": None}]
+        )
+        self.assertEqual(self._wiki._planned_pages, [page])
+        self.assertEqual(self._wiki._touched_pages, [])
+
+    def test_write_page_not_merged_in_plan(self):
+        self._wiki._site = MagicMock(PywikibotSite)
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        self._wiki._plan = Plan()
+        page = MagicMock(Page)
+        page.title.return_value = "Page"
+        page.exists = MagicMock(return_value=True)
+        page.latest_revision_id = 4
+        page.text = "{{subst:Template}}"
+        page.get = MagicMock(return_value="Old text")
+
+        self._wiki._write_page(page)
+
+        self._wiki._site.merge.assert_not_called()
+        self.assertEqual(
+            self._wiki._plan.pages,
+            [{"title": "Page", "text": "{{subst:Template}}", "revision_id": 4}]
+        )
+
+    def test_apply_plan_skips_edited_pages(self):
+        self._wiki._site = MagicMock(PywikibotSite)
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        unchanged = MagicMock(Page)
+        unchanged.title.return_value = "Unchanged"
+        unchanged.exists.return_value = True
+        unchanged.latest_revision_id = 1
+        unchanged.get.return_value = "Old text"
+        edited = MagicMock(Page)
+        edited.title.return_value = "Edited"
+        edited.exists.return_value = True
+        edited.latest_revision_id = 3
+        self._wiki._site.preload.side_effect = iter
+        self._wiki._site.page.side_effect = lambda title, namespace: {
+            "Unchanged": unchanged,
+            "Edited": edited
+        }[title]
+        self._wiki._page_cache = PageCache(self._wiki._site)
+        self._wiki._page_cache._pages = {
+            "Unchanged": unchanged,
+            "Edited": edited
+        }
+        self._wiki._site.pre_save_transform.return_value = "New text"
+        self._wiki._site.merge.return_value = "Merged text"
+        plan = Plan()
+        plan.add_page("Unchanged", "New text", 1)
+        plan.add_page("Edited", "New text", 2)
+
+        self._wiki.apply_plan(plan)
+
+        self._wiki._site.merge.assert_called_once_with("Old text", "New text")
+        unchanged.save.assert_called_with(summary="edit_summary")
+        self.assertEqual(unchanged.text, "Merged text")
+        edited.save.assert_not_called()
+        self.assertEqual(self._wiki._failed_pages, [edited])
+
+    def test_write_page_journaled_not_written(self):
+        self._wiki._journal = MagicMock(Journal)
+        self._wiki._journal.get.return_value = 5
+        page = MagicMock(Page)
+        page.title.return_value = "Page"
+
+        self._wiki._write_page(page)
+
+        self._wiki._journal.get.assert_called_with("page", "Page")
+        page.exists.assert_not_called()
+        page.save.assert_not_called()
+
+    def test_save_recorded_in_journal(self):
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        self._wiki._journal = MagicMock(Journal)
+        page = MagicMock(Page)
+        page.title.return_value = "Page"
+        page.latest_revision_id = 7
+
+        self._wiki._save(page, "Text")
+
+        self._wiki._journal.record.assert_called_once_with("page", "Page", 7)
+
+    def test_save_failure_logged(self):
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        self._wiki._save_executor = MagicMock()
+        page = MagicMock(Page)
+        page.save.side_effect = pywikibot.exceptions.LockedPageError(page)
+
+        self._wiki._save(page, "Text")
+
+        self.assertEqual(self._wiki._failed_pages, [page])
+        self.assertEqual(self._wiki._touched_pages, [])
+
+    def test_save_failure_raised_when_saving_directly(self):
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        page = MagicMock(Page)
+        page.save.side_effect = pywikibot.exceptions.LockedPageError(page)
+
+        with self.assertRaises(pywikibot.exceptions.LockedPageError):
+            self._wiki._save(page, "Text")
+
+        self.assertEqual(self._wiki._touched_pages, [])
+
+    def test_save_failure_raised_after_last_retry(self):
+        self._wiki._config = WikiConfig(
+            edit_summary="edit_summary",
+            save_retries=1
+        )
+        page = MagicMock(Page)
+        page.save.side_effect = pywikibot.exceptions.MaxlagTimeoutError("Lag")
+
+        with self.assertRaises(pywikibot.exceptions.MaxlagTimeoutError):
+            self._wiki._save(page, "Text")
+
+        self.assertEqual(page.save.call_count, 2)
+
+    def test_lag_lowers_save_rate(self):
+        self._wiki._save_rate_limiter = RateLimiter(10)
+
+        self._wiki._on_lag(5)
+
+        self.assertEqual(self._wiki._save_rate_limiter._current_rate, 5)
+
+    def test_save_retried_on_maxlag(self):
+        self._wiki._config = WikiConfig(edit_summary="edit_summary")
+        page = MagicMock(Page)
+        page.save.side_effect = [
+            pywikibot.exceptions.MaxlagTimeoutError("Lag"),
+            None
+        ]
+
+        self._wiki._save(page, "Text")
+
+        self.assertEqual(page.save.call_count, 2)
+        self.assertEqual(self._wiki._touched_pages, [page])
+
+    def test_plan_titles(self):
+        self._wiki._config = WikiConfig(
+            project_namespace="Projekt",
+            subpages=(SubpageConfig("Projektdata", "Mall:Projektdata"),),
+            year_pages=YearPagesConfig(
+                current_projects_template="Mall:Aktuella projekt 2024",
+                simple={"Diarium/2024": "Mall:Diarium år"},
+                projects=PageConfig("Projekt 2024", "Mall:Projekt"),
+                categories=CategoriesConfig(
+                    "Projekt",
+                    {"Projekt 2024": None}
+                ),
+                volunteer_tasks=PageConfig(
+                    "Frivilliguppdrag 2024",
+                    "Mall:Frivilliguppdrag"
+                )
+            ),
+            project_name_template="Mall:Projektnamn",
+            project_number_template="Mall:Projektid"
+        )
+        self._wiki._project_columns = {"swedish_name": "SV"}
+        self._wiki._year = 2024
+
+        titles = self._wiki.plan_titles([{"SV": "Projekt A"}], True)
+
+        self.assertEqual(titles, [
+            ("Projekt A", "Projekt"),
+            ("Projekt A/Projektdata", "Projekt"),
+            ("Projekt A", "Category"),
+            ("Diarium/2024", None),
+            ("Projekt 2024", None),
+            ("Frivilliguppdrag 2024", None),
+            ("Mall:Aktuella projekt 2024", None),
+            ("Projekt 2024", "Category"),
+            ("Mall:Projektnamn", None),
+            ("Mall:Projektid", None)
+        ])
+
+    def test_prefetch_pages_loads_each_page_once(self):
+        self._wiki._site = MagicMock(PywikibotSite)
+        self._wiki._site.preload.return_value = []
+        self._wiki._page_cache = PageCache(self._wiki._site)
+        self._wiki.plan_titles = MagicMock(return_value=[
+            ("Projekt A", "Projekt"),
+            ("Projekt A", "Projekt"),
+            ("Mall:Projektnamn", None)
+        ])
+
+        def make_page(title, namespace=None):
+            page = MagicMock(Page)
+            page.title.return_value = \
+                f"{namespace}:{title}" if namespace else title
+            return page
+
+        self._wiki._site.page.side_effect = make_page
+
+        self._wiki.prefetch_pages([], False)
+
+        pages = self._wiki._site.preload.call_args.args[0]
+        self.assertEqual(
+            [page.title() for page in pages],
+            ["Projekt:Projekt A", "Mall:Projektnamn"]
+        )
+        self.assertIs(
+            self._wiki._page_cache.get_page("Projekt A", "Projekt"),
+            pages[0]
+        )
+
+    def test_add_project_indexes_programs(self):
+        self._wiki.add_project("240101", "A", "A en", "Tillgång")
+        self._wiki.add_project("240201", "B", "B en", "Gemenskap")
+        self._wiki.add_project("240102", "C", "C en", "Tillgång")
+        self._wiki.add_project("240201", "B", "B en", "Tillgång")
+
+        self.assertEqual(self._wiki._program_projects, {
+            "Tillgång": ["240101", "240102", "240201"],
+            "Gemenskap": []
+        })
+
+    def test_add_volunteer_tasks_page(self):
+        self._wiki._config = WikiConfig(
+            year_pages=YearPagesConfig(
+                current_projects_template=None,
+                simple={},
+                projects=None,
+                categories=None,
+                volunteer_tasks=PageConfig(
+                    "Frivilliguppdrag 2024",
+                    "Mall:Frivilliguppdrag"
+                )
+            )
+        )
+        self._wiki._year = 2024
+        self._wiki._add_page_from_template = MagicMock()
+        self._wiki.add_project("240101", "A", "A en", "Tillgång")
+        self._wiki.add_project("240201", "B", "B en", "Gemenskap")
+        self._wiki.add_project("240102", "C", "C en", "Tillgång")
+
+        self._wiki._add_volunteer_tasks_page()
+
+        parameters = self._wiki._add_page_from_template.call_args.args[3]
+        self.assertEqual(
+            parameters["frivilliguppdrag"],
+            "== Tillgång ==\n"
+            "{{:Projekt:A/Frivillig}}\n"
+            "{{:Projekt:C/Frivillig}}\n"
+            "{{subst:Utkommenterat\n| 1 = Platshållare\n}}&nbsp;\n\n"
+            "== Gemenskap ==\n"
+            "{{:Projekt:B/Frivillig}}\n"
+            "{{subst:Utkommenterat\n| 1 = Platshållare\n}}&nbsp;\n\n"
+        )
+
+    def test_projects_by_strategy(self):
+        self._wiki.add_project("183102", "A", "A en", "Tillgång")
+        self._wiki.add_project("184101", "B", "B en", "Gemenskap")
+        self._wiki.add_project("193103", "C", "C en", "Tillgång")
+        self._wiki.add_project("183102", "A", "A en", "Gemenskap")
+
+        self.assertEqual(self._wiki.projects_by_strategy(), {
+            "31": ["183102", "193103"],
+            "41": ["184101"]
+        })
+        self.assertEqual(
+            self._wiki.projects_by_strategy(["3100", "5100"]),
+            {"3100": ["183102", "193103"], "5100": []}
+        )
+
+    def test_update_project_name_templates(self):
+        self._wiki._config = WikiConfig(
+            project_name_template="Mall:Projektnamn",
+            project_number_template="Mall:Projektid"
+        )
+        self._wiki._prompt_add_pages = False
+        self._wiki._page_cache = MagicMock(PageCache)
+        name_template = MagicMock(Page)
+        number_template = MagicMock(Page)
+        self._wiki._page_cache.get_page.side_effect = \
+            [name_template, number_template]
+        self._wiki._page_cache.get_text.side_effect = [
+            "{{#switch:{{{1}}}\n| 2401011 = X\n| #default = -\n}}",
+            "{{#switch:{{{1}}}\n| X = 240101\n| #default = -\n}}"
+        ]
+        self._wiki._write_page = MagicMock()
+        self._wiki.add_project("240101", "Projekt", "Project", "Tillgång")
+
+        self._wiki.update_project_name_templates()
+
+        self.assertEqual(
+            name_template.text,
+            "{{#switch:{{{1}}}\n"
+            "| 2401011 = X\n"
+            "| 240101 = {{#if: {{{en|}}}| Project | Projekt }}\n"
+            "| #default = -\n"
+            "}}"
+        )
+        self.assertEqual(
+            number_template.text,
+            "{{#switch:{{{1}}}\n| X = 240101\n| #default = -\n}}"
+        )
@@ -1,29 +1,83 @@
+import hashlib
 import logging
-import re
-
-import pywikibot
-from pywikibot import Page, Site
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
+from cache import LookupCache
 from const import Components
+from page_cache import PageCache
+from rate_limiter import RateLimiter
+from render_plan import RenderPlan
+from site_backend import PywikibotSite
+from switch_template import SwitchTemplate
 from template import Template
 
 
 class Wiki:
     """Handles wiki interaction.
 
-    Uses `pywikibot` to write to the wiki.
+    Uses a site backend to read and write the wiki, by default
+    `PywikibotSite`, which uses `pywikibot`.
 
     Attributes
     ----------
-    _config : dict
+    _config : WikiConfig
         Parameters read from configuration file.
-    _site : Site
-        `Site` object used by Pywikibot
+    _site : PywikibotSite or LocalSite
+        Site backend used to reach the wiki.
     _dry_run : bool
         If True, no data is written to the wiki.
     _project_columns: dict
         Mapping of column headers in the projects spreadsheet to canonical
         labels
+    _page_cache : PageCache
+        Keeps one page object per title and what is known about it,
+        so that each page is only loaded once.
+    _write_hashes : LookupCache
+        Hash of the text last written to each page and the revision id
+        it got. Written to the file when saves are flushed. None if no
+        file to store them in is configured.
+    _skipped_pages : list
+        Pages that weren't saved because they wouldn't change.
+    _failed_pages : list
+        Pages that couldn't be saved.
+    _planned_pages : list
+        Pages recorded in the plan.
+    _save_executor : ThreadPoolExecutor
+        Saves pages in the background. None if pages are saved
+        directly.
+    _pending_saves : list
+        Futures for saves that have been queued.
+    _save_rate_limiter : RateLimiter
+        Limits the rate of saves. Slows down when the wiki reports
+        that it's lagging.
+    _lag_reports : int
+        Number of times the wiki has reported that it's lagging.
+    _plan : Plan
+        If given, pages to write are recorded in this instead of being
+        merged and saved.
+    _journal : Journal
+        If given, saved pages and added template rows are recorded in
+        this and pages already in it are not written again.
+    _main_page_plan : RenderPlan
+        Template parameters for the project main pages.
+    _subpage_plans : dict
+        Map of subpage titles to the template parameters for the
+        subpages.
+    _projects : dict
+        Map of project numbers to names and program of each added
+        project.
+    _program_projects : dict
+        Map of programs to the numbers of their projects, in the order
+        they were added.
+    _strategy_projects : dict
+        Map of strategy prefixes, i.e. the first two digits of strategy
+        numbers, to the numbers of the projects in each strategy, in
+        the order they were added.
+    _merge_lock : threading.Lock
+        Makes pages be merged one at a time, since merging may ask the
+        user, and the main pages and subpages are written in different
+        threads.
     """
 
     def __init__(
@@ -36,7 +90,10 @@ class Wiki:
             goals,
             goal_fulfillments,
             components,
-            prompt_add_pages
+            prompt_add_pages,
+            plan=None,
+            journal=None,
+            site=None
     ):
         self._config = config
         self._project_columns = project_columns
@@ -47,10 +104,42 @@ class Wiki:
         self._goal_fulfillments = goal_fulfillments
         self._components = components
         self._prompt_add_pages = prompt_add_pages
-        self._site = Site()
+        self._plan = plan
+        self._journal = journal
+        self._merge_lock = threading.Lock()
+        if config:
+            self._compile_render_plans()
+        if site is None:
+            site = PywikibotSite()
+        self._site = site
+        self._page_cache = PageCache(self._site)
         self._projects = {}
-        self._programs = []
+        self._program_projects = {}
+        self._strategy_projects = {}
         self._touched_pages = []
+        self._skipped_pages = []
+        self._failed_pages = []
+        self._planned_pages = []
+        if config and config.write_hash_file:
+            self._write_hashes = LookupCache(
+                config.write_hash_file,
+                autosave=False
+            )
+        else:
+            self._write_hashes = None
+        if config and config.save_workers:
+            self._save_executor = ThreadPoolExecutor(
+                max_workers=config.save_workers,
+                thread_name_prefix="save"
+            )
+        else:
+            self._save_executor = None
+        self._pending_saves = []
+        self._save_rate_limiter = RateLimiter(
+            config.save_rate if config else None
+        )
+        self._lag_reports = 0
+        self._site.add_lag_listener(self._on_lag)
 
     def add_project_page(
             self,
@@ -62,6 +151,21 @@ class Wiki:
 
         Adds main page, subpages and categories.
 
+        Parameters
+        ----------
+        parameters : dict
+            Parameters for the project.
+        phab_id : int
+            Id for the project's Phabricator project.
+        phab_name : str
+            Name of the project's Phabricator project.
+        """
+        self.add_project_main_page(parameters, phab_id, phab_name)
+        self.add_project_subpages(parameters)
+
+    def add_project_main_page(self, parameters, phab_id, phab_name):
+        """Add the main page for a project, if it's a selected component.
+
         Parameters
         ----------
         parameters : dict
@@ -76,27 +180,25 @@ class Wiki:
                 or Components.PROJECT_MAIN_PAGE.value in self._components
         ):
             self._add_project_main_page(parameters, phab_id, phab_name)
-        if self._components is not None:
-            # Get the subpages from component selection.
-            subpages = [
-                self._config["subpages"][s - len(Components) - 1]
-                for s in self._components if s > len(Components)
-            ]
-        else:
-            subpages = self._config["subpages"]
 
+    def add_project_subpages(self, parameters):
+        """Add subpages and categories for a project.
+
+        Only the selected components are added.
+
+        Parameters
+        ----------
+        parameters : dict
+            Parameters for the project.
+        """
         name = parameters[self._project_columns["swedish_name"]]
-        for subpage in subpages:
+        for subpage in self._get_selected_subpages():
             self._add_subpage(
                 subpage,
                 parameters,
                 name
             )
 
-        if self._goals:
-            english_name = parameters[self._project_columns["english_name"]]
-            self._goals[english_name]["added"] = True
-
         if (
                 self._components is None
                 or Components.CATEGORIES.value in self._components
@@ -104,6 +206,91 @@ class Wiki:
             program = parameters[self._project_columns["program"]]
             self._add_project_categories(name, program)
 
+    def plan_titles(self, projects, full_run):
+        """List the pages that will be touched when adding projects.
+
+        Parameters
+        ----------
+        projects : list
+            Parameters for each project that will be added.
+        full_run : bool
+            Whether year pages will be added.
+
+        Returns
+        -------
+        list
+            Title and namespace of each page. Namespace is None for
+            pages in the default namespace.
+        """
+        project_namespace = self._config.project_namespace
+        titles = []
+        for parameters in projects:
+            name = parameters[self._project_columns["swedish_name"]]
+            if (
+                    self._components is None
+                    or Components.PROJECT_MAIN_PAGE.value in self._components
+            ):
+                titles.append((name, project_namespace))
+            for subpage in self._get_selected_subpages():
+                titles.append(
+                    ("{}/{}".format(name, subpage.title), project_namespace)
+                )
+            if (
+                    self._components is None
+                    or Components.CATEGORIES.value in self._components
+            ):
+                titles.append((name, "Category"))
+        if full_run:
+            year_pages = self._config.year_pages
+            for title in year_pages.simple:
+                titles.append((title, None))
+            titles.append((year_pages.projects.title, None))
+            titles.append((year_pages.volunteer_tasks.title, None))
+            titles.append((year_pages.current_projects_template, None))
+            for title in year_pages.categories.pages:
+                titles.append((title, "Category"))
+        titles.append((self._config.project_name_template, None))
+        titles.append((self._config.project_number_template, None))
+        return titles
+
+    def prefetch_pages(self, projects, full_run):
+        """Load all pages that will be touched when adding projects.
+
+        Existence, latest revision and content are loaded in batches
+        of 50 pages per request, instead of one request per page when
+        each page is used.
+
+        Parameters
+        ----------
+        projects : list
+            Parameters for each project that will be added.
+        full_run : bool
+            Whether year pages will be added.
+        """
+        pages = [
+            self._page_cache.get_page(title, namespace)
+            for title, namespace in self.plan_titles(projects, full_run)
+        ]
+        if self._journal is not None:
+            pages = [p for p in pages if not self._is_journaled(p)]
+        self._page_cache.prefetch(pages)
+
+    def _get_selected_subpages(self):
+        """Get the subpages selected as components.
+
+        Returns
+        -------
+        list
+            Parameters for each selected subpage. All subpages if no
+            components were selected.
+        """
+        if self._components is None:
+            return self._config.subpages
+        return [
+            self._config.subpages[s - len(Components) - 1]
+            for s in self._components if s > len(Components)
+        ]
+
     def _add_project_main_page(self, parameters, phab_id, phab_name):
         """Add the main project page, i.e. "Projekt:NAME".
 
@@ -117,20 +304,21 @@ class Wiki:
             Name of the project's Phabricator project.
         """
         name = parameters[self._project_columns["swedish_name"]]
-        page = Page(self._site, name, self._config["project_namespace"])
-        if page.exists() and not self._overwrite:
+        page = self._page_cache.get_page(
+            name,
+            self._config.project_namespace
+        )
+        if self._page_cache.exists(page) and not self._overwrite:
             logging.warning(
                 "Project page '{}' already exists. It will not be created.".format(page.title())  # noqa: E501
             )
             return
 
-        template = Template(self._config["project_template"], True)
-        project_parameters = self._config["project_parameters"].items()
-        for template_parameter, specification in project_parameters:
-            template.add_parameter(
-                template_parameter,
-                self._get_project_parameter_value(parameters, specification)
-            )
+        template = Template(
+            self._config.project_template,
+            True,
+            self._main_page_plan.render(parameters)
+        )
         template.add_parameter("year", self._year)
         template.add_parameter("phabricatorId", phab_id)
         template.add_parameter("phabricatorName", phab_name)
@@ -141,61 +329,331 @@ class Wiki:
         logging.debug(page.text)
         self._write_page(page)
 
-    def _get_project_parameter_value(self, project_parameters, specification):
-        """Get the value of a project parameter specified in the config.
+    def _compile_render_plans(self):
+        """Compile the template parameters for project pages.
 
-        The specification has a key that dictates how the value is used:
-        "string" - the value is used as is.
-        "column" - the value is a key in project_columns in the
-          config. The return value is project paramter for that key.
+        Raises
+        ------
+        ConfigError
+            If a parameter specification is invalid.
+        """
+        self._main_page_plan = RenderPlan(
+            self._config.project_parameters,
+            self._project_columns,
+            self._config.project_template
+        )
+        self._subpage_plans = {
+            subpage.title: RenderPlan(
+                subpage.parameters,
+                self._project_columns,
+                subpage.title
+            )
+            for subpage in self._config.subpages
+        }
+
+    def _write_page(self, page):
+        """Write a page unless this is a dry run.
+
+        If the page exists, the new text is merged with the current
+        one. The page isn't saved if that wouldn't change it, i.e. if
+        the text is the same as on the wiki or if the same text was
+        written by the bot last time and the page hasn't been edited
+        since. Text with templates to substitute can only be compared
+        to the wiki after a parse request, so skipping such pages
+        without one requires `write_hash_file` to be configured.
+
+        In plan mode, the rendered text is recorded in the plan
+        instead. It's merged when the plan is applied, since merging
+        may need someone to answer.
 
         Parameters
         ----------
-        project_parameters : dict
-            Parameters for the project.
-        specifications : dict
-            A single key value pair. The key is the type of value,
-            either "string" or "column".
+        page : Page
+            The page to write to.
+
+        """
+        if self._journal is not None and self._is_journaled(page):
+            logging.info(
+                "Page '{}' was written in a previous run.".format(
+                    page.title()
+                )
+            )
+            return
+
+        rendered_text = page.text
+        exists = self._page_cache.exists(page)
+        if exists:
+            current_text = self._page_cache.get_text(page)
+            # Text with substitutions never equals the saved text.
+            unchanged = "subst:" not in rendered_text and \
+                rendered_text == current_text
+            if unchanged or self._is_last_written(page, rendered_text):
+                self._skip_page(page)
+                return
+
+        if self._plan is not None:
+            self._plan.add_page(
+                page.title(),
+                rendered_text,
+                self._page_cache.get_revision_id(page)
+            )
+            self._planned_pages.append(page)
+            return
+
+        if exists:
+            parsed_text = self._site.pre_save_transform(page, page.text)
+            if parsed_text == current_text:
+                self._skip_page(page)
+                return
+            with self._merge_lock:
+                page.text = self._site.merge(current_text, parsed_text)
+            if page.text == current_text:
+                self._skip_page(page)
+                return
+
+        self._queue_save(page, rendered_text)
+
+    def _queue_save(self, page, rendered_text):
+        """Save a page, in the background if configured.
+
+        Nothing is saved if this is a dry run.
+
+        Parameters
+        ----------
+        page : Page
+            The page to save, with the text to save set.
+        rendered_text : str
+            The text before substitution and merging.
+        """
+        if self._dry_run:
+            self._touched_pages.append(page)
+        elif self._save_executor is not None:
+            self._pending_saves.append(
+                self._save_executor.submit(self._save, page, rendered_text)
+            )
+        else:
+            self._save(page, rendered_text)
+
+    def apply_plan(self, plan):
+        """Write the pages in a plan.
+
+        Pages that have been edited since the plan was made are not
+        written. The others are written like in a normal run, i.e.
+        merged with the current text and skipped if unchanged.
+
+        Parameters
+        ----------
+        plan : Plan
+            Plan with Phabricator ids already resolved.
+        """
+        pages = [
+            self._page_cache.get_page(planned["title"])
+            for planned in plan.pages
+        ]
+        self._page_cache.prefetch(pages)
+        for page, planned in zip(pages, plan.pages):
+            revision_id = self._page_cache.get_revision_id(page)
+            if revision_id != planned["revision_id"]:
+                logging.warning(
+                    "Page '{}' has been edited since the plan was made. "
+                    "It will not be written.".format(page.title())
+                )
+                self._failed_pages.append(page)
+                continue
+            page.text = planned["text"]
+            logging.info("Writing to page '{}'.".format(page.title()))
+            self._write_page(page)
+
+    def _save(self, page, rendered_text):
+        """Save a page.
+
+        Waits for the save rate limiter. If the wiki is lagging or
+        under load, the rate is lowered and the save is retried.
+        When saving in the background, failures are logged, but not
+        raised, so that one page failing doesn't stop the others from
+        being saved.
+
+        Parameters
+        ----------
+        page : Page
+            The page to save, with the text to save set.
+        rendered_text : str
+            The text before substitution and merging.
+
+        Raises
+        ------
+        Exception
+            The error from saving, if the page couldn't be saved and
+            pages aren't saved in the background.
+        """
+        lag_reports = self._lag_reports
+        attempts = self._config.save_retries + 1
+        for attempt in range(attempts):
+            self._save_rate_limiter.acquire()
+            try:
+                page.save(summary=self._config.edit_summary)
+            except self._site.retryable_save_errors as error:
+                self._save_rate_limiter.backoff()
+                if attempt == attempts - 1:
+                    self._save_failed(page, error)
+                    return
+                logging.warning(
+                    "Saving page '{}' failed: {}. Retrying.".format(
+                        page.title(),
+                        error
+                    )
+                )
+            except self._site.save_errors as error:
+                self._save_failed(page, error)
+                return
+            else:
+                break
+        if attempt == 0 and self._lag_reports == lag_reports:
+            # Only speed up again when the wiki keeps up.
+            self._save_rate_limiter.recover()
+        self._page_cache.saved(page)
+        revision_id = page.latest_revision_id
+        if self._write_hashes is not None:
+            self._write_hashes.set(
+                page.title(),
+                [self._hash_text(rendered_text), revision_id]
+            )
+        if self._journal is not None:
+            self._journal.record("page", page.title(), revision_id)
+        self._touched_pages.append(page)
+
+    def _save_failed(self, page, error):
+        """Handle a page that couldn't be saved.
+
+        When saving in the background, the error is logged, so that
+        the other pages are still saved. Otherwise it's raised.
+
+        Parameters
+        ----------
+        page : Page
+        error : Exception
+            The error raised when saving.
+
+        Raises
+        ------
+        Exception
+            `error`, if pages aren't saved in the background.
+        """
+        if self._save_executor is None:
+            raise error
+        logging.error(
+            "Could not save page '{}': {}".format(page.title(), error)
+        )
+        self._failed_pages.append(page)
+
+    def _on_lag(self, lag):
+        """Lower the save rate when the wiki reports that it's lagging.
+
+        Parameters
+        ----------
+        lag : float
+            How far behind the wiki is, in seconds.
+        """
+        logging.warning(
+            "The wiki is lagging by {} seconds, slowing down.".format(lag)
+        )
+        self._lag_reports += 1
+        self._save_rate_limiter.backoff()
+
+    def flush_saves(self):
+        """Wait for all queued saves to finish.
+
+        Then writes the hashes of the saved texts to the hash file.
+        """
+        try:
+            if self._pending_saves:
+                logging.info(
+                    "Waiting for {} queued saves.".format(
+                        sum(not f.done() for f in self._pending_saves)
+                    )
+                )
+                wait(self._pending_saves)
+                for future in self._pending_saves:
+                    # Raise any unexpected error from the save.
+                    future.result()
+                self._pending_saves = []
+        finally:
+            if self._write_hashes is not None:
+                self._write_hashes.save()
+
+    def _is_last_written(self, page, text):
+        """Check if a page is as the bot last wrote it, with the same text.
+
+        Parameters
+        ----------
+        page : Page
+            The page to check.
+        text : str
+            Text that would be written to the page, before
+            substitution.
 
         Returns
         -------
-        str
+        bool
+            True if the hash of `text` is the one stored when the page
+            was last written and the page hasn't been edited since.
         """
+        if self._write_hashes is None:
+            return False
+        written = self._write_hashes.get(page.title())
+        if written is None:
+            return False
+        text_hash, revision_id = written
+        return text_hash == self._hash_text(text) and \
+            revision_id == self._page_cache.get_revision_id(page)
+
+    def _hash_text(self, text):
+        """Make a hash of a page text.
 
-        # Just get the first key and value since there should only be
-        # one.
-        value_type, value = list(specification.items())[0]
-        if value_type == "string":
-            return value
-        elif value_type == "column":
-            label = self._project_columns.get(value)
-            return project_parameters.get(label)
+        Parameters
+        ----------
+        text : str
 
-    def _write_page(self, page):
-        """Write a page unless this is a dry run.
+        Returns
+        -------
+        str
+            SHA-1 hash of the text, as hex string.
+        """
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def _skip_page(self, page):
+        """Skip saving a page that wouldn't change.
 
         Parameters
         ----------
         page : Page
-            The page to write to.
-
         """
-        if page.exists():
-            request = self._site.simple_request(
-                action="parse",
-                title=page.title(),
-                text=page.text,
-                contentmodel="wikitext",
-                prop="",
-                onlypst=1
+        logging.info(
+            "Page '{}' is unchanged. It will not be saved.".format(
+                page.title()
+            )
+        )
+        self._skipped_pages.append(page)
+        if self._journal is not None:
+            self._journal.record(
+                "page",
+                page.title(),
+                self._page_cache.get_revision_id(page)
             )
-            data = request.submit()
-            parsed_text = data['parse']['text']["*"]
-            page.text = pywikibot.diff.cherry_pick(page.get(), parsed_text)
 
-        if not self._dry_run:
-            page.save(summary=self._config["edit_summary"])
-        self._touched_pages.append(page)
+    def _is_journaled(self, page):
+        """Check if a page was written in a previous run.
+
+        Parameters
+        ----------
+        page : Page
+
+        Returns
+        -------
+        bool
+            True if the page is in the journal.
+        """
+        return self._journal.get("page", page.title()) is not None
 
     def _add_subpage(
             self,
@@ -207,7 +665,7 @@ class Wiki:
 
         Parameters
         ----------
-        subpage : dict
+        subpage : SubpageConfig
             Parameters for the page.
         project_parameters : dict
             Parameters for the project.
@@ -216,28 +674,22 @@ class Wiki:
 
         # Always pass the year parameter.
         template_parameters = {"år": self._year}
-        if "parameters" in subpage:
-            for key, specification in subpage["parameters"].items():
-                template_parameters[key] = self._get_project_parameter_value(
-                    project_parameters,
-                    specification
-                )
-        if "add_goals_parameters" in subpage:
+        template_parameters.update(
+            self._subpage_plans[subpage.title].render(project_parameters)
+        )
+        if subpage.add_goals_parameters:
             # Special case for goals parameters, as they are not
             # just copied.
             if not self._goals:
-                title = subpage["title"]
+                title = subpage.title
                 logging.warning(
                     f"Goals need to be supplied for page '{title}', "
                     "it will not be added."
                 )
                 return
 
-            template_key = \
-                list(subpage["add_goals_parameters"].keys())[0]
-            template_value = self._make_year_title(
-                subpage["add_goals_parameters"][template_key]
-            )
+            [(template_key, template_value)] = \
+                subpage.add_goals_parameters.items()
             english_name = project_parameters[
                 self._project_columns["english_name"]
             ]
@@ -246,11 +698,11 @@ class Wiki:
                 Template(template_value, parameters=project_goals)
             template_parameters["måluppfyllnad"] = \
                 self._create_goal_fulfillment_text(project_goals)
-        full_title = "{}/{}".format(project_name, subpage["title"])
+        full_title = "{}/{}".format(project_name, subpage.title)
         self._add_page_from_template(
-            self._config["project_namespace"],
+            self._config.project_namespace,
             full_title,
-            subpage["template_name"],
+            subpage.template_name,
             template_parameters
         )
 
@@ -277,11 +729,8 @@ class Wiki:
 
         """
 
-        if namespace is None:
-            page = Page(self._site, title)
-        else:
-            page = Page(self._site, title, namespace)
-        if page.exists() and not self._overwrite:
+        page = self._page_cache.get_page(title, namespace)
+        if self._page_cache.exists(page) and not self._overwrite:
             logging.warning(
                 "Page '{}' already exists. It will not be created.".format(
                     page.title()
@@ -299,7 +748,7 @@ class Wiki:
 
         Parameters
         ----------
-        goals : dict
+        goals : Mapping
             Goals to add fulfillments for.
 
         Returns
@@ -350,8 +799,8 @@ class Wiki:
 
         """
 
-        page = Page(self._site, title, "Category")
-        if page.exists() and not self._overwrite:
+        page = self._page_cache.get_page(title, "Category")
+        if self._page_cache.exists(page) and not self._overwrite:
             logging.warning(
                 "Category page '{}' already exists. It will not be created.".format(page.title())  # noqa: E501
             )
@@ -372,10 +821,8 @@ class Wiki:
 
         """
 
-        year_pages = self._config["year_pages"]
-        simple_pages = year_pages["simple"]
-        for raw_title, template_name in simple_pages.items():
-            title = self._make_year_title(raw_title)
+        year_pages = self._config.year_pages
+        for title, template_name in year_pages.simple.items():
             if not self._prompt_add_page(title):
                 continue
 
@@ -385,33 +832,15 @@ class Wiki:
                 template_name,
                 [self._year]
             )
-        if self._prompt_add_page(year_pages["projects"]["title"]):
+        if self._prompt_add_page(year_pages.projects.title):
             self._add_projects_year_page()
         if self._prompt_add_page("categories"):
             self._add_year_categories()
-        if self._prompt_add_page(year_pages["current_projects_template"]):
+        if self._prompt_add_page(year_pages.current_projects_template):
             self._create_current_projects_template()
-        if self._prompt_add_page(year_pages["volunteer_tasks"]["title"]):
+        if self._prompt_add_page(year_pages.volunteer_tasks.title):
             self._add_volunteer_tasks_page()
 
-    def _make_year_title(self, raw_string):
-        """Replace the placeholder "<YEAR>" with the actual year.
-
-        Parameters
-        ----------
-        title : str
-            Title of the page.
-
-        Returns
-        -------
-        str
-            Input string with "<YEAR>" replaced with the actual year.
-
-        """
-
-        title = raw_string.replace("<YEAR>", str(self._year))
-        return title
-
     def _prompt_add_page(self, title):
         """Prompt user for writing a page.
 
@@ -429,7 +858,7 @@ class Wiki:
         if not self._prompt_add_pages:
             return True
 
-        prompt = 'Add page "{}"? (y/N)'.format(self._make_year_title(title))
+        prompt = 'Add page "{}"? (y/N)'.format(title)
         return input(prompt).lower() == "y"
 
     def _add_projects_year_page(self):
@@ -439,21 +868,20 @@ class Wiki:
 
         """
 
-        config = self._config["year_pages"]["projects"]
-        title = self._make_year_title(config["title"])
+        config = self._config.year_pages.projects
+        title = config.title
         content = ""
 
-        for program in self._programs:
+        for program, project_numbers in self._program_projects.items():
             content += "== {} ==\n".format(program)
-            for project_number, project in self._projects.items():
-                if project["program"] == program:
-                    content += self._make_project_data_string(project_number)
+            for project_number in project_numbers:
+                content += self._make_project_data_string(project_number)
             content += "\n"
 
         self._add_page_from_template(
             None,
             title,
-            config["template"],
+            config.template,
             {
                 "år": self._year,
                 "projekt": content
@@ -481,9 +909,34 @@ class Wiki:
 
         """
 
-        for number in self._projects.keys():
-            if number[2:4] == strategy[0:2]:
-                yield number
+        yield from self._strategy_projects.get(strategy[0:2], [])
+
+    def projects_by_strategy(self, strategies=None):
+        """Group the added projects by strategy.
+
+        Parameters
+        ----------
+        strategies : list
+            Strategy numbers to get projects for. If None, projects
+            are grouped by strategy prefix, i.e. the first two digits
+            of the strategy numbers.
+
+        Returns
+        -------
+        dict
+            Map of strategy numbers, or prefixes, to lists of project
+            numbers, in the order the projects were added. Strategies
+            without projects have empty lists.
+        """
+        if strategies is None:
+            return {
+                prefix: list(numbers)
+                for prefix, numbers in self._strategy_projects.items()
+            }
+        return {
+            strategy: list(self._get_projects_for_strategy(strategy))
+            for strategy in strategies
+        }
 
     def _make_project_data_string(self, project):
         """Make a project data string for project year page.
@@ -511,7 +964,7 @@ class Wiki:
         return "{}{}\n".format(project_template, comment)
 
     def add_project(self, number, swedish_name, english_name, program):
-        """Store project information in a map.
+        """Store project information and index it by program and strategy.
 
         Parameters
         ----------
@@ -525,13 +978,19 @@ class Wiki:
             Which program the project is under.
         """
 
+        previous = self._projects.get(number)
+        if previous is None:
+            self._strategy_projects.setdefault(number[2:4], []).append(number)
         self._projects[number] = {
             "sv": swedish_name,
             "en": english_name,
             "program": program
         }
-        if program not in self._programs:
-            self._programs.append(program)
+        if previous is not None:
+            if previous["program"] == program:
+                return
+            self._program_projects[previous["program"]].remove(number)
+        self._program_projects.setdefault(program, []).append(number)
 
     def _add_year_categories(self):
         """Add category pages for a year.
@@ -541,10 +1000,9 @@ class Wiki:
 
         """
 
-        categories_config = self._config["year_pages"]["categories"]
-        general = self._make_year_title(categories_config["general"])
-        for page, extra_category in categories_config["pages"].items():
-            title = self._make_year_title(page)
+        categories_config = self._config.year_pages.categories
+        general = categories_config.general
+        for title, extra_category in categories_config.pages.items():
             categories = [general]
             if extra_category:
                 if isinstance(extra_category, list):
@@ -555,11 +1013,9 @@ class Wiki:
 
     def _create_current_projects_template(self):
         """Create a current projects template with the new projects."""
-        page_name = self._make_year_title(
-            self._config["year_pages"]["current_projects_template"]
-        )
-        page = Page(self._site, page_name)
-        if page.exists() and not self._overwrite:
+        page_name = self._config.year_pages.current_projects_template
+        page = self._page_cache.get_page(page_name)
+        if self._page_cache.exists(page) and not self._overwrite:
             logging.warning(
                 "Page '{}' already exists. It will not be created.".format(
                     page.title()
@@ -568,14 +1024,13 @@ class Wiki:
             return
 
         project_format = "[[{ns}:{{proj}}|{{proj}}]]".format(
-            ns=self._config["project_namespace"])
+            ns=self._config.project_namespace)
         delimiter = "''' · '''"
         template_data = {}
-        for program in self._programs:
-            projects = []
-            for _, project in self._projects.items():
-                if project["program"] == program:
-                    projects.append(project["sv"])
+        for program, project_numbers in self._program_projects.items():
+            projects = [
+                self._projects[number]["sv"] for number in project_numbers
+            ]
 
             template_data[program] = delimiter.join(
                 [project_format.format(proj=project)
@@ -605,17 +1060,16 @@ class Wiki:
 
         Creates a list of volunteer pages sorted by program.
         """
-        config = self._config["year_pages"]["volunteer_tasks"]
-        title = self._make_year_title(config["title"])
+        config = self._config.year_pages.volunteer_tasks
+        title = config.title
         project_list_string = ""
-        for program_name in self._programs:
+        for program_name, project_numbers in self._program_projects.items():
             project_list_string += "== {} ==\n".format(program_name)
-            for _, project in self._projects.items():
-                if project["program"] == program_name:
-                    project_name = project["sv"]
-                    project_template = "{{" + \
-                        ":Projekt:{}/Frivillig".format(project_name) + "}}\n"
-                    project_list_string += project_template
+            for number in project_numbers:
+                project_name = self._projects[number]["sv"]
+                project_template = "{{" + \
+                    ":Projekt:{}/Frivillig".format(project_name) + "}}\n"
+                project_list_string += project_template
             comment = Template("Utkommenterat", True, ["Platshållare"])
             project_list_string += "{}&nbsp;\n\n".format(comment)
 
@@ -626,7 +1080,7 @@ class Wiki:
         self._add_page_from_template(
             None,
             title,
-            config["template"],
+            config.template,
             parameters
         )
 
@@ -641,14 +1095,14 @@ class Wiki:
         """
         # Pages needing to be updated if the project was not in the data files
         # at the time of the start-of-the-year run.
-        pages = []
         # Pages needing to be updated if the project was in the data files but
         # set to "skip" at the time of the start-of-the-year run.
-        for k, v in self._config["year_pages"].items():
-            if isinstance(v, str):
-                pages.append(self._make_year_title(v))
-            elif v.get("title"):
-                pages.append(self._make_year_title(v["title"]))
+        year_pages = self._config.year_pages
+        pages = [
+            year_pages.current_projects_template,
+            year_pages.projects.title,
+            year_pages.volunteer_tasks.title
+        ]
         logging.warning(
             "Don't forget to manually add '{number} - {name}' to the "
             "following pages:\n* {pages}".format(
@@ -657,73 +1111,114 @@ class Wiki:
         )
 
     def log_report(self):
-        """Log a list of the pages that were modified."""
+        """Log a list of the pages that were modified.
+
+        Queued saves are finished first. Also logs pages recorded in
+        the plan, pages that couldn't be saved and the number of pages
+        that were skipped because they wouldn't change.
+        """
+        self.flush_saves()
         logging.info("These pages were modified:")
         for page in self._touched_pages:
             logging.info(page.title())
+        if self._planned_pages:
+            logging.info("These pages will be written when the plan is "
+                         "applied:")
+            for page in self._planned_pages:
+                logging.info(page.title())
+        if self._failed_pages:
+            logging.error("These pages could not be saved:")
+            for page in self._failed_pages:
+                logging.error(page.title())
+        logging.info(
+            "{} pages were unchanged and not saved.".format(
+                len(self._skipped_pages)
+            )
+        )
 
     def update_project_name_templates(self):
-        """Update project number and name templates."""
-        name_template = Page(self._site, self._config["project_name_template"])
-        number_template = Page(
-            self._site,
-            self._config["project_number_template"]
+        """Update project number and name templates.
+
+        Each template is parsed once and rows are added for all
+        projects that aren't already in it, just above the default
+        row.
+        """
+        name_template = self._page_cache.get_page(
+            self._config.project_name_template
         )
+        number_template = self._page_cache.get_page(
+            self._config.project_number_template
+        )
+        name_switch = self._get_switch_template(name_template)
+        number_switch = self._get_switch_template(number_template)
+        added_rows = {name_template: [], number_template: []}
         for number, name in self._projects.items():
             english_name = name["en"]
             swedish_name = name["sv"]
 
-            name_row = (
-                f"| {number} = "
-                "{{#if: {{{en|}}}"
-                f"| {english_name} | {swedish_name} "
-                "}}"
-            )
-            self._insert_row_before_default(name_template, name_row, number)
-
-            number_row = f"| {swedish_name} = {number}"
-            self._insert_row_before_default(
-                number_template,
-                number_row,
-                number
-            )
-
+            if name_switch is not None:
+                if name_switch.has_key(number):
+                    self._log_existing_row(name_template, number)
+                else:
+                    name_row = name_switch.add_row(
+                        number,
+                        "{{#if: {{{en|}}}"
+                        f"| {english_name} | {swedish_name} "
+                        "}}"
+                    )
+                    added_rows[name_template].append(name_row)
+
+            if number_switch is not None:
+                if number_switch.has_value(number):
+                    self._log_existing_row(number_template, number)
+                else:
+                    number_row = number_switch.add_row(swedish_name, number)
+                    added_rows[number_template].append(number_row)
+
+        name_template.text = str(name_switch or name_template.text)
+        number_template.text = str(number_switch or number_template.text)
+        if self._plan is not None:
+            for template, rows in added_rows.items():
+                self._plan.add_template_rows(template.title(), rows)
         if self._prompt_add_page(name_template.title()):
             self._write_page(name_template)
         if self._prompt_add_page(number_template.title()):
             self._write_page(number_template)
 
-    def _insert_row_before_default(self, template, row, number):
-        """Add a row to the template just above the default row.
+    def _get_switch_template(self, template):
+        """Parse the switch in a project name or number template.
 
-        If the template already containins the project number or if there
-        is no default, nothing is added. Missing default also outputs
-        a warning since that means something is wrong in the template.
+        Also sets the template page's text to the text on the wiki.
 
         Parameters
         ----------
-        template : str
-        row : str
-            The row to add.
-        number : str
-        """
-        if re.search(fr"{number}", template.text):
-            logging.debug(
-                "Skipping adding existing project to template"
-                f" {template}: {number}."
-            )
-            return
+        template : Page
 
-        default_row_pattern = r"(\| #default.*)"
-        if not re.search(default_row_pattern, template.text):
+        Returns
+        -------
+        SwitchTemplate
+            The parsed switch. None if there is no default row, which
+            means that something is wrong in the template. This also
+            outputs a warning.
+        """
+        template.text = self._page_cache.get_text(template) or ""
+        switch = SwitchTemplate(template.text)
+        if not switch.has_default:
             logging.warning(f"No default row in template {template}.")
-            return
+            return None
+        return switch
+
+    def _log_existing_row(self, template, number):
+        """Log that a project is already in a template.
 
-        # Add the row at the bottom, before the default statement.
-        template.text = re.sub(
-            default_row_pattern,
-            fr"{row}\n\1",
-            template.text
+        Parameters
+        ----------
+        template : Page
+        number : str
+        """
+        logging.debug(
+            "Skipping adding existing project to template"
+            f" {template}: {number}."
         )
 
 